@@ -2,13 +2,92 @@ import os
 import json
 import argparse
 from openai import OpenAI
-from typing import Dict, List, Any, Tuple
-from tqdm import tqdm
+from typing import Dict, List, Any, Optional, Tuple
 from dotenv import load_dotenv
+from http_cassette import openai_http_client
+from llm_engine import ClassificationEngine, estimate_tokens
+from json_stream import JsonlSink, iter_records, load_jsonl_by_id
+from llm_cache import LLMCache, cache_from_config, cached_output_text, cached_response_text
+from batch_backend import run_batch_requests
+from corpus_store import store_from_config
+from columnar import ColumnarSink, analysis_row, analysis_schema, table_path
+from near_duplicates import NearDuplicateCollapser, report_collapse
+from triage import triage_items
+from thread_context import order_for_prefix_sharing, report_prompt_tokens, select_ancestors, thread_root_id
 
 # Load environment variables
 load_dotenv()
-client = OpenAI()
+# Retries are handled by the ClassificationEngine (with rate-limit aware backoff)
+client = OpenAI(max_retries=0, http_client=openai_http_client())
+
+MODEL = "gpt-4o"
+ANALYSIS_INSTRUCTIONS = "You are an objective analyst tasked with determining if comments support or refute claims."
+SUPPORT_ANALYSIS_FORMAT = {
+    "format": {
+        "type": "json_schema",
+        "name": "support_analysis",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "supports": {
+                    "type": "string",
+                    "enum": ["true", "false", "neutral"]
+                },
+                "confidence": {
+                    "type": "number",
+                    # "minimum": 0,
+                    # "maximum": 1
+                },
+                "reasoning": {
+                    "type": "string"
+                }
+                },
+            "required": ["supports", "confidence", "reasoning"],
+            "additionalProperties": False
+            },
+        "strict": True
+        }
+    }
+# Response format for packed mode: one entry per conversation, matched back by id
+PACKED_ANALYSIS_FORMAT = {
+    "format": {
+        "type": "json_schema",
+        "name": "support_analysis_packed",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {
+                                "type": "string"
+                            },
+                            "supports": {
+                                "type": "string",
+                                "enum": ["true", "false", "neutral"]
+                            },
+                            "confidence": {
+                                "type": "number"
+                            },
+                            "reasoning": {
+                                "type": "string"
+                            }
+                        },
+                        "required": ["id", "supports", "confidence", "reasoning"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["results"],
+            "additionalProperties": False
+        },
+        "strict": True
+    }
+}
+# Rough allowance for the JSON answer when budgeting tokens/min
+EXPECTED_OUTPUT_TOKENS = 100
 
 
 def is_deleted_content(text: str) -> bool:
@@ -59,22 +138,27 @@ def should_skip_comment(comment: Dict[str, Any], skip_with_deleted_parents: bool
     
     return False, ""
 
-def construct_conversation_context(comment: Dict[str, Any]) -> str:
+def construct_conversation_context(comment: Dict[str, Any], max_ancestor_tokens: Optional[int] = None) -> str:
     """
     Constructs the conversation context from a comment and its parent information.
+    With `max_ancestor_tokens`, ancestors past the budget are dropped (the post and the
+    nearest parents are kept, see thread_context.select_ancestors).
     """
     context = []
     
     # Add parent information if available
     if "parent_tree" in comment and "parent_info" in comment["parent_tree"]:
-        for parent in comment["parent_tree"]["parent_info"]:
-            if "title" in parent:
-                context.append(f"Post Title: {parent['title']}")
-                if "selftext_preview" in parent:
-                    context.append(f"Post content: {parent['selftext_preview']}")
-            if "body" in parent:
-                author = parent.get("author", "Unknown")
-                context.append(f"Comment by {author}: {parent['body']}")
+        parents = comment["parent_tree"]["parent_info"]
+        omitted = 0
+        tail = []
+        if max_ancestor_tokens is not None:
+            parents, omitted, tail = select_ancestors(parents, max_ancestor_tokens)
+        for parent in parents:
+            append_parent_context(context, parent)
+        if omitted:
+            context.append(f"[... {omitted} earlier comments omitted ...]")
+        for parent in tail:
+            append_parent_context(context, parent)
     
     # Add the current comment
     if "body" in comment:
@@ -87,9 +171,18 @@ def construct_conversation_context(comment: Dict[str, Any]) -> str:
     
     return "\n\n".join(context)
 
-def analyze_staging_claim(conversation_context: str) -> Dict[str, Any]:
+def append_parent_context(context: List[str], parent: Dict[str, Any]) -> None:
+    if "title" in parent:
+        context.append(f"Post Title: {parent['title']}")
+        if "selftext_preview" in parent:
+            context.append(f"Post content: {parent['selftext_preview']}")
+    if "body" in parent:
+        author = parent.get("author", "Unknown")
+        context.append(f"Comment by {author}: {parent['body']}")
+
+def build_analysis_prompt(conversation_context: str) -> str:
     """
-    Analyzes the conversation using GPT-4 to determine if it supports the staging claim.
+    Builds the classification prompt for a conversation context.
     """
     mode = "last comment" if "Last Comment by" in conversation_context else "post"
 #     if mode == "last comment":
@@ -134,64 +227,333 @@ Response format:
     "confidence": 0.X,
     "reasoning": "explanation"
 }}"""
+    return prompt
 
+def error_analysis(reasoning: str) -> Dict[str, Any]:
+    """
+    Placeholder analysis recorded when a comment could not be classified.
+    """
+    return {
+        "supports_staging": None,
+        "confidence": 0,
+        "reasoning": reasoning
+    }
 
-    
-
+def analyze_staging_claim(conversation_context: str, cache: Optional[LLMCache] = None,
+                          prompt_cache_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Analyzes the conversation using GPT-4 to determine if it supports the staging claim.
+    Identical requests are served from `cache` when one is given. `prompt_cache_key` (e.g. the
+    thread's post id) helps the provider route requests sharing a prefix to the same prompt cache.
+    """
+    prompt = build_analysis_prompt(conversation_context)
     try:
-        response = client.responses.create(
-        model = "gpt-4o",
-        input = prompt,
-        instructions = "You are an objective analyst tasked with determining if comments support or refute claims.",
-        text={
-            "format": {
-                "type": "json_schema",
-                "name": "support_analysis",
-                "schema": {
-                    "type": "object",
-                    "properties": {
-                        "supports": {
-                            "type": "string",
-                            "enum": ["true", "false", "neutral"]
-                        },
-                        "confidence": {
-                            "type": "number",
-                            # "minimum": 0,
-                            # "maximum": 1
-                        },
-                        "reasoning": {
-                            "type": "string"
-                        }
-                        },
-                    "required": ["supports", "confidence", "reasoning"],
-                    "additionalProperties": False
-                    },
-                "strict": True
-                }
-            }
-        )
-        return json.loads(response.output_text)
+        output_text = cached_response_text(client, cache, MODEL, ANALYSIS_INSTRUCTIONS, prompt, SUPPORT_ANALYSIS_FORMAT,
+                                           prompt_cache_key=prompt_cache_key)
+        return json.loads(output_text)
     except json.JSONDecodeError:
+        return error_analysis("Error parsing GPT-4 response")
+
+def cached_analysis(conversation_context: str, cache: Optional[LLMCache]) -> Optional[Dict[str, Any]]:
+    """
+    The analysis analyze_staging_claim would serve from `cache`, or None if it needs a request.
+    """
+    output_text = cached_output_text(cache, MODEL, ANALYSIS_INSTRUCTIONS, build_analysis_prompt(conversation_context), SUPPORT_ANALYSIS_FORMAT)
+    return json.loads(output_text) if output_text is not None else None
+
+def estimate_analysis_tokens(conversation_context: str) -> int:
+    """
+    Estimated total tokens (prompt + instructions + answer) of one analyze_staging_claim call.
+    """
+    return estimate_tokens(build_analysis_prompt(conversation_context) + ANALYSIS_INSTRUCTIONS) + EXPECTED_OUTPUT_TOKENS
+
+def build_packed_prompt(entries: List[Tuple[str, str]]) -> str:
+    """
+    Builds one prompt that asks for the classification of several conversations at once.
+    Args:
+        entries: List of (comment id, conversation context) pairs
+    """
+    conversations = "\n\n".join(
+        f"### Conversation id: {comment_id}\n{conversation_context}" for comment_id, conversation_context in entries
+    )
+    prompt = f"""Please analyze each of the following Reddit conversations about the Ghost of Kyiv. For each conversation, determine if its last comment (or the post itself, if it is only a post) supports or refutes the claim that "The story of the Ghost of Kyiv is real.", or if it's neutral.
+
+{conversations}
+
+Please provide your analysis in JSON format, with one entry in "results" for every conversation id above, with the following fields:
+- id: string (the conversation id)
+- supports: boolean (true if the last comment or post supports the claim that "The story of the Ghost of Kyiv is real.", false if it refutes it, neutral if it does not confirm or deny the claim)
+- confidence: float (0-1, how confident are you in this assessment)
+- reasoning: string (very brief explanation of your assessment)
+
+Response format:
+{{
+    "results": [
+        {{"id": "...", "supports": true/false/neutral, "confidence": 0.X, "reasoning": "explanation"}}
+    ]
+}}"""
+    return prompt
+
+def parse_packed_response(output_text: str, expected_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Validates a packed response and returns the analyses it contains, keyed by id.
+    Entries with unknown ids or invalid fields are dropped (those items fall back to single calls).
+    """
+    try:
+        entries = json.loads(output_text).get("results", [])
+    except (json.JSONDecodeError, AttributeError):
+        return {}
+    expected = set(expected_ids)
+    analyses = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict) or entry.get("id") not in expected:
+            continue
+        if entry.get("supports") not in ("true", "false", "neutral"):
+            continue
+        if not isinstance(entry.get("confidence"), (int, float)) or not isinstance(entry.get("reasoning"), str):
+            continue
+        analyses[entry["id"]] = {
+            "supports": entry["supports"],
+            "confidence": entry["confidence"],
+            "reasoning": entry["reasoning"]
+        }
+    return analyses
+
+def analyze_staging_claims_packed(entries: List[Tuple[str, str]], cache: Optional[LLMCache] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Classifies several conversations with a single request.
+    Returns:
+        Dictionary of comment id -> analysis for every conversation the reply covered validly
+    """
+    prompt = build_packed_prompt(entries)
+    ids = [comment_id for comment_id, _ in entries]
+
+    def validate(output_text: str) -> None:
+        # Only cache replies that cover every conversation
+        if len(parse_packed_response(output_text, ids)) < len(set(ids)):
+            raise ValueError("Packed reply does not cover every conversation")
+
+    output_text = cached_response_text(client, cache, MODEL, ANALYSIS_INSTRUCTIONS, prompt, PACKED_ANALYSIS_FORMAT, validate=validate)
+    return parse_packed_response(output_text, ids)
+
+def cached_packed_analyses(entries: List[Tuple[str, str]], cache: Optional[LLMCache]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    The analyses analyze_staging_claims_packed would serve from `cache`, or None.
+    """
+    output_text = cached_output_text(cache, MODEL, ANALYSIS_INSTRUCTIONS, build_packed_prompt(entries), PACKED_ANALYSIS_FORMAT)
+    return parse_packed_response(output_text, [comment_id for comment_id, _ in entries]) if output_text is not None else None
+
+def estimate_packed_tokens(entries: List[Tuple[str, str]]) -> int:
+    """
+    Estimated total tokens of one packed request.
+    """
+    return estimate_tokens(build_packed_prompt(entries) + ANALYSIS_INSTRUCTIONS) + EXPECTED_OUTPUT_TOKENS * len(entries)
+
+def report_packing_savings(packs: List[List[Tuple[str, str]]]) -> None:
+    """
+    Prints the estimated prompt tokens per item of the packed requests vs one request per item
+    (instructions and response schema included, since both are re-sent with every request).
+    """
+    overhead = ANALYSIS_INSTRUCTIONS
+    single_tokens = sum(
+        estimate_tokens(build_analysis_prompt(context) + overhead + json.dumps(SUPPORT_ANALYSIS_FORMAT))
+        for pack in packs for _, context in pack
+    )
+    packed_tokens = sum(
+        estimate_tokens(build_packed_prompt(pack) + overhead + json.dumps(PACKED_ANALYSIS_FORMAT))
+        for pack in packs
+    )
+    item_count = sum(len(pack) for pack in packs)
+    if not item_count:
+        return
+    print(f"Packed mode: ~{packed_tokens / item_count:.0f} prompt tokens/item vs ~{single_tokens / item_count:.0f} one-per-request "
+          f"(saved ~{(single_tokens - packed_tokens) / item_count:.0f} tokens/item, {single_tokens - packed_tokens} total)")
+
+def analyze_with_batch_api(config, items: List[Dict[str, Any]], contexts: List[str], cache: Optional[LLMCache] = None) -> List[Dict[str, Any]]:
+    """
+    Classifies items through the OpenAI Batch API instead of one request per comment.
+    Cached prompts are answered locally; the rest are written to batch files, submitted,
+    polled until done and merged back by comment id.
+    Returns:
+        List of analyses aligned with `items`
+    """
+    analyses: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    keys = [None] * len(items)
+    requests = []
+    for index, (item, context) in enumerate(zip(items, contexts)):
+        prompt = build_analysis_prompt(context)
+        if cache is not None:
+            keys[index] = LLMCache.make_key(MODEL, ANALYSIS_INSTRUCTIONS, prompt, SUPPORT_ANALYSIS_FORMAT)
+            cached = cache.get(keys[index])
+            if cached is not None:
+                analyses[index] = json.loads(cached)
+                continue
+        body = {
+            "model": MODEL,
+            "input": prompt,
+            "instructions": ANALYSIS_INSTRUCTIONS,
+            "text": SUPPORT_ANALYSIS_FORMAT
+        }
+        if config.USE_PROMPT_CACHE_KEY:
+            body["prompt_cache_key"] = thread_root_id(item)
+        requests.append((str(item.get("id")), body))
+
+    key_by_id = {str(item.get("id")): keys[index] for index, item in enumerate(items)}
+
+    def cache_batch_results(batch_results: Dict[str, Dict[str, Any]]) -> None:
+        # Cached as each batch is downloaded, so a crash later in the run does not lose (and resubmit) it
+        for custom_id, result in batch_results.items():
+            if result["output_text"] is None:
+                continue
+            try:
+                json.loads(result["output_text"])
+            except json.JSONDecodeError:
+                continue
+            cache.put(key_by_id[custom_id], result["output_text"])
+
+    print(f"Submitting {len(requests)} comments to the Batch API ({len(items) - len(requests)} served from cache)")
+    batch_results = run_batch_requests(
+        client, requests, config.BATCH_DIR, "staging_claims",
+        config.BATCH_MAX_REQUESTS_PER_FILE, config.BATCH_POLL_INTERVAL,
+        on_results=cache_batch_results if cache is not None else None
+    ) if requests else {}
+
+    for index, item in enumerate(items):
+        if analyses[index] is not None:
+            continue
+        result = batch_results.get(str(item.get("id")))
+        if result is None:
+            analyses[index] = error_analysis("Missing from batch output")
+        elif result["output_text"] is None:
+            analyses[index] = error_analysis(f"Batch request failed: {result['error']}")
+        else:
+            try:
+                analyses[index] = json.loads(result["output_text"])
+            except json.JSONDecodeError:
+                analyses[index] = error_analysis("Error parsing GPT-4 response")
+    return analyses
+
+def analyze_packed_items(engine: ClassificationEngine, items: List[Dict[str, Any]], contexts: List[str], cache: Optional[LLMCache],
+                         pack_size: int, save_result) -> List[int]:
+    """
+    Classifies items `pack_size` at a time and saves every analysis the replies covered.
+    Returns:
+        Indices of items missing from the packed replies, to be classified one per request
+    """
+    packs = [list(range(start, min(start + pack_size, len(items)))) for start in range(0, len(items), pack_size)]
+    pack_entries = [[(str(items[index].get("id")), contexts[index]) for index in pack] for pack in packs]
+    report_packing_savings(pack_entries)
+    missing = []
+
+    def save_pack(pack_index, analyses):
+        for index in packs[pack_index]:
+            analysis = analyses.get(str(items[index].get("id")))
+            if analysis is None:
+                missing.append(index)
+            else:
+                save_result(index, analysis)
+
+    engine.map(
+        lambda entries: analyze_staging_claims_packed(entries, cache),
+        pack_entries,
+        token_costs=[estimate_packed_tokens(entries) for entries in pack_entries],
+        on_error=lambda entries, e: {},
+        on_result=save_pack,
+        desc=f"Analyzing comments ({pack_size} per request)",
+        cached=lambda entries: cached_packed_analyses(entries, cache)
+    )
+    if missing:
+        print(f"{len(missing)} items were missing from packed replies, falling back to one request per item")
+    return sorted(missing)
+
+def build_result_record(item: Dict[str, Any], analysis: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Builds the analyzed_comments entry for a comment or post, or None if it has neither a body nor a selftext.
+    """
+    if "body" in item:
+        return {
+            "id": item.get("id"),
+            "is_post": False,
+            "author": item.get("author"),
+            "body": item.get("body"),
+            "created_utc": item.get("created_utc"),
+            "analysis": analysis
+        }
+    elif "selftext_preview" in item:
         return {
-            "supports_staging": None,
-            "confidence": 0,
-            "reasoning": "Error parsing GPT-4 response"
+            "id": item.get("id"),
+            "is_post": True,
+            "author": item.get("author"),
+            "title": item.get("title"),
+            "selftext_preview": item.get("selftext_preview"),
+            "created_utc": item.get("created_utc"),
+            "analysis": analysis
+        }
+    return None
+
+def is_completed_record(record: Dict[str, Any]) -> bool:
+    """
+    A stored result counts as done (and is skipped on resume) unless its analysis failed.
+    """
+    return "supports" in record.get("analysis", {})
+
+def finalize_analysis_output(output_file: str, recorded_items: List[Dict[str, Any]], records_by_id: Dict[str, Dict[str, Any]],
+                             skipped_comments: List[Dict[str, Any]], total_comments: int,
+                             table_file: Optional[str] = None, table_format: Optional[str] = None) -> None:
+    """
+    Assembles the staging_claims_analysis.json file from the streamed results, in input order.
+    With `table_format`, a typed columnar copy of the analyzed comments is written to `table_file`.
+    """
+    results = [records_by_id[item.get("id")] for item in recorded_items if item.get("id") in records_by_id]
+    output_data = {
+        "analyzed_comments": results,
+        "skipped_comments": skipped_comments,
+        "statistics": {
+            "total_comments": total_comments,
+            "analyzed_count": len(results),
+            "skipped_count": len(skipped_comments)
         }
+    }
+    
+    with open(output_file, 'w') as f:
+        json.dump(output_data, f, indent=2)
+    print(f"Saved {len(results)} analyzed and {len(skipped_comments)} skipped comments to {output_file}")
+
+    if table_format:
+        with ColumnarSink(table_file, analysis_schema(), table_format) as table:
+            for item in recorded_items:
+                if item.get("id") in records_by_id:
+                    table.write(analysis_row(records_by_id[item.get("id")], item))
+        print(f"Saved columnar copy of the analyzed comments to {table_file}")
 
 def process_reddit_data(config):
     """
     Process the Reddit data file and analyze each comment.
+    Comments are classified concurrently by a ClassificationEngine (or through the Batch API
+    when ANALYSIS_BACKEND is "batch"). With DEDUP_NEAR_DUPLICATES, near-duplicate comments are
+    grouped first and only one per group is classified; with USE_TRIAGE, items the local triage
+    model labels confidently skip the LLM. Each result is appended to a
+    JSONL file as soon as it completes; with RESUME_ANALYSIS, ids already in that file are not
+    re-analyzed. The final JSON output is assembled once, at the end.
     """
-    input_file = config.FLATTENED_DATA_FILENAME
+    input_file = config.FLATTENED_DATA_JSONL_FILENAME if config.STREAM_FLATTENED_DATA else config.FLATTENED_DATA_FILENAME
     output_file = config.STAGING_CLAIMS_ANALYSIS_FILENAME
+    results_file = config.STAGING_CLAIMS_RESULTS_FILENAME
     skip_with_deleted_parents = config.SKIP_DELETED_PARENTS
-    with open(input_file, 'r') as f:
-        data = json.load(f)
-    
-    results = []
+    resume = config.RESUME_ANALYSIS
+    records_by_id = load_jsonl_by_id(results_file) if resume else {}
+    completed_ids = {comment_id for comment_id, record in records_by_id.items() if is_completed_record(record)}
+    if completed_ids:
+        print(f"Resuming: {len(completed_ids)} comments already analyzed in {results_file}")
+
     skipped_comments = []
-    
-    for item in tqdm(data):
+    recorded_items = []
+    to_analyze = {}
+    total_items = 0
+
+    # Flattened items are streamed; only the ones to record are kept
+    for item in iter_records(input_file):
+        total_items += 1
         if isinstance(item, dict):
             # Check if we should skip this comment
             should_skip, skip_reason = should_skip_comment(item, skip_with_deleted_parents)
@@ -203,39 +565,87 @@ def process_reddit_data(config):
                     "reason": skip_reason
                 })
                 continue
-                
-            context = construct_conversation_context(item)
-            analysis = analyze_staging_claim(context)
-            if "body" in item:
-                results.append({
-                    "id": item.get("id"),
-                    "is_post": False,
-                    "author": item.get("author"),
-                    "body": item.get("body"),
-                    "created_utc": item.get("created_utc"),
-                    "analysis": analysis
-                })
-            elif "selftext_preview" in item:
-                results.append({
-                    "id": item.get("id"),
-                    "is_post": True,
-                    "author": item.get("author"),
-                    "title": item.get("title"),
-                    "selftext_preview": item.get("selftext_preview"),
-                    "created_utc": item.get("created_utc"),
-                    "analysis": analysis
-                })
-    
-        # Save results and skipped comments
-        output_data = {
-            "analyzed_comments": results,
-            "skipped_comments": skipped_comments,
-            "statistics": {
-                "total_comments": len(data),
-                "analyzed_count": len(results),
-                "skipped_count": len(skipped_comments)
-            }
-        }
-        
-        with open(output_file, 'w') as f:
-            json.dump(output_data, f, indent=2)
\ No newline at end of file
+            # Items without a body or selftext never make it into the output, so don't pay for them
+            if "body" not in item and "selftext_preview" not in item:
+                continue
+            recorded_items.append(item)
+            # Duplicate ids (the same thread fetched twice) are analyzed once
+            if item.get("id") not in completed_ids:
+                to_analyze.setdefault(item.get("id"), item)
+
+    items = list(to_analyze.values())
+    duplicates = {}
+    if config.DEDUP_NEAR_DUPLICATES:
+        # Near-duplicates take the label of the representative they are grouped with
+        total = len(items)
+        items, duplicates = NearDuplicateCollapser.from_config(config).collapse(items)
+        report_collapse(total, items, duplicates,
+                        sum(estimate_analysis_tokens(construct_conversation_context(item)) for item in items) / max(1, len(items)))
+    triaged = []
+    if config.USE_TRIAGE:
+        # Confident local labels skip the LLM
+        items, triaged = triage_items(config, items)
+    if config.ORDER_BY_THREAD:
+        # Submit siblings back to back so their shared post + ancestor prefix stays in the provider's prompt cache
+        items = [items[index] for index in order_for_prefix_sharing(items)]
+    contexts = [construct_conversation_context(item, config.CONTEXT_MAX_ANCESTOR_TOKENS) for item in items]
+    full_contexts = contexts if config.CONTEXT_MAX_ANCESTOR_TOKENS is None else [construct_conversation_context(item) for item in items]
+    report_prompt_tokens([build_analysis_prompt(context) for context in full_contexts], [build_analysis_prompt(context) for context in contexts])
+    cache_keys = [thread_root_id(item) if config.USE_PROMPT_CACHE_KEY else None for item in items]
+    engine = ClassificationEngine.from_config(config)
+    cache = cache_from_config(config)
+    with JsonlSink(results_file, checkpoint_every=config.ANALYSIS_CHECKPOINT_EVERY, resume=resume) as sink:
+        def save_record(item, analysis, extra=None):
+            record = build_result_record(item, analysis)
+            record.update(extra or {})
+            sink.write(record)
+            records_by_id[record["id"]] = record
+            for duplicate in duplicates.get(record["id"], []):
+                duplicate_record = build_result_record(duplicate, analysis)
+                duplicate_record.update(extra or {})
+                duplicate_record["duplicate_of"] = record["id"]
+                sink.write(duplicate_record)
+                records_by_id[duplicate_record["id"]] = duplicate_record
+
+        def save_result(index, analysis):
+            save_record(items[index], analysis)
+
+        for item, analysis in triaged:
+            save_record(item, analysis, {"triage": True})
+
+        if config.ANALYSIS_BACKEND == "batch":
+            analyses = analyze_with_batch_api(config, items, contexts, cache)
+            for index, analysis in enumerate(analyses):
+                save_result(index, analysis)
+        else:
+            remaining = list(range(len(items)))
+            if config.ANALYSIS_PACK_SIZE > 1:
+                remaining = analyze_packed_items(engine, items, contexts, cache, config.ANALYSIS_PACK_SIZE, save_result)
+            engine.map(
+                lambda index: analyze_staging_claim(contexts[index], cache, cache_keys[index]),
+                remaining,
+                token_costs=[estimate_analysis_tokens(contexts[index]) for index in remaining],
+                on_error=lambda index, e: error_analysis(f"Error calling GPT-4: {e}"),
+                on_result=lambda position, analysis: save_result(remaining[position], analysis),
+                desc="Analyzing comments",
+                cached=lambda index: cached_analysis(contexts[index], cache)
+            )
+    print(f"LLM cache: {cache.stats()}")
+    cache.close()
+
+    table_file = table_path(config.STAGING_CLAIMS_ANALYSIS_TABLE, config.COLUMNAR_FORMAT) if config.COLUMNAR_FORMAT else None
+    finalize_analysis_output(output_file, recorded_items, records_by_id, skipped_comments, total_items,
+                             table_file, config.COLUMNAR_FORMAT)
+
+    store = store_from_config(config)
+    if store is not None:
+        store.add_analyses(records_by_id[item.get("id")] for item in recorded_items if item.get("id") in records_by_id)
+        store.add_skipped(skipped_comments)
+        print(f"Stored analyses and skip reasons in {store.path}")
+        store.close()
+
+def analyze_staging_claims(config):
+    """
+    Pipeline entry point used by main.py.
+    """
+    process_reddit_data(config)
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BATCH_ENDPOINT = "/v1/responses"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# Stay below the Batch API's 200 MB input file limit
+MAX_BATCH_FILE_BYTES = 190 * 1024 * 1024
+
+
+def write_batch_files(requests: List[Tuple[str, Dict[str, Any]]], batch_dir: str, prefix: str,
+                      max_requests_per_file: int) -> List[str]:
+    """
+    Serializes (custom_id, request body) pairs into Batch API input files (JSONL).
+    Files are split by request count and size.
+    Returns:
+        List of written file paths
+    """
+    os.makedirs(batch_dir, exist_ok=True)
+    paths = []
+    f = None
+    count = 0
+    size = 0
+    for custom_id, body in requests:
+        line = json.dumps({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}, ensure_ascii=False) + "\n"
+        line_size = len(line.encode('utf-8'))
+        if f is None or count >= max_requests_per_file or size + line_size > MAX_BATCH_FILE_BYTES:
+            if f is not None:
+                f.close()
+            path = os.path.join(batch_dir, f"{prefix}_{int(time.time())}_{len(paths):04d}.jsonl")
+            f = open(path, 'w', encoding='utf-8')
+            paths.append(path)
+            count = 0
+            size = 0
+        f.write(line)
+        count += 1
+        size += line_size
+    if f is not None:
+        f.close()
+    return paths
+
+def load_manifest(manifest_file: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(manifest_file):
+        return []
+    with open(manifest_file, 'r') as f:
+        return json.load(f)
+
+def save_manifest(manifest_file: str, manifest: List[Dict[str, Any]]) -> None:
+    with open(manifest_file, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+def submit_batch_files(client, paths: List[str], manifest_file: str, manifest: List[Dict[str, Any]]) -> None:
+    """
+    Uploads each batch file and creates a batch for it. The manifest is saved after every
+    submission so that a restarted run polls the existing batches instead of resubmitting.
+    """
+    for path in paths:
+        with open(path, 'rb') as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h",
+            metadata={"source_file": os.path.basename(path)}
+        )
+        print(f"Submitted batch {batch.id} for {path}")
+        manifest.append({"file": path, "input_file_id": uploaded.id, "batch_id": batch.id, "status": batch.status})
+        save_manifest(manifest_file, manifest)
+
+def poll_batches(client, manifest: List[Dict[str, Any]], manifest_file: str, poll_interval: float) -> Dict[str, Any]:
+    """
+    Polls every batch in the manifest until all reach a terminal status.
+    Returns:
+        Dictionary of batch id -> final Batch object
+    """
+    finished = {}
+    while True:
+        for entry in manifest:
+            if entry["batch_id"] in finished:
+                continue
+            batch = client.batches.retrieve(entry["batch_id"])
+            entry["status"] = batch.status
+            if batch.status in TERMINAL_STATUSES:
+                finished[batch.id] = batch
+                print(f"Batch {batch.id} finished with status '{batch.status}' ({batch.request_counts})")
+        save_manifest(manifest_file, manifest)
+        if len(finished) == len(manifest):
+            return finished
+        print(f"{len(finished)}/{len(manifest)} batches finished, checking again in {poll_interval}s...")
+        time.sleep(poll_interval)
+
+def extract_output_text(body: Dict[str, Any]) -> Optional[str]:
+    """
+    Returns the concatenated output_text of a Responses API body, as `response.output_text` does.
+    """
+    texts = []
+    for output in body.get("output", []):
+        if output.get("type") != "message":
+            continue
+        for content in output.get("content", []):
+            if content.get("type") == "output_text":
+                texts.append(content.get("text", ""))
+    return "".join(texts) if texts else None
+
+def download_batch_results(client, batch) -> Dict[str, Dict[str, Any]]:
+    """
+    Downloads a finished batch's output and error files.
+    Returns:
+        Dictionary of custom_id -> {"output_text": str or None, "error": str or None}
+    """
+    results = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        content = client.files.content(file_id).text
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            error = record.get("error")
+            output_text = None
+            if response.get("status_code") == 200:
+                output_text = extract_output_text(response.get("body", {}))
+            elif error is None:
+                error = response.get("body", {}).get("error") or f"HTTP {response.get('status_code')}"
+            results[record["custom_id"]] = {"output_text": output_text, "error": str(error) if error else None}
+    return results
+
+def run_batch_requests(client, requests: List[Tuple[str, Dict[str, Any]]], batch_dir: str, prefix: str,
+                       max_requests_per_file: int, poll_interval: float,
+                       on_results: Optional[Callable[[Dict[str, Dict[str, Any]]], None]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Runs requests through the Batch API: serialize -> submit -> poll -> download.
+    Batches listed in an existing manifest (from an interrupted run) are polled and merged
+    first; only requests they did not answer are submitted again.
+    `on_results(batch_results)` is called with each downloaded batch's results, which the caller
+    must persist (e.g. in the LLM cache): the batch is then dropped from the manifest. Without it,
+    batches stay in the manifest until the function returns, so no paid-for batch is lost to a crash.
+    Returns:
+        Dictionary of custom_id -> {"output_text": str or None, "error": str or None}
+    """
+    manifest_file = os.path.join(batch_dir, f"{prefix}_manifest.json")
+    os.makedirs(batch_dir, exist_ok=True)
+    manifest = load_manifest(manifest_file)
+    wanted = {custom_id for custom_id, _ in requests}
+    results: Dict[str, Dict[str, Any]] = {}
+    collected = set()
+
+    def collect(batch, answered_only: bool) -> None:
+        nonlocal manifest
+        batch_results = {custom_id: result for custom_id, result in download_batch_results(client, batch).items()
+                         if custom_id in wanted and (result["output_text"] is not None or not answered_only)}
+        results.update(batch_results)
+        collected.add(batch.id)
+        if on_results is not None:
+            on_results(batch_results)
+            # Persisted by the caller: a restarted run no longer needs this batch
+            manifest = [entry for entry in manifest if entry["batch_id"] != batch.id]
+            save_manifest(manifest_file, manifest)
+
+    if manifest:
+        print(f"Found {len(manifest)} previously submitted batches in {manifest_file}, collecting them first...")
+        for batch in poll_batches(client, manifest, manifest_file, poll_interval).values():
+            collect(batch, answered_only=True)
+
+    remaining = [(custom_id, body) for custom_id, body in requests if custom_id not in results]
+    if remaining:
+        paths = write_batch_files(remaining, batch_dir, prefix, max_requests_per_file)
+        print(f"Serialized {len(remaining)} requests into {len(paths)} batch files")
+        submit_batch_files(client, paths, manifest_file, manifest)
+        for batch in poll_batches(client, manifest, manifest_file, poll_interval).values():
+            if batch.id not in collected:
+                collect(batch, answered_only=False)
+
+    # Everything was merged, so the next run starts from scratch
+    if os.path.exists(manifest_file):
+        os.remove(manifest_file)
+    return results
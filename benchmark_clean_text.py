@@ -0,0 +1,72 @@
+import re
+import time
+import random
+import argparse
+from typing import Callable, List
+from text_cleaning import clean_text, clean_texts, pc
+
+
+def legacy_clean_text(text: str) -> str:
+    """
+    The original three-pass clean_text, kept here as the baseline.
+    """
+    text = re.sub(r'http[s]?://\S+', '', text)
+    text = re.sub(r'\\u[\dA-Fa-f]{4}', '', text)
+    text = re.sub(r'[^\x00-\x7F]+', '', text)
+    return text
+
+def synthetic_corpus(count: int, seed: int = 0) -> List[str]:
+    """
+    Comment-like texts: mostly plain ASCII, some with URLs, emoji / accented characters or
+    literal \\uXXXX escapes, at lengths typical of Reddit comments.
+    """
+    generator = random.Random(seed)
+    words = ["the", "shot", "ear", "staged", "secret", "service", "roof", "bullet", "video", "rally", "fake",
+             "blood", "trump", "really", "think", "this", "was", "not", "a", "source", "look", "at", "it"]
+    extras = ["https://www.reddit.com/r/pics/comments/abc123/", "http://example.com/x?y=1", "😂", "café", "—",
+              "\\u2019", "\\ud83d\\ude02", "…"]
+    texts = []
+    for _ in range(count):
+        tokens = [generator.choice(words) for _ in range(int(generator.expovariate(1 / 40)) + 1)]
+        if generator.random() < 0.3:
+            for _ in range(generator.randint(1, 3)):
+                tokens.insert(generator.randrange(len(tokens) + 1), generator.choice(extras))
+        texts.append(" ".join(tokens))
+    return texts
+
+def time_call(function: Callable[[], List[str]], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the legacy clean_text with the batch cleaner on a synthetic corpus')
+    parser.add_argument('--texts', type=int, default=200000, help='Number of synthetic texts')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per variant (the best time is reported)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    texts = synthetic_corpus(args.texts, args.seed)
+    expected = [legacy_clean_text(text) for text in texts]
+    variants = {
+        "legacy clean_text (3 passes per text)": lambda: [legacy_clean_text(text) for text in texts],
+        "clean_text per text": lambda: [clean_text(text) for text in texts],
+        "clean_texts (python)": lambda: clean_texts(texts),
+    }
+    if pc is not None:
+        variants["clean_texts (arrow)"] = lambda: clean_texts(texts, backend="arrow")
+
+    print(f"{len(texts)} texts, {sum(len(text) for text in texts) / 1e6:.1f}M characters")
+    baseline = None
+    for name, function in variants.items():
+        if function() != expected:
+            print(f"{name}: output differs from the legacy cleaner")
+        seconds = time_call(function, args.repeat)
+        baseline = baseline or seconds
+        print(f"{name:<40} {seconds * 1000:8.1f} ms  {baseline / seconds:5.1f}x")
+
+if __name__ == '__main__':
+    main()
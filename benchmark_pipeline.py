@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import argparse
+from typing import Dict, List
+
+STAGES = ["search", "fetch", "flatten", "analyze"]
+
+
+def prepare_config(config, mode: str):
+    """
+    Settings that make a recorded run and its replays issue the same requests: nothing is
+    skipped because it was fetched / analyzed / cached by an earlier run. Replays also drop
+    the client-side LLM rate limits, which only model the account's quota.
+    """
+    config.RESUME_FETCH = False
+    config.REFRESH_FETCH = False
+    config.RESUME_ANALYSIS = False
+    config.LLM_CACHE_BYPASS = True
+    if mode == "replay":
+        config.LLM_REQUESTS_PER_MINUTE = None
+        config.LLM_TOKENS_PER_MINUTE = None
+        if config.CLIENT_ID == "YOUR_CLIENT_ID":
+            # Credentials are never sent during a replay, but search_reddit refuses placeholders
+            config.CLIENT_ID = "replay"
+            config.CLIENT_SECRET = "replay"
+    return config
+
+def run_stages(config, stages: List[str]) -> Dict[str, float]:
+    # Imported here: the OpenAI clients are created at import time and must see the cassette settings
+    from reddit_keyword_search import search_reddit
+    from fetch_reddit_comments import fetch_comments
+    from flatten_reddit_data import flatten_reddit_data
+    from analyze_staging_claims import analyze_staging_claims
+    functions = {"search": search_reddit, "fetch": fetch_comments, "flatten": flatten_reddit_data, "analyze": analyze_staging_claims}
+    timings = {}
+    for stage in stages:
+        started_at = time.perf_counter()
+        functions[stage](config)
+        timings[stage] = round(time.perf_counter() - started_at, 3)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description='Record the main.py pipeline\'s Reddit and OpenAI traffic to cassettes, or replay it offline and time each stage')
+    parser.add_argument('--config', type=str, default='trump_staged', choices=['trump_staged', 'ghost_of_kyiv'], help='Configuration to use')
+    parser.add_argument('--mode', type=str, default='replay', choices=['record', 'replay'], help='record: run against the live APIs and save their responses; replay: run from the saved responses only')
+    parser.add_argument('--cassette_dir', type=str, default=None, help='Cassette directory (default: data/cassettes/<config>)')
+    parser.add_argument('--stages', type=str, nargs='+', default=STAGES, choices=STAGES, help='Pipeline stages to run, in order')
+    parser.add_argument('--repeat', type=int, default=3, help='Replays to time (record always runs once)')
+    parser.add_argument('--output', type=str, default=None, help='Write the timings to this JSON file')
+    args = parser.parse_args()
+
+    os.environ["HTTP_CASSETTE_MODE"] = args.mode
+    os.environ["HTTP_CASSETTE_DIR"] = args.cassette_dir or f"data/cassettes/{args.config}"
+    if args.mode == "replay":
+        os.environ.setdefault("OPENAI_API_KEY", "replay") # Never sent anywhere
+    from config import TrumpStagedConfig, GhostOfKievConfig
+    from http_cassette import cassette_counts, rewind_cassettes
+
+    if args.config == 'trump_staged':
+        config = TrumpStagedConfig()
+    elif args.config == 'ghost_of_kyiv':
+        config = GhostOfKievConfig()
+    else:
+        raise ValueError(f"Invalid configuration: {args.config}")
+    prepare_config(config, args.mode)
+    os.makedirs(config.RAW_DATA_DIR, exist_ok=True)
+    os.makedirs(config.PREPROCESSED_DATA_FOLDER, exist_ok=True)
+
+    runs = []
+    for run in range(1 if args.mode == "record" else max(1, args.repeat)):
+        rewind_cassettes()
+        timings = run_stages(config, args.stages)
+        runs.append(timings)
+        print(f"\nRun {run + 1} ({args.mode}): " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()))
+
+    print(f"\nPipeline timings ({args.mode}, {len(runs)} run(s); best / median seconds):")
+    summary = {}
+    for stage in args.stages:
+        values = sorted(run[stage] for run in runs)
+        summary[stage] = {"best": values[0], "median": values[len(values) // 2]}
+        print(f"  {stage:<8} {values[0]:8.2f} {values[len(values) // 2]:8.2f}")
+    print(f"Cassettes: {cassette_counts()}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"config": args.config, "mode": args.mode, "runs": runs, "summary": summary, "cassettes": cassette_counts()}, f, indent=2)
+        print(f"Saved timings to {args.output}")
+
+if __name__ == '__main__':
+    main()
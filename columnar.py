@@ -0,0 +1,183 @@
+import os
+from typing import Any, Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # Columnar output is optional
+    pa = None
+    pq = None
+
+# File extension per supported format
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("Columnar output needs pyarrow: pip install pyarrow")
+
+def flattened_schema() -> "pa.Schema":
+    """
+    One row per flattened post/comment. The ancestor chain is not stored: it is recovered by
+    following `parent_id` (and `root_id` is the thread's post).
+    """
+    require_pyarrow()
+    return pa.schema([
+        ("id", pa.string()),
+        ("is_post", pa.bool_()),
+        ("parent_id", pa.string()),
+        ("root_id", pa.string()),
+        ("subreddit", pa.string()),
+        ("author", pa.string()),
+        ("title", pa.string()),
+        ("selftext_preview", pa.string()),
+        ("body", pa.string()),
+        ("created_utc", pa.float64()),
+        ("score", pa.float64()), # Post scores are keyword match percentages
+        ("depth", pa.int32()),
+    ])
+
+def analysis_schema() -> "pa.Schema":
+    """
+    One row per analyzed comment/post, with the analysis already split into typed columns
+    (the same names `utils.flatten_one_level` produces).
+    """
+    require_pyarrow()
+    return pa.schema([
+        ("id", pa.string()),
+        ("is_post", pa.bool_()),
+        ("subreddit", pa.string()),
+        ("author", pa.string()),
+        ("title", pa.string()),
+        ("selftext_preview", pa.string()),
+        ("body", pa.string()),
+        ("created_utc", pa.float64()),
+        ("score", pa.float64()),
+        ("analysis_supports", pa.string()),
+        ("analysis_confidence", pa.float64()),
+        ("analysis_reasoning", pa.string()),
+    ])
+
+def as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def as_int(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def as_str(value: Any) -> Optional[str]:
+    return str(value) if value is not None else None
+
+def flattened_row(fields: Dict[str, Any], parent_id: Optional[str], root_id: str,
+                  attributes: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": as_str(fields.get("id")),
+        "is_post": parent_id is None,
+        "parent_id": parent_id,
+        "root_id": root_id,
+        "subreddit": as_str(attributes.get("subreddit", fields.get("subreddit"))),
+        "author": as_str(fields.get("author")),
+        "title": as_str(fields.get("title")),
+        "selftext_preview": as_str(fields.get("selftext_preview")),
+        "body": as_str(fields.get("body")),
+        "created_utc": as_float(fields.get("created_utc")),
+        "score": as_float(fields.get("score")),
+        "depth": as_int(fields.get("depth")),
+    }
+
+def analysis_row(record: Dict[str, Any], item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Row for an analyzed_comments record; `item` is the flattened item it came from (score, subreddit).
+    """
+    analysis = record.get("analysis", {})
+    return {
+        "id": as_str(record.get("id")),
+        "is_post": bool(record.get("is_post")),
+        "subreddit": as_str(item.get("subreddit")),
+        "author": as_str(record.get("author")),
+        "title": as_str(record.get("title")),
+        "selftext_preview": as_str(record.get("selftext_preview")),
+        "body": as_str(record.get("body")),
+        "created_utc": as_float(record.get("created_utc")),
+        "score": as_float(item.get("score")),
+        "analysis_supports": as_str(analysis.get("supports")),
+        "analysis_confidence": as_float(analysis.get("confidence")),
+        "analysis_reasoning": as_str(analysis.get("reasoning")),
+    }
+
+def table_path(base_path: str, table_format: str) -> str:
+    if table_format not in EXTENSIONS:
+        raise ValueError(f"Unknown columnar format '{table_format}' (expected one of {list(EXTENSIONS)})")
+    return base_path + EXTENSIONS[table_format]
+
+class ColumnarSink:
+    """
+    Writes rows to a Parquet or Arrow IPC file in record batches of `batch_size` rows, so a
+    large dataset never has to be converted to columns all at once.
+    """
+    def __init__(self, path: str, schema: "pa.Schema", table_format: str, batch_size: int = 50000):
+        require_pyarrow()
+        self.path = path
+        self.schema = schema
+        self.batch_size = batch_size
+        self.rows: List[Dict[str, Any]] = []
+        self.written = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if table_format == "parquet":
+            self.writer = pq.ParquetWriter(path, schema)
+        elif table_format == "arrow":
+            self.writer = pa.ipc.new_file(path, schema)
+        else:
+            raise ValueError(f"Unknown columnar format '{table_format}' (expected one of {list(EXTENSIONS)})")
+
+    def write(self, row: Dict[str, Any]) -> None:
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+        self.writer.write_batch(pa.RecordBatch.from_pylist(self.rows, schema=self.schema))
+        self.written += len(self.rows)
+        self.rows = []
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.flush()
+            self.writer.close()
+            self.writer = None
+
+    def __enter__(self) -> "ColumnarSink":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+def read_table(path: str, columns: Optional[List[str]] = None) -> "pa.Table":
+    """
+    Loads a table written by ColumnarSink. Arrow IPC files are memory-mapped (zero-copy);
+    Parquet files are decoded, reading only `columns` if given.
+    """
+    require_pyarrow()
+    if path.endswith(EXTENSIONS["arrow"]):
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        return table.select(columns) if columns else table
+    return pq.read_table(path, columns=columns)
+
+def load_dataframe(path: str, columns: Optional[List[str]] = None):
+    """
+    Loads a table as a pandas DataFrame with `created_utc` converted to datetimes.
+    """
+    df = read_table(path, columns).to_pandas()
+    if "created_utc" in df.columns:
+        import pandas as pd
+        df["created_utc"] = pd.to_datetime(df["created_utc"], unit="s")
+    return df
@@ -0,0 +1,192 @@
+import time
+from collections import deque
+from heapq import heapify, heappop, heappush
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+import praw
+
+
+class ExpansionPolicy:
+    """
+    How many "more comments" stubs of one submission are expanded (one API request each).
+    - fixed (default): the `max_calls` largest stubs, like replace_more(limit=max_calls)
+    - adaptive: stubs below the highest-scoring comments first (top-level stubs before all),
+      within `max_calls` requests and `max_seconds`, stopping early once the last `yield_window`
+      expansions brought fewer than `min_yield` new comments per request on average
+    """
+    def __init__(self, max_calls: Optional[int] = 10, max_seconds: Optional[float] = None,
+                 min_yield: Optional[float] = None, yield_window: int = 3, prioritize_score: bool = False):
+        self.max_calls = max_calls
+        self.max_seconds = max_seconds
+        self.min_yield = min_yield
+        self.yield_window = yield_window
+        self.prioritize_score = prioritize_score
+
+    @classmethod
+    def from_config(cls, config) -> "ExpansionPolicy":
+        if not config.ADAPTIVE_EXPANSION:
+            return cls(max_calls=config.MORE_COMMENTS_LIMIT)
+        return cls(
+            max_calls=config.EXPANSION_MAX_CALLS,
+            max_seconds=config.EXPANSION_MAX_SECONDS,
+            min_yield=config.EXPANSION_MIN_YIELD,
+            yield_window=config.EXPANSION_YIELD_WINDOW,
+            prioritize_score=True,
+        )
+
+    def priority(self, submission, more) -> float:
+        """
+        Heap priority of a stub (lower is expanded first). Ties are broken by PRAW's own
+        MoreComments order (largest count first), so the fixed policy matches replace_more.
+        """
+        if not self.prioritize_score:
+            return 0
+        if more.parent_id.startswith("t3_"):
+            return float("-inf")
+        parent = submission._comments_by_id.get(more.parent_id)
+        return -parent.score if parent is not None else 0
+
+def is_more_comments(comment) -> bool:
+    """
+    True for a "more comments" stub: a praw MoreComments, or a raw-listing stub (raw_reddit.RawMoreComments).
+    """
+    return isinstance(comment, praw.models.MoreComments) or getattr(comment, "is_more_comments", False) is True
+
+def expand_more_comments(submission, policy: Optional[ExpansionPolicy] = None) -> Dict[str, Any]:
+    """
+    Expands the submission's MoreComments according to `policy` (it follows PRAW's
+    CommentForest.replace_more, which it matches for the default fixed policy). Stubs left
+    when the budget runs out are removed.
+    Returns:
+        Counts of expanded and unexpanded MoreComments, the number of new comments the
+        expansions brought and why expansion stopped
+    """
+    policy = policy or ExpansionPolicy()
+    forest = submission.comments
+    started_at = time.monotonic()
+    # _gather_more_comments returns a heap of stubs; with equal priorities it stays a valid heap as is
+    heap = [(policy.priority(submission, more), more) for more in forest._gather_more_comments(forest._comments)]
+    if policy.prioritize_score:
+        heapify(heap)
+
+    def push(more):
+        heappush(heap, (policy.priority(submission, more), more))
+    counts: Dict[str, Any] = {"expanded": 0, "unexpanded": 0, "new_comments": 0, "stop_reason": "complete"}
+    recent_yields: Deque[int] = deque(maxlen=max(1, policy.yield_window))
+
+    while heap:
+        _, item = heappop(heap)
+        stop_reason = None
+        if policy.max_calls is not None and counts["expanded"] >= policy.max_calls:
+            stop_reason = "call_budget"
+        elif policy.max_seconds is not None and time.monotonic() - started_at >= policy.max_seconds:
+            stop_reason = "time_budget"
+        elif (policy.min_yield is not None and len(recent_yields) == recent_yields.maxlen
+              and sum(recent_yields) / len(recent_yields) < policy.min_yield):
+            stop_reason = "low_yield"
+        if stop_reason is not None:
+            counts["unexpanded"] += 1
+            counts["stop_reason"] = stop_reason
+            item._remove_from.remove(item)
+            continue
+
+        new_comments = item.comments(update=False)
+        counts["expanded"] += 1
+        new_count = sum(1 for comment in new_comments if not is_more_comments(comment))
+        counts["new_comments"] += new_count
+        recent_yields.append(new_count)
+
+        for more in forest._gather_more_comments(new_comments, parent_tree=forest._comments):
+            more.submission = submission
+            push(more)
+        for comment in new_comments:
+            forest._insert_comment(comment)
+        item._remove_from.remove(item)
+    return counts
+
+def comment_fields(comment) -> Dict[str, Any]:
+    """
+    The fields a relevance predicate looks at, read from a PRAW (or raw_reddit) Comment.
+    """
+    return {"score": comment.score, "body": comment.body if hasattr(comment, 'body') else "[deleted]"}
+
+def estimated_tree_bytes(comment) -> int:
+    """
+    Rough size of a comment subtree once serialized into comments_tree (body plus fixed fields).
+    """
+    total = 0
+    stack = [comment]
+    while stack:
+        node = stack.pop()
+        if is_more_comments(node):
+            continue
+        total += len(node.body if hasattr(node, 'body') else "[deleted]") + 130
+        stack.extend(node.replies)
+    return total
+
+def fetch_comments_tree(load_submission: Callable[[], Any], submission_info: Dict[str, Any],
+                        serialize: Callable[[Any], Optional[Dict[str, Any]]], counter=None,
+                        relevant: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                        policy: Optional[ExpansionPolicy] = None) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Expansion, relevance pruning, serialization and stats of one submission's comment tree,
+    shared by the PRAW and raw JSON fetch paths. `load_submission()` returns the submission
+    (PRAW's or raw_reddit's) and `serialize(comment)` turns a comment of its list() into a
+    comments_tree entry (None to skip it).
+    Returns (output_data, stats), as described in fetch_reddit_comments.fetch_submission_tree.
+    """
+    submission_id = submission_info.get('id')
+    started_at = time.time()
+    calls_before = counter.count if counter else 0
+    output_data = None
+    num_comments = None
+    pruned = {"pruned_threads": 0, "pruned_bytes": 0}
+    expansion = {}
+    fetched_comments = None
+
+    try:
+        submission = load_submission()
+        # How many "more comments" to expand is set by the expansion policy (MORE_COMMENTS_LIMIT,
+        # or the ADAPTIVE_EXPANSION budget); each expansion is one API request
+        print(f"  [{submission_id}] Fetching and replacing 'more comments' (can take time)...")
+        # Every stub is expanded as the policy allows, relevant parent or not: list() puts each
+        # hidden comment in comments_tree as an entry of its own, which the flattener keeps if it is relevant
+        expansion = expand_more_comments(submission, policy)
+        num_comments = submission.num_comments
+
+        processed_comments = []
+        # list() also repeats nested comments at the top level; comments_tree keeps that shape
+        comment_list = submission.comments.list()
+        fetched_comments = sum(1 for comment in comment_list if not is_more_comments(comment))
+        for top_level_comment in comment_list:
+            if relevant is not None and not is_more_comments(top_level_comment) \
+                    and not relevant(comment_fields(top_level_comment)):
+                # The flattener would drop this entry: don't serialize it
+                pruned["pruned_threads"] += 1
+                pruned["pruned_bytes"] += estimated_tree_bytes(top_level_comment)
+                continue
+            processed_comment = serialize(top_level_comment)
+            if processed_comment:
+                processed_comments.append(processed_comment)
+
+        print(f"  [{submission_id}] Processed {len(comment_list)} top-level comment threads.")
+        output_data = submission_info.copy()
+        output_data['comments_tree'] = processed_comments
+    except praw.exceptions.PRAWException as e:
+        print(f"  ERROR: PRAW error processing submission {submission_id}: {e}")
+    except Exception as e:
+        print(f"  ERROR: Unexpected error processing submission {submission_id}: {e}")
+
+    stats = {
+        "id": submission_id,
+        "seconds": round(time.time() - started_at, 3),
+        "api_calls": (counter.count - calls_before) if counter else None,
+        "num_comments": num_comments,
+        "fetched_comments": fetched_comments,
+        "coverage": round(fetched_comments / num_comments, 3) if fetched_comments is not None and num_comments else None,
+        "expanded_more_comments": expansion.get("expanded"),
+        "unexpanded_more_comments": expansion.get("unexpanded"),
+        "expansion_stop": expansion.get("stop_reason"),
+        "ok": output_data is not None,
+        **(pruned if relevant is not None else {})
+    }
+    return output_data, stats
@@ -10,8 +10,69 @@ class ClientConfig:
     CLIENT_ID = os.getenv("CLIENT_ID", "YOUR_CLIENT_ID") # Replace default or set env var
     CLIENT_SECRET = os.getenv("CLIENT_SECRET", "YOUR_CLIENT_SECRET") # Replace default or set env var
     USER_AGENT = os.getenv("USER_AGENT", "KeyphraseSearcher/0.1 by YourUsername") # Replace default or set env var
+    # Override to point PRAW at a local mock of Reddit's API
+    REDDIT_OAUTH_URL = os.getenv("REDDIT_OAUTH_URL", "https://oauth.reddit.com")
+    REDDIT_URL = os.getenv("REDDIT_URL", "https://www.reddit.com")
+    # --- Request pacing ---
+    SEARCH_MAX_WORKERS = 8 # Subreddits searched in parallel
+    FETCH_MAX_WORKERS = 4 # Submissions whose comment trees are fetched in parallel
+    RATE_LIMIT_RESERVE = 10 # Requests per rate-limit window left unused as a safety margin
+    RESUME_FETCH = True # Skip submissions already stored in SUBMISSION_SHARDS_FILENAME
+    REFRESH_FETCH = False # Re-fetch stored submissions whose num_comments grew since they were fetched
+    RAW_JSON_FETCH = False # Fetch comment trees as raw JSON listings over one pooled session (raw_reddit.py) instead of PRAW objects
+    # --- "More comments" expansion per submission (comment_expansion.py); one API request each ---
+    MORE_COMMENTS_LIMIT = 10 # Fixed policy: expand the largest N stubs
+    ADAPTIVE_EXPANSION = False # Adaptive policy: stubs below the highest-score comments first, within a budget
+    EXPANSION_MAX_CALLS = 50 # Adaptive: request budget per submission (None: unlimited)
+    EXPANSION_MAX_SECONDS = 60 # Adaptive: time budget per submission (None: unlimited)
+    EXPANSION_MIN_YIELD = 5 # Adaptive: stop when expansions bring fewer new comments per request than this...
+    EXPANSION_YIELD_WINDOW = 3 # ...averaged over the last N expansions
+    # --- Comment relevance (relevance.py), shared by the fetcher and the flattener ---
+    RELEVANCE_PREDICATE = "score_or_kyiv" # Which comments_tree entries are kept ("all" keeps everything)
+    PRUNE_IRRELEVANT_AT_FETCH = False # Apply it while fetching: don't serialize entries the flattener would drop
 
-class TrumpStagedConfig: 
+class LLMConfig:
+    # --- LLM classification engine ---
+    # Point the OpenAI client at a local stub server by setting OPENAI_BASE_URL in .env
+    LLM_MAX_CONCURRENCY = 8 # Number of requests in flight at once
+    LLM_REQUESTS_PER_MINUTE = 500 # Set to your account's RPM limit (None disables)
+    LLM_TOKENS_PER_MINUTE = 30000 # Set to your account's TPM limit (None disables)
+    LLM_MAX_RETRIES = 5 # Retries on 429/5xx/connection errors, with exponential backoff
+    # Content-addressed response cache shared by all configs (keys include the full prompt)
+    LLM_CACHE_FILENAME = "data/cache/llm_cache.sqlite"
+    LLM_CACHE_MAX_BYTES = 1024 * 1024 * 1024 # LRU eviction above this size
+    LLM_CACHE_BYPASS = False # Always call the API (fresh responses still refresh the cache)
+    # "online" sends one request per comment; "batch" uses the (cheaper, slower) Batch API
+    ANALYSIS_BACKEND = "online"
+    BATCH_MAX_REQUESTS_PER_FILE = 50000 # Batch API limit per input file
+    BATCH_POLL_INTERVAL = 60 # Seconds between batch status checks
+    # Comments classified per request in the online backend (1 = one request per comment).
+    # Items missing from a packed reply fall back to single requests.
+    ANALYSIS_PACK_SIZE = 1
+    # Submit comments grouped by thread so siblings share a cacheable post + ancestor prefix
+    ORDER_BY_THREAD = True
+    USE_PROMPT_CACHE_KEY = True # Send the thread's post id as prompt_cache_key
+    CONTEXT_MAX_ANCESTOR_TOKENS = None # Drop middle ancestors past this budget (None keeps the full chain)
+    ANALYSIS_CHECKPOINT_EVERY = 100 # fsync the streamed analysis results every N comments
+    RESUME_ANALYSIS = True # Skip comments already analyzed in STAGING_CLAIMS_RESULTS_FILENAME
+    # --- Near-duplicate collapse before classification (near_duplicates.py) ---
+    DEDUP_NEAR_DUPLICATES = False # Classify one representative per group of near-duplicate comments
+    DEDUP_THRESHOLD = 0.8 # MinHash-estimated Jaccard similarity (word 3-grams) to join a group
+    DEDUP_MIN_CHARS = 40 # Shorter comments are always classified on their own
+    DEDUP_NUM_PERM = 128
+    DEDUP_BANDS = 16 # LSH bands (DEDUP_NUM_PERM / DEDUP_BANDS rows each)
+    DEDUP_EMBEDDING_MODEL = None # e.g. "all-MiniLM-L6-v2" to also merge paraphrases (needs sentence-transformers, runs on CPU)
+    DEDUP_EMBEDDING_THRESHOLD = 0.95 # Cosine similarity for the embedding merge
+    # --- Local triage before the LLM (triage.py) ---
+    USE_TRIAGE = False # Label confident items with the model trained by `python triage.py` (needs scikit-learn)
+    TRIAGE_MAX_UNCERTAINTY = 0.1 # Items with 1 - p(label) above this go to the LLM (see the calibration report)
+    TRIAGE_ACCEPT_LABELS = ["neutral"] # Labels the triage may assign on its own
+    # --- Reason summaries (summarize_reasons.py) ---
+    SUMMARY_CHUNK_TOKENS = 60000 # Larger contexts are summarized per chunk, then merged (map-reduce)
+    SUMMARY_FAN_OUT = 4 # Chunk / merge requests in flight per summary
+    SUMMARY_MERGE_FAN_IN = 8 # Partial summaries merged per reduce request
+
+class TrumpStagedConfig(ClientConfig, LLMConfig): 
     name = "trump_assassination"
     # List of keyphrases to search for (case-insensitive)
     KEYPHRASES = ["trump ear", "trump assassination ear", "trump assassination attempt", "trump blood ear", "trump bit lip"]
@@ -26,14 +87,31 @@ class TrumpStagedConfig:
     SEARCH_RESULTS_FILENAME = f"{RAW_DATA_DIR}/reddit_search_results.json"
     # Input and Output Filenames
     SUBMISSIONS_WITH_COMMENTS_FILENAME = f"{RAW_DATA_DIR}/reddit_submissions_with_comments.json"
-    # Delay between processing submissions (in seconds) to avoid rate limits
-    DELAY_BETWEEN_SUBMISSIONS = 2 # Be nice to Reddit's API
+    FETCH_STATS_FILENAME = f"{RAW_DATA_DIR}/fetch_stats.json" # Per-submission fetch time and API calls
+    # One line per fetched submission tree, appended as soon as it is fetched (used to resume)
+    SUBMISSION_SHARDS_FILENAME = f"{RAW_DATA_DIR}/reddit_submissions_with_comments.jsonl"
     FLATTENED_DATA_FILENAME = f"{RAW_DATA_DIR}/flattened_reddit_data.json"
+    # Stream posts through the flattener and write compact JSONL (flat peak memory on large corpora)
+    STREAM_FLATTENED_DATA = False
+    FLATTENED_DATA_JSONL_FILENAME = f"{RAW_DATA_DIR}/flattened_reddit_data.jsonl"
+    # Also write typed columnar copies of the flattened / analyzed data: None, "parquet" or "arrow" (needs pyarrow)
+    COLUMNAR_FORMAT = None
+    FLATTENED_DATA_TABLE = f"{RAW_DATA_DIR}/flattened_reddit_data" # Extension added per format
     PREPROCESSED_DATA_FOLDER = f"data/preprocessed/{name}"
     STAGING_CLAIMS_ANALYSIS_FILENAME = f"{PREPROCESSED_DATA_FOLDER}/staging_claims_analysis.json"
+    STAGING_CLAIMS_ANALYSIS_TABLE = f"{PREPROCESSED_DATA_FOLDER}/staging_claims_analysis" # Extension added per format
+    # Append-only per-comment results, streamed while analyzing (used to resume)
+    STAGING_CLAIMS_RESULTS_FILENAME = f"{PREPROCESSED_DATA_FOLDER}/staging_claims_analysis.jsonl"
+    BATCH_DIR = f"{PREPROCESSED_DATA_FOLDER}/batches" # Batch API request files and manifest
     SKIP_DELETED_PARENTS = True
+    # Every stage also writes to an indexed SQLite corpus (submissions, comments, analyses, skip reasons)
+    USE_CORPUS_STORE = False
+    CORPUS_DB_FILENAME = f"data/corpus/{name}.sqlite"
+    # Local triage model (trained on STAGING_CLAIMS_ANALYSIS_FILENAME) and its calibration report
+    TRIAGE_MODEL_FILENAME = f"{PREPROCESSED_DATA_FOLDER}/triage_model.pkl"
+    TRIAGE_REPORT_FILENAME = f"{PREPROCESSED_DATA_FOLDER}/triage_calibration.json"
 
-class GhostOfKievConfig: 
+class GhostOfKievConfig(ClientConfig, LLMConfig): 
     name = "ghost_of_kyiv"
     # List of keyphrases to search for (case-insensitive)
     KEYPHRASES = ["ghost of Kiev", "ghost of kyiv", "mig-29 legend", "stepan tarabalka" "ghost ukraine dcs footage"]
@@ -50,9 +128,26 @@ class GhostOfKievConfig:
     SEARCH_RESULTS_FILENAME = f"{RAW_DATA_DIR}/reddit_search_results.json"
     # Input and Output Filenames
     SUBMISSIONS_WITH_COMMENTS_FILENAME = f"{RAW_DATA_DIR}/reddit_submissions_with_comments.json"
-    # Delay between processing submissions (in seconds) to avoid rate limits
-    DELAY_BETWEEN_SUBMISSIONS = 2 # Be nice to Reddit's API
+    FETCH_STATS_FILENAME = f"{RAW_DATA_DIR}/fetch_stats.json" # Per-submission fetch time and API calls
+    # One line per fetched submission tree, appended as soon as it is fetched (used to resume)
+    SUBMISSION_SHARDS_FILENAME = f"{RAW_DATA_DIR}/reddit_submissions_with_comments.jsonl"
     FLATTENED_DATA_FILENAME = f"{RAW_DATA_DIR}/flattened_reddit_data.json"
+    # Stream posts through the flattener and write compact JSONL (flat peak memory on large corpora)
+    STREAM_FLATTENED_DATA = False
+    FLATTENED_DATA_JSONL_FILENAME = f"{RAW_DATA_DIR}/flattened_reddit_data.jsonl"
+    # Also write typed columnar copies of the flattened / analyzed data: None, "parquet" or "arrow" (needs pyarrow)
+    COLUMNAR_FORMAT = None
+    FLATTENED_DATA_TABLE = f"{RAW_DATA_DIR}/flattened_reddit_data" # Extension added per format
     PREPROCESSED_DATA_FOLDER = f"data/preprocessed/{name}"
     STAGING_CLAIMS_ANALYSIS_FILENAME = f"{PREPROCESSED_DATA_FOLDER}/staging_claims_analysis.json"
-    SKIP_DELETED_PARENTS = True
\ No newline at end of file
+    STAGING_CLAIMS_ANALYSIS_TABLE = f"{PREPROCESSED_DATA_FOLDER}/staging_claims_analysis" # Extension added per format
+    # Append-only per-comment results, streamed while analyzing (used to resume)
+    STAGING_CLAIMS_RESULTS_FILENAME = f"{PREPROCESSED_DATA_FOLDER}/staging_claims_analysis.jsonl"
+    BATCH_DIR = f"{PREPROCESSED_DATA_FOLDER}/batches" # Batch API request files and manifest
+    SKIP_DELETED_PARENTS = True
+    # Every stage also writes to an indexed SQLite corpus (submissions, comments, analyses, skip reasons)
+    USE_CORPUS_STORE = False
+    CORPUS_DB_FILENAME = f"data/corpus/{name}.sqlite"
+    # Local triage model (trained on STAGING_CLAIMS_ANALYSIS_FILENAME) and its calibration report
+    TRIAGE_MODEL_FILENAME = f"{PREPROCESSED_DATA_FOLDER}/triage_model.pkl"
+    TRIAGE_REPORT_FILENAME = f"{PREPROCESSED_DATA_FOLDER}/triage_calibration.json"
\ No newline at end of file
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id TEXT PRIMARY KEY,
+    subreddit TEXT,
+    title TEXT,
+    selftext TEXT,
+    created_utc REAL,
+    match_score REAL, -- Keyword match percentage from the search
+    matched_keywords TEXT, -- JSON list
+    num_comments INTEGER, -- At fetch time
+    fetched_utc REAL,
+    clean_title TEXT, -- Set by the flattener
+    clean_selftext TEXT
+);
+CREATE TABLE IF NOT EXISTS comments (
+    id TEXT PRIMARY KEY,
+    submission_id TEXT NOT NULL,
+    parent_id TEXT NOT NULL, -- Parent comment id, or the submission id for top-level comments
+    depth INTEGER,
+    author TEXT,
+    body TEXT,
+    created_utc REAL,
+    score INTEGER,
+    clean_body TEXT -- Set by the flattener for the comments it keeps (NULL = filtered out)
+);
+CREATE TABLE IF NOT EXISTS analyses (
+    id TEXT PRIMARY KEY,
+    is_post INTEGER NOT NULL,
+    created_utc REAL,
+    supports TEXT,
+    confidence REAL,
+    reasoning TEXT,
+    analyzed_utc REAL
+);
+CREATE TABLE IF NOT EXISTS skip_reasons (
+    id TEXT PRIMARY KEY,
+    author TEXT,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS submissions_created_utc ON submissions (created_utc);
+CREATE INDEX IF NOT EXISTS submissions_subreddit ON submissions (subreddit, created_utc);
+CREATE INDEX IF NOT EXISTS comments_submission_id ON comments (submission_id);
+CREATE INDEX IF NOT EXISTS comments_parent_id ON comments (parent_id);
+CREATE INDEX IF NOT EXISTS comments_created_utc ON comments (created_utc);
+CREATE INDEX IF NOT EXISTS analyses_supports_created_utc ON analyses (supports, created_utc);
+CREATE INDEX IF NOT EXISTS analyses_created_utc ON analyses (created_utc);
+"""
+
+
+class CorpusStore:
+    """
+    Local SQLite store that every pipeline stage writes to, next to its JSON output:
+    search results and fetch metadata (submissions), comment trees as rows with parent id and
+    depth (comments), classification results (analyses) and skip reasons. Indexes on
+    created_utc, subreddit, supports and parent id make date / label / thread queries index
+    lookups instead of full reloads of the stage files.
+    The store is used from one thread (stages write from their main thread).
+    """
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    # --- Writers (one transaction per call) ---
+
+    def add_search_results(self, results: Iterable[Dict[str, Any]]) -> None:
+        rows = [
+            (r.get("id"), r.get("subreddit"), r.get("title"), r.get("selftext_preview"), r.get("created_utc"),
+             r.get("score"), json.dumps(r.get("matched_keywords", [])))
+            for r in results
+        ]
+        with self.connection:
+            # Keep fetch metadata and cleaned text of submissions seen in an earlier search
+            self.connection.executemany("""
+                INSERT INTO submissions (id, subreddit, title, selftext, created_utc, match_score, matched_keywords)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    subreddit = excluded.subreddit, title = excluded.title, selftext = excluded.selftext,
+                    created_utc = excluded.created_utc, match_score = excluded.match_score,
+                    matched_keywords = excluded.matched_keywords
+            """, rows)
+
+    def add_comment_tree(self, submission: Dict[str, Any], num_comments: Optional[int] = None) -> int:
+        """
+        Stores a fetched submission's comments_tree as one row per comment (replacing the rows
+        of an earlier fetch). Returns the number of distinct comments stored.
+        """
+        submission_id = submission.get("id")
+        rows = {}
+        stack = [(comment, submission_id) for comment in submission.get("comments_tree", [])]
+        while stack:
+            comment, parent_id = stack.pop()
+            comment_id = comment.get("id")
+            # comments_tree lists nested comments again at the top level: keep the nested parent
+            if comment_id not in rows or parent_id != submission_id:
+                rows[comment_id] = (comment_id, submission_id, parent_id, comment.get("depth"), comment.get("author"),
+                                    comment.get("body"), comment.get("created_utc"), comment.get("score"))
+            stack.extend((reply, comment_id) for reply in comment.get("replies", []))
+        with self.connection:
+            self.connection.execute("DELETE FROM comments WHERE submission_id = ?", (submission_id,))
+            self.connection.executemany("""
+                INSERT OR REPLACE INTO comments (id, submission_id, parent_id, depth, author, body, created_utc, score)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows.values())
+            self.connection.execute("""
+                INSERT INTO submissions (id, subreddit, title, selftext, created_utc, num_comments, fetched_utc)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET num_comments = excluded.num_comments, fetched_utc = excluded.fetched_utc
+            """, (submission_id, submission.get("subreddit"), submission.get("title"), submission.get("selftext_preview"),
+                  submission.get("created_utc"), num_comments, time.time()))
+        return len(rows)
+
+    def add_flattened_items(self, items: Iterable[Tuple[Dict[str, Any], bool]]) -> None:
+        """
+        Records the cleaned text of flattened items, given as (item fields, is_post) pairs.
+        """
+        posts = []
+        comments = []
+        for fields, is_post in items:
+            if is_post:
+                posts.append((fields.get("title"), fields.get("selftext_preview"), fields.get("id")))
+            else:
+                comments.append((fields.get("body"), fields.get("id")))
+        with self.connection:
+            self.connection.executemany("UPDATE submissions SET clean_title = ?, clean_selftext = ? WHERE id = ?", posts)
+            self.connection.executemany("UPDATE comments SET clean_body = ? WHERE id = ?", comments)
+
+    def add_analyses(self, records: Iterable[Dict[str, Any]]) -> None:
+        now = time.time()
+        rows = []
+        for record in records:
+            analysis = record.get("analysis", {})
+            rows.append((record.get("id"), 1 if record.get("is_post") else 0, record.get("created_utc"),
+                         analysis.get("supports"), analysis.get("confidence"), analysis.get("reasoning"), now))
+        with self.connection:
+            self.connection.executemany("""
+                INSERT OR REPLACE INTO analyses (id, is_post, created_utc, supports, confidence, reasoning, analyzed_utc)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+
+    def add_skipped(self, skipped: Iterable[Dict[str, Any]]) -> None:
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO skip_reasons (id, author, reason) VALUES (?, ?, ?)",
+                [(s.get("comment_id"), s.get("author"), s.get("reason")) for s in skipped]
+            )
+
+    # --- Queries ---
+
+    def analyses_between(self, start_utc: float, end_utc: Optional[float] = None,
+                         supports: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Analyses with start_utc <= created_utc (< end_utc), optionally for one support label,
+        joined with the analyzed text. Served by the (supports, created_utc) index.
+        """
+        query = """
+            SELECT a.*, COALESCE(c.clean_body, c.body) AS body,
+                   COALESCE(s.clean_title, s.title) AS title, COALESCE(s.clean_selftext, s.selftext) AS selftext_preview
+            FROM analyses a
+            LEFT JOIN comments c ON a.is_post = 0 AND c.id = a.id
+            LEFT JOIN submissions s ON a.is_post = 1 AND s.id = a.id
+            WHERE a.created_utc >= ?
+        """
+        params: List[Any] = [start_utc]
+        if end_utc is not None:
+            query += " AND a.created_utc < ?"
+            params.append(end_utc)
+        if supports is not None:
+            query += " AND a.supports = ?"
+            params.append(supports)
+        query += " ORDER BY a.created_utc"
+        return [dict(row) for row in self.connection.execute(query, params)]
+
+    def analysis_records_between(self, start_utc: float, end_utc: Optional[float] = None,
+                                 supports: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        analyses_between, shaped like the analyzed_comments entries of the analysis JSON file.
+        """
+        records = []
+        for row in self.analyses_between(start_utc, end_utc, supports):
+            record: Dict[str, Any] = {"id": row["id"], "is_post": bool(row["is_post"]), "created_utc": row["created_utc"]}
+            if row["is_post"]:
+                record["title"] = row["title"]
+                record["selftext_preview"] = row["selftext_preview"]
+            else:
+                record["body"] = row["body"]
+            record["analysis"] = {"supports": row["supports"], "confidence": row["confidence"], "reasoning": row["reasoning"]}
+            records.append(record)
+        return records
+
+    def replies(self, parent_id: str) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self.connection.execute(
+            "SELECT * FROM comments WHERE parent_id = ? ORDER BY created_utc", (parent_id,))]
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            table: self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("submissions", "comments", "analyses", "skip_reasons")
+        }
+
+    def close(self) -> None:
+        self.connection.close()
+
+def store_from_config(config) -> Optional[CorpusStore]:
+    """
+    Opens the config's corpus store, or returns None if it is disabled.
+    """
+    if not config.USE_CORPUS_STORE:
+        return None
+    return CorpusStore(config.CORPUS_DB_FILENAME)
@@ -3,7 +3,16 @@ import json
 import os
 import time
 import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
 from dotenv import load_dotenv
+from reddit_client import RedditRateBudget, RequestCounter, make_reddit
+from json_stream import JsonlSink, load_jsonl_by_id
+from corpus_store import store_from_config
+from comment_expansion import ExpansionPolicy, fetch_comments_tree
+from relevance import relevance_predicate
+from raw_reddit import RawRedditFetcher, fetch_submission_tree_raw
 
 # Load environment variables from .env file
 load_dotenv()
@@ -50,9 +59,64 @@ def process_comment_node(comment):
 
     return comment_data
 
+def fetch_submission_tree(reddit, submission_info, counter=None,
+                          relevant: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                          policy: Optional[ExpansionPolicy] = None):
+    """
+    Fetches one submission's comment tree, expanding "more comments" as `policy` allows
+    (default: the 10 largest, as replace_more(limit=10) did).
+    With a `relevant` predicate (the flattener's), comments_tree entries it rejects are not
+    serialized (the flattener would drop them); what is fetched does not change.
+    Returns (output_data, stats): output_data is the submission info with its 'comments_tree'
+    (None on error), stats holds the fetch time, number of API calls, expansion and coverage
+    (distinct comments fetched / num_comments) and what was pruned.
+    """
+    submission_id = submission_info.get('id')
+
+    def load_submission():
+        print(f"  Fetching submission object... ID: {submission_id}")
+        return reddit.submission(id=submission_id)
+
+    return fetch_comments_tree(load_submission, submission_info, process_comment_node, counter, relevant, policy)
+
+def current_num_comments(reddit, submission_ids: List[str]) -> Dict[str, int]:
+    """
+    Looks up the live comment count of many submissions (100 per /api/info request).
+    """
+    counts = {}
+    for start in range(0, len(submission_ids), 100):
+        fullnames = [f"t3_{submission_id}" for submission_id in submission_ids[start:start + 100]]
+        for submission in reddit.info(fullnames=fullnames):
+            counts[submission.id] = submission.num_comments
+    return counts
+
+def select_submissions_to_fetch(reddit, jobs, fetched: Dict[str, Dict[str, Any]], refresh: bool):
+    """
+    Drops jobs whose submission already has a shard in the store. In refresh mode, stored
+    submissions whose comment count grew since they were fetched are fetched again.
+    """
+    pending = [job for job in jobs if job[1]['id'] not in fetched]
+    stored = [job for job in jobs if job[1]['id'] in fetched]
+    if not refresh or not stored:
+        return pending
+    print(f"Refresh: checking comment counts of {len(stored)} stored submissions...")
+    counts = current_num_comments(reddit, [submission_info['id'] for _, submission_info in stored])
+    grown = [
+        job for job in stored
+        if counts.get(job[1]['id'], 0) > (fetched[job[1]['id']].get('num_comments') or 0)
+    ]
+    print(f"Refresh: {len(grown)} stored submissions have new comments.")
+    return sorted(pending + grown, key=lambda job: job[0])
+
 def fetch_comments(config):
     """
     Loads submission data, fetches comments, and saves the combined data.
+    Submissions are fetched by a pool of workers sharing one adaptive rate budget
+    (driven by Reddit's rate-limit headers) instead of sleeping between submissions.
+    Every finished tree is appended to the SUBMISSION_SHARDS_FILENAME store right away, so an
+    interrupted run resumes with the submissions that are not stored yet (RESUME_FETCH), and
+    REFRESH_FETCH re-fetches stored submissions whose comment count grew.
+    With PRUNE_IRRELEVANT_AT_FETCH, the flattener's relevance predicate is applied while fetching.
     """
     CLIENT_ID = config.CLIENT_ID
     CLIENT_SECRET = config.CLIENT_SECRET
@@ -60,8 +124,9 @@ def fetch_comments(config):
 
     INPUT_JSON_FILENAME = config.SEARCH_RESULTS_FILENAME
     OUTPUT_JSON_FILENAME = config.SUBMISSIONS_WITH_COMMENTS_FILENAME
+    SHARDS_FILENAME = config.SUBMISSION_SHARDS_FILENAME
+    STATS_JSON_FILENAME = config.FETCH_STATS_FILENAME
 
-    DELAY_BETWEEN_SUBMISSIONS = config.DELAY_BETWEEN_SUBMISSIONS # Be nice to Reddit's API
     # --- Input Validation and Setup ---
     if CLIENT_ID == "YOUR_CLIENT_ID" or CLIENT_SECRET == "YOUR_CLIENT_SECRET":
         print("ERROR: Please configure Reddit API credentials in your .env file.")
@@ -92,14 +157,11 @@ def fetch_comments(config):
     print(f"Found {len(submissions_to_process)} submissions to process.")
 
     # --- PRAW Initialization ---
+    # Request budget shared by all workers (replaces the fixed delay between submissions)
+    rate_budget = RedditRateBudget(reserve=config.RATE_LIMIT_RESERVE)
     print("Initializing Reddit connection...")
     try:
-        reddit = praw.Reddit(
-            client_id=CLIENT_ID,
-            client_secret=CLIENT_SECRET,
-            user_agent=USER_AGENT,
-            # read_only=True # Usually fine for fetching comments
-        )
+        reddit = make_reddit(config, rate_budget=rate_budget)
         reddit.read_only # Test connection
         print(f"Reddit connection successful (Read Only: {reddit.read_only}).")
     except Exception as e:
@@ -107,64 +169,99 @@ def fetch_comments(config):
         return
 
     # --- Main Processing Loop ---
-    all_submissions_data = []
     total_submissions = len(submissions_to_process)
-
+    jobs = []
     for index, submission_info in enumerate(submissions_to_process):
-        submission_id = submission_info.get('id')
-        if not submission_id:
+        if not submission_info.get('id'):
             print(f"Warning: Skipping entry {index+1} due to missing 'id'.")
             continue
+        jobs.append((index, submission_info))
 
-        print(f"\nProcessing submission {index+1}/{total_submissions}: ID {submission_id} (r/{submission_info.get('subreddit', 'N/A')}) - '{submission_info.get('title', 'N/A')[:50]}...'" )
-
+    # Submissions already in the shard store are skipped (or refreshed if they grew)
+    fetched = load_jsonl_by_id(SHARDS_FILENAME) if config.RESUME_FETCH else {}
+    if fetched:
+        print(f"Found {len(fetched)} fetched submissions in {SHARDS_FILENAME}.")
         try:
-            print(f"  Fetching submission object... ID: {submission_id}")
-            submission = reddit.submission(id=submission_id)
-
-            # Crucial step: Replace MoreComments objects to get the full tree
-            # This can trigger multiple API requests depending on the tree size.
-            print("  Fetching and replacing 'more comments' (can take time)...")
-            # set a limit upto some threshold, whats a good number and what does it mean
-
-            submission.comments.replace_more(limit=10) # limit=None fetches all
-            print("  Finished fetching comments.")
-
-            processed_comments = []
-            print("  Processing comment tree...")
-            # Get the list of top-level comments
-            comment_list = submission.comments.list()
-            for top_level_comment in comment_list:
-                 processed_comment = process_comment_node(top_level_comment)
-                 if processed_comment:
-                     processed_comments.append(processed_comment)
-
-            print(f"  Processed {len(comment_list)} top-level comment threads.")
-
-            # Combine original submission info with processed comments
-            output_data = submission_info.copy() # Start with original data
-            output_data['comments_tree'] = processed_comments # Add the structured comments
-
-            all_submissions_data.append(output_data)
-
-        except praw.exceptions.PRAWException as e:
-            print(f"  ERROR: PRAW error processing submission {submission_id}: {e}")
-            # Optionally add placeholder or skip
+            jobs = select_submissions_to_fetch(reddit, jobs, fetched, config.REFRESH_FETCH)
         except Exception as e:
-            print(f"  ERROR: Unexpected error processing submission {submission_id}: {e}")
-            # Optionally add placeholder or skip
-
-        # Delay to avoid hitting rate limits
-        print(f"  Waiting {DELAY_BETWEEN_SUBMISSIONS} seconds...")
-        time.sleep(DELAY_BETWEEN_SUBMISSIONS)
+            print(f"ERROR: Could not check comment counts, fetching only new submissions. Details: {e}")
+            jobs = select_submissions_to_fetch(reddit, jobs, fetched, refresh=False)
+    print(f"{len(jobs)} submissions to fetch.")
+
+    # The flattener's relevance predicate, applied while fetching
+    relevant = relevance_predicate(config) if config.PRUNE_IRRELEVANT_AT_FETCH else None
+    policy = ExpansionPolicy.from_config(config)
+
+    # PRAW clients (and raw fetcher sessions) are not thread-safe: one client (and API call counter) per worker thread
+    worker_state = threading.local()
+
+    def fetch_worker(job):
+        index, submission_info = job
+        if not hasattr(worker_state, "client"):
+            worker_state.counter = RequestCounter()
+            if config.RAW_JSON_FETCH:
+                worker_state.client = RawRedditFetcher(config, rate_budget=rate_budget, counter=worker_state.counter)
+            else:
+                worker_state.client = make_reddit(config, rate_budget=rate_budget, counter=worker_state.counter)
+        print(f"\nProcessing submission {index+1}/{total_submissions}: ID {submission_info['id']} (r/{submission_info.get('subreddit', 'N/A')}) - '{submission_info.get('title', 'N/A')[:50]}...'" )
+        if config.RAW_JSON_FETCH:
+            return fetch_submission_tree_raw(worker_state.client, submission_info, worker_state.counter, relevant, policy)
+        return fetch_submission_tree(worker_state.client, submission_info, worker_state.counter, relevant, policy)
+
+    fetch_stats = []
+    store = store_from_config(config)
+    with JsonlSink(SHARDS_FILENAME, checkpoint_every=1, resume=config.RESUME_FETCH) as shards, \
+            ThreadPoolExecutor(max_workers=max(1, config.FETCH_MAX_WORKERS)) as executor:
+        futures = [executor.submit(fetch_worker, job) for job in jobs]
+        # Each tree is stored as soon as it is done; a refreshed tree supersedes the older line
+        for future in as_completed(futures):
+            output_data, stats = future.result()
+            fetch_stats.append(stats)
+            if output_data is not None:
+                shard = {
+                    "id": stats["id"],
+                    "fetched_utc": time.time(),
+                    "num_comments": stats["num_comments"],
+                    "submission": output_data
+                }
+                shards.write(shard)
+                fetched[shard["id"]] = shard
+                if store is not None:
+                    store.add_comment_tree(output_data, stats["num_comments"])
+    if store is not None:
+        print(f"Stored comment trees in {store.path}: {store.counts()}")
+        store.close()
+
+    # The combined file keeps the search-results order
+    all_submissions_data = [
+        fetched[submission_info['id']]["submission"]
+        for submission_info in submissions_to_process
+        if submission_info.get('id') in fetched
+    ]
 
     # --- Save Results ---
     print(f"\nFinished processing all submissions.")
+    total_seconds = sum(stats["seconds"] for stats in fetch_stats)
+    total_calls = sum(stats["api_calls"] or 0 for stats in fetch_stats)
+    print(f"Fetch stats: {total_calls} API calls, {total_seconds:.1f}s of worker time over {len(fetch_stats)} fetched submissions.")
+    covered = [stats for stats in fetch_stats if stats.get("coverage") is not None]
+    if covered:
+        fetched_total = sum(stats["fetched_comments"] for stats in covered)
+        num_total = sum(stats["num_comments"] for stats in covered)
+        print(f"Coverage: {fetched_total} of {num_total} comments fetched ({fetched_total / max(1, num_total):.1%}), "
+              f"{sum(stats['expanded_more_comments'] or 0 for stats in covered)} 'more comments' expanded, "
+              f"{sum(stats['unexpanded_more_comments'] or 0 for stats in covered)} left unexpanded.")
+    if relevant is not None:
+        print(f"Relevance pruning: skipped {sum(stats.get('pruned_threads', 0) for stats in fetch_stats)} irrelevant "
+              f"entries (~{sum(stats.get('pruned_bytes', 0) for stats in fetch_stats) / 1e6:.2f} MB of JSON).")
     print(f"Saving {len(all_submissions_data)} processed submissions with comments to {OUTPUT_JSON_FILENAME}...")
     try:
         with open(OUTPUT_JSON_FILENAME, 'w', encoding='utf-8') as f:
             json.dump(all_submissions_data, f, indent=4, ensure_ascii=False)
         print(f"Successfully saved results to {OUTPUT_JSON_FILENAME}")
+        with open(STATS_JSON_FILENAME, 'w', encoding='utf-8') as f:
+            json.dump(fetch_stats, f, indent=4)
+        print(f"Saved per-submission fetch stats to {STATS_JSON_FILENAME}")
     except IOError as e:
         print(f"ERROR: Could not write results to file {OUTPUT_JSON_FILENAME}. Error: {e}")
     except Exception as e:
@@ -1,41 +1,108 @@
+import os
 import json
+import argparse
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+from config import TrumpStagedConfig, GhostOfKievConfig
+from json_stream import JsonArrayWriter, JsonlSink, iter_records
 
-# Define file paths
-staging_analysis_file = 'data/staging_claims_analysis.json'
-flattened_data_file = 'data/flattened_reddit_data.json'
-output_file = 'data/flattened_reddit_data_skipped.json'
+PARTITIONS = ["skipped", "kept", "duplicates"]
 
-try:
-    # Load skipped comment IDs
+
+def load_skipped_ids(staging_analysis_file: str) -> List[str]:
+    """
+    Comment ids of the analysis' skipped_comments, in order (with repeats).
+    """
     with open(staging_analysis_file, 'r') as f:
         staging_data = json.load(f)
-    # Assuming skipped_comments is a list of dicts, e.g., [{'id': 'id1'}, {'id': 'id2'}]
-    skipped_ids = [item['comment_id'] for item in staging_data.get('skipped_comments', [])]
-    #find duplicates in skipped_ids count them, and remove them
-    duplicates = [id for id in skipped_ids if skipped_ids.count(id) > 1]
-    print(len(duplicates), f"duplicates first 10: {duplicates[0:10]}")
-    skipped_ids = [id for id in skipped_ids if id not in duplicates]
+    return [item['comment_id'] for item in staging_data.get('skipped_comments', [])]
+
+def split_skipped_ids(skip_counts: Counter) -> Tuple[Set[str], Set[str]]:
+    """
+    Returns (ids skipped exactly once, ids skipped more than once).
+    """
+    skipped_ids = {comment_id for comment_id, count in skip_counts.items() if count == 1}
+    duplicate_ids = {comment_id for comment_id, count in skip_counts.items() if count > 1}
+    return skipped_ids, duplicate_ids
 
+def partition_filename(flattened_data_file: str, partition: str) -> str:
+    """
+    Output file of a partition, next to and in the format of the flattened data
+    (e.g. flattened_reddit_data_skipped.json).
+    """
+    base, extension = os.path.splitext(flattened_data_file)
+    return f"{base}_{partition}{extension}"
+
+def filter_skipped_comments(config, partitions: List[str]) -> Dict[str, int]:
+    """
+    Splits the flattened data into the requested partitions in one streamed pass:
+    - skipped: items whose id was skipped (exactly once) by the analysis
+    - duplicates: items whose id was skipped more than once
+    - kept: items that were not skipped
+    Partitions are JSON arrays (as before), or compact JSONL when the flattened data is streamed.
+    Returns:
+        Number of items written per partition
+    """
+    staging_analysis_file = config.STAGING_CLAIMS_ANALYSIS_FILENAME
+    flattened_data_file = config.FLATTENED_DATA_JSONL_FILENAME if config.STREAM_FLATTENED_DATA else config.FLATTENED_DATA_FILENAME
+
+    skipped_list = load_skipped_ids(staging_analysis_file)
+    skipped_ids, duplicate_ids = split_skipped_ids(Counter(skipped_list))
+    duplicates = [comment_id for comment_id in skipped_list if comment_id in duplicate_ids]
+    print(len(duplicates), f"duplicates first 10: {duplicates[0:10]}")
     print(f"Loaded {len(skipped_ids)} skipped comment IDs.")
 
-    # Load flattened Reddit data
-    with open(flattened_data_file, 'r') as f:
-        reddit_data = json.load(f)
-    print(f"Loaded {len(reddit_data)} entries from {flattened_data_file}.")
-
-    # Filter data based on skipped IDs
-    # Assuming reddit_data is a dictionary {id: data_item}
-    skipped_data = [element for element in reddit_data if element["id"] in skipped_ids]
-    print(f"Found {len(skipped_data)} matching entries.")
-
-    # Write the filtered data to the output file
-    with open(output_file, 'w') as f:
-        json.dump(skipped_data, f, indent=2)
-    print(f"Successfully wrote {len(skipped_data)} entries to {output_file}.")
-
-except FileNotFoundError as e:
-    print(f"Error: File not found - {e.filename}")
-except json.JSONDecodeError as e:
-    print(f"Error decoding JSON: {e}")
-except Exception as e:
-    print(f"An unexpected error occurred: {e}") 
\ No newline at end of file
+    writers = {}
+    for partition in partitions:
+        path = partition_filename(flattened_data_file, partition)
+        if config.STREAM_FLATTENED_DATA:
+            writers[partition] = JsonlSink(path, checkpoint_every=10000, resume=False)
+        else:
+            writers[partition] = JsonArrayWriter(path, indent=2, ensure_ascii=True)
+    counts = {partition: 0 for partition in partitions}
+    total = 0
+    try:
+        for element in iter_records(flattened_data_file):
+            total += 1
+            element_id = element["id"]
+            if element_id in skipped_ids:
+                partition = "skipped"
+            elif element_id in duplicate_ids:
+                partition = "duplicates"
+            else:
+                partition = "kept"
+            if partition in writers:
+                writers[partition].write(element)
+                counts[partition] += 1
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    print(f"Read {total} entries from {flattened_data_file}.")
+    for partition in partitions:
+        print(f"Successfully wrote {counts[partition]} {partition} entries to {partition_filename(flattened_data_file, partition)}.")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description='Split the flattened data by the analysis skip results')
+    parser.add_argument('--config', type=str, default='trump_staged', choices=['trump_staged', 'ghost_of_kyiv'], help='Configuration to use')
+    parser.add_argument('--partitions', type=str, nargs='+', default=['skipped'], choices=PARTITIONS,
+                        help='Partitions to write (each to <flattened data>_<partition>.json/.jsonl)')
+    args = parser.parse_args()
+
+    if args.config == 'trump_staged':
+        config = TrumpStagedConfig()
+    elif args.config == 'ghost_of_kyiv':
+        config = GhostOfKievConfig()
+    else:
+        raise ValueError(f"Invalid configuration: {args.config}")
+
+    try:
+        filter_skipped_comments(config, args.partitions)
+    except FileNotFoundError as e:
+        print(f"Error: File not found - {e.filename}")
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON: {e}")
+
+if __name__ == '__main__':
+    main()
@@ -1,128 +1,205 @@
 import json
-from typing import List, Dict, Any
-from pathlib import Path
-import re
-
-def is_relevant(comment: Dict[str, Any]) -> bool:
-    score_filter = comment.get('score', 0) > 150 or comment.get('score', 0) < -10
-    #  or 
-    return score_filter or check_kyiv_mentioned(comment.get('body', ''))
-
-def check_kyiv_mentioned(text: str) -> bool:
-    """Check if 'Kyiv' or 'Kiev' is mentioned in the text."""
-    pattern = r'\b(kyiv|kiev|kyviv)\b'
-    return re.search(pattern, text, re.IGNORECASE)
-
-def clean_text(text):
-    # Remove URLs
-    text = re.sub(r'http[s]?://\S+', '', text)
-    # Remove unicode escape characters like \uXXXX
-    text = re.sub(r'\\u[\dA-Fa-f]{4}', '', text)
-    # Remove non-ASCII characters (optional, depending on the requirement)
-    text = re.sub(r'[^\x00-\x7F]+', '', text)
-    return text
-
-def process_comment(comment: Dict[str, Any], parent_ids: List[str], parent_info: List[Dict[str, Any]], 
-                   post_attributes: Dict[str, Any], flattened_items: List[Dict[str, Any]]) -> None:
-    """Process a single comment and its replies recursively."""
-    # Create a copy of the comment without the replies
-    comment_copy = comment.copy()
-    replies = comment_copy.pop('replies', [])
-    
-    # Add parent information
-    comment_copy['parent_tree'] = {
-        'parent_ids': parent_ids.copy(),
-        'parent_info': parent_info.copy()
-    }
-    
-    # Add post-level attributes
-    for key, value in post_attributes.items():
-        comment_copy[key] = value
-    
-    # Add the flattened comment to our list
-    flattened_items.append(comment_copy)
-    
-    # Process all replies
-    for reply in replies:
-        # Add current comment's relevant info to parent info
-        current_parent_info = {
-            'id': comment['id'],
-            'author': comment.get('author', '[deleted]'),
-            'body': comment.get('body', '[deleted]'),
-            'score': comment.get('score', 0),
-            'created_utc': comment.get('created_utc'),
-            'depth': comment.get('depth', 0)
+from typing import List, Dict, Any, Callable, Iterator, NamedTuple, Optional
+from json_stream import JsonlSink, iter_json_array, write_json_array
+from corpus_store import CorpusStore, store_from_config
+from columnar import ColumnarSink, flattened_row, flattened_schema, table_path
+from text_cleaning import CLEANED_FLAG, clean_texts
+from relevance import is_relevant, relevance_predicate
+
+class NodeTable:
+    """
+    Ancestor store shared by every flattened item of a run.
+    Each post or comment that has replies is stored once, as its parent-info dict plus the index
+    of its own parent node. A flattened item only keeps the index of its direct parent, and its
+    ancestor chain is rebuilt on demand by following the parent pointers.
+    """
+    def __init__(self):
+        self.infos: List[Dict[str, Any]] = []
+        self.parents: List[int] = []
+        self.roots: List[int] = [] # Node index of each node's thread root (the post)
+
+    def add(self, info: Dict[str, Any], parent: int) -> int:
+        node = len(self.infos)
+        self.infos.append(info)
+        self.parents.append(parent)
+        self.roots.append(self.roots[parent] if parent != -1 else node)
+        return node
+
+    def path(self, node: int) -> List[int]:
+        """
+        Node indices from the thread root down to `node` (empty for -1).
+        """
+        path = []
+        while node != -1:
+            path.append(node)
+            node = self.parents[node]
+        path.reverse()
+        return path
+
+    def parent_tree(self, node: int) -> Dict[str, List[Any]]:
+        """
+        Compatibility view: the old `parent_tree` dict of an item whose direct parent is `node`.
+        """
+        path = self.path(node)
+        return {
+            'parent_ids': [self.infos[index]['id'] for index in path],
+            'parent_info': [self.infos[index] for index in path]
         }
-        reply['body'] = clean_text(reply.get('body', ''))
-        process_comment(
-            reply,
-            parent_ids + [comment['id']],
-            parent_info + [current_parent_info],
-            post_attributes,
-            flattened_items
-        )
 
-def process_post(post: Dict[str, Any], flattened_items: List[Dict[str, Any]]) -> None:
-    """Process a single post and its comment tree."""
-    # Create a copy of the post without the comments tree
-    post['title'] = clean_text(post.get('title', ''))
-    post['selftext_preview'] = clean_text(post.get('selftext_preview', ''))
-    post_copy = post.copy()
-    comments_tree = post_copy.pop('comments_tree', [])
-    
-    # Add empty parent tree for the main post
-    post_copy['parent_tree'] = {
-        'parent_ids': [],
-        'parent_info': []
+class FlattenedItem(NamedTuple):
+    fields: Dict[str, Any] # The post or comment, without its replies
+    parent: int # NodeTable index of the direct parent (-1 for posts)
+    attributes: Dict[str, Any] # Post-level attributes shared by all of the post's comments
+
+def comment_parent_info(comment: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'id': comment['id'],
+        'author': comment.get('author', '[deleted]'),
+        'body': comment.get('body', '[deleted]'),
+        'score': comment.get('score', 0),
+        'created_utc': comment.get('created_utc'),
+        'depth': comment.get('depth', 0)
     }
-    
+
+def flatten_post(post: Dict[str, Any], nodes: NodeTable, clean_backend: str = "python",
+                 relevant: Callable[[Dict[str, Any]], bool] = is_relevant) -> Iterator[FlattenedItem]:
+    """
+    Flattens a post and its comment tree iteratively (depth-first, replies in order), yielding
+    the post first and then every `relevant` comment thread. Ancestors are added to `nodes` once.
+    The post's title, selftext and comment bodies are cleaned together in one clean_texts batch,
+    and the yielded items are flagged as cleaned (already flagged input is not cleaned again).
+    """
+    post = dict(post)
+    comments_tree = post.pop('comments_tree', [])
+
+    # Explicit stack instead of recursion, so long reply chains cannot hit the recursion limit.
+    # Comments are collected first (as (comment, parent position, has replies)) so that all of
+    # the post's texts can be cleaned at once.
+    comments = []
+    stack = [(comment, -1) for comment in reversed(comments_tree) if relevant(comment)]
+    while stack:
+        comment, parent = stack.pop()
+        comment = dict(comment)
+        replies = comment.pop('replies', [])
+        comments.append((comment, parent, bool(replies)))
+        position = len(comments) - 1
+        stack.extend((reply, position) for reply in reversed(replies))
+
+    targets = []
+    if not post.get(CLEANED_FLAG):
+        targets.extend([(post, 'title'), (post, 'selftext_preview')])
+    targets.extend((comment, 'body') for comment, _, _ in comments if not comment.get(CLEANED_FLAG))
+    for (fields, key), text in zip(targets, clean_texts([fields.get(key, '') for fields, key in targets], clean_backend)):
+        fields[key] = text
+    post[CLEANED_FLAG] = True
+    yield FlattenedItem(post, -1, {})
+
     # Extract post-level attributes that should be passed to all comments
     post_attributes = {
         'subreddit': post.get('subreddit', '')
     }
-    
-    # Add the flattened post to our list
-    flattened_items.append(post_copy)
-    
-    # Process all comments
-    for comment in comments_tree:
-        # Add post's relevant info to parent info
-        if not is_relevant(comment):
-            continue
-        comment['body'] = clean_text(comment.get('body', ''))
-
-        post_parent_info = {
-            'id': post['id'],
-            'title': post.get('title', ''),
-            'score': post.get('score', 0),
-            'created_utc': post.get('created_utc'),
-            'selftext_preview': post.get('selftext_preview', '')
-        }
-        process_comment(
-            comment,
-            [post['id']],
-            [post_parent_info],
-            post_attributes,
-            flattened_items
-        )
-
-def main(config):
+    post_node = nodes.add({
+        'id': post['id'],
+        'title': post.get('title', ''),
+        'score': post.get('score', 0),
+        'created_utc': post.get('created_utc'),
+        'selftext_preview': post.get('selftext_preview', '')
+    }, -1)
+
+    comment_nodes = {}
+    for position, (comment, parent, has_replies) in enumerate(comments):
+        comment[CLEANED_FLAG] = True
+        parent_node = post_node if parent == -1 else comment_nodes[parent]
+        yield FlattenedItem(comment, parent_node, post_attributes)
+        if has_replies:
+            comment_nodes[position] = nodes.add(comment_parent_info(comment), parent_node)
+
+def legacy_item(item: FlattenedItem, nodes: NodeTable) -> Dict[str, Any]:
+    """
+    Materializes a flattened item in the original format, with its full `parent_tree`.
+    """
+    legacy = dict(item.fields)
+    legacy['parent_tree'] = nodes.parent_tree(item.parent)
+    legacy.update(item.attributes)
+    return legacy
+
+def columnar_row(item: FlattenedItem, nodes: NodeTable) -> Dict[str, Any]:
+    """
+    Row of the columnar flattened table: the ancestor chain is reduced to parent and root ids.
+    """
+    if item.parent == -1:
+        return flattened_row(item.fields, None, item.fields.get('id'), item.attributes)
+    return flattened_row(item.fields, nodes.infos[item.parent]['id'], nodes.infos[nodes.roots[item.parent]]['id'], item.attributes)
+
+def process_post(post: Dict[str, Any], flattened_items: List[Dict[str, Any]]) -> None:
+    """Process a single post and its comment tree into legacy-format items."""
+    nodes = NodeTable()
+    flattened_items.extend(legacy_item(item, nodes) for item in flatten_post(post, nodes))
+
+def flatten_reddit_data_streaming(input_file: str, output_file: str, table: Optional[ColumnarSink] = None,
+                                  store: Optional[CorpusStore] = None,
+                                  relevant: Callable[[Dict[str, Any]], bool] = is_relevant) -> int:
+    """
+    Streaming variant: posts are read one at a time from the submissions JSON array, flattened
+    as a generator and written as compact JSONL, so peak memory does not grow with the corpus.
+    Returns:
+        Number of flattened items written
+    """
+    count = 0
+    with JsonlSink(output_file, checkpoint_every=10000, resume=False) as sink:
+        for post in iter_json_array(input_file):
+            # Ancestors never cross posts, so each post gets its own (short-lived) node table
+            nodes = NodeTable()
+            items = list(flatten_post(post, nodes, relevant=relevant))
+            for item in items:
+                sink.write(legacy_item(item, nodes))
+                if table is not None:
+                    table.write(columnar_row(item, nodes))
+            if store is not None:
+                store.add_flattened_items((item.fields, item.parent == -1) for item in items)
+            count += len(items)
+    return count
+
+def flatten_reddit_data(config):
     # Input and output file paths
     input_file = config.SUBMISSIONS_WITH_COMMENTS_FILENAME
     output_file = config.FLATTENED_DATA_FILENAME
-    
-    # Read the input JSON file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # Initialize our flattened items list
-    flattened_items = []
-    
-    # Process each post
-    for post in data:
-        process_post(post, flattened_items)
-    print(f"Flattened {len(flattened_items)} items")
-    
-    # Write the flattened data to a new JSON file
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(flattened_items, f, indent=4, ensure_ascii=False)
+    # Optional Parquet / Arrow copy of the flattened items
+    table = None
+    if config.COLUMNAR_FORMAT:
+        table = ColumnarSink(table_path(config.FLATTENED_DATA_TABLE, config.COLUMNAR_FORMAT),
+                             flattened_schema(), config.COLUMNAR_FORMAT)
+    store = store_from_config(config)
+    # Same predicate fetch_comments prunes with (PRUNE_IRRELEVANT_AT_FETCH)
+    relevant = relevance_predicate(config)
+
+    if config.STREAM_FLATTENED_DATA:
+        output_file = config.FLATTENED_DATA_JSONL_FILENAME
+        count = flatten_reddit_data_streaming(input_file, output_file, table, store, relevant)
+        print(f"Flattened {count} items into {output_file}")
+    else:
+        # Read the input JSON file
+        with open(input_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        # Items only reference their parent node; ancestor chains are built while writing
+        nodes = NodeTable()
+        flattened_items = []
+        for post in data:
+            flattened_items.extend(flatten_post(post, nodes, relevant=relevant))
+        print(f"Flattened {len(flattened_items)} items ({len(nodes.infos)} ancestor nodes)")
+
+        # Write the flattened data to a new JSON file (same format as before)
+        write_json_array(output_file, (legacy_item(item, nodes) for item in flattened_items), indent=4)
+        if table is not None:
+            for item in flattened_items:
+                table.write(columnar_row(item, nodes))
+        if store is not None:
+            store.add_flattened_items((item.fields, item.parent == -1) for item in flattened_items)
+
+    if table is not None:
+        table.close()
+        print(f"Saved columnar copy of the flattened items to {table.path}")
+    if store is not None:
+        print(f"Stored cleaned texts in {store.path}")
+        store.close()
@@ -0,0 +1,287 @@
+import os
+import json
+import base64
+import hashlib
+import threading
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import httpx
+except ImportError: # Only needed to record / replay the OpenAI client
+    httpx = None
+
+# Point both API clients at cassettes (e.g. in .env):
+#   HTTP_CASSETTE_MODE=record|replay, HTTP_CASSETTE_DIR=data/cassettes/<name>
+CASSETTE_MODE_ENV = "HTTP_CASSETTE_MODE"
+CASSETTE_DIR_ENV = "HTTP_CASSETTE_DIR"
+CASSETTE_MODES = {"record", "replay"}
+# Transient failures are not recorded: the retried request is, so replays never back off
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+# Headers that describe the wire encoding of the recorded body, not the body itself
+ENCODING_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+# Reddit's rate-limit headers are dropped on replay, so RedditRateBudget never paces a replay
+RATE_LIMIT_HEADER_PREFIX = "x-ratelimit-"
+REDACTED_TOKEN = "cassette-token"
+
+
+class CassetteMiss(Exception):
+    """
+    A replayed run made a request the cassette has no recording for.
+    """
+
+def canonical_url(url: str) -> str:
+    """
+    The URL with its query parameters sorted.
+    """
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True))), ""))
+
+def canonical_body(body: Optional[bytes], content_type: str) -> bytes:
+    """
+    The request body in a form that does not depend on dict ordering or multipart boundaries.
+    """
+    if not body:
+        return b""
+    if "application/json" in content_type:
+        try:
+            return json.dumps(json.loads(body), sort_keys=True).encode()
+        except ValueError:
+            return body
+    if "application/x-www-form-urlencoded" in content_type:
+        return urlencode(sorted(parse_qsl(body.decode("utf-8", "replace"), keep_blank_values=True))).encode()
+    if "multipart/form-data" in content_type and "boundary=" in content_type:
+        boundary = content_type.split("boundary=", 1)[1].split(";")[0].strip('"')
+        return body.replace(boundary.encode(), b"BOUNDARY")
+    return body
+
+def request_key(method: str, url: str, body: Optional[bytes], content_type: str) -> str:
+    """
+    What identifies a recorded request: method, canonical URL and a hash of the canonical body.
+    Headers (and with them the credentials) are not part of it.
+    """
+    digest = hashlib.sha256(canonical_body(body, content_type)).hexdigest()
+    return f"{method.upper()} {canonical_url(url)} {digest}"
+
+def redact_token(url: str, body: bytes) -> bytes:
+    """
+    Replaces the access token in an OAuth token response, so cassettes hold no credentials.
+    """
+    if not url.split("?")[0].endswith("/access_token"):
+        return body
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    if isinstance(data, dict) and "access_token" in data:
+        data["access_token"] = REDACTED_TOKEN
+        return json.dumps(data).encode()
+    return body
+
+class Cassette:
+    """
+    Recorded HTTP interactions of one client, stored as JSON lines (one response per line).
+    - record: requests go to the network; every non-transient response is appended to the file
+    - replay: responses come from the file, never from the network. Identical requests get
+      their recorded responses in recording order, then the last one again; a request that was
+      never recorded raises CassetteMiss
+    """
+    def __init__(self, path: str, mode: str):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}' (expected one of {sorted(CASSETTE_MODES)})")
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.responses: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self.last_response: Dict[str, Dict[str, Any]] = {}
+        self.recorded = 0
+        self.replayed = 0
+        if mode == "replay":
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No cassette to replay at {path}: record one first ({CASSETTE_MODE_ENV}=record)")
+            self.rewind()
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # A recording starts from scratch
+            open(path, 'w').close()
+
+    def rewind(self) -> None:
+        """
+        Reloads the recording, so the next replay starts from its first response again.
+        """
+        responses: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        with open(self.path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    interaction = json.loads(line)
+                    responses[interaction["key"]].append(interaction)
+        with self.lock:
+            self.responses = responses
+            self.last_response = {}
+
+    def record(self, key: str, status: int, headers: List[Tuple[str, str]], content: bytes, url: str) -> None:
+        if status in TRANSIENT_STATUSES:
+            return
+        interaction: Dict[str, Any] = {
+            "key": key,
+            "status": status,
+            "headers": [[name, value] for name, value in headers if name.lower() not in ENCODING_HEADERS],
+        }
+        content = redact_token(url, content)
+        try:
+            interaction["body"] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            interaction["body_b64"] = base64.b64encode(content).decode("ascii")
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(interaction) + "\n")
+            self.recorded += 1
+
+    def replay(self, key: str) -> Tuple[int, List[Tuple[str, str]], bytes]:
+        """
+        Returns (status, headers, body) of the next recorded response for `key`.
+        """
+        with self.lock:
+            queue = self.responses.get(key)
+            if queue:
+                interaction = queue.popleft()
+                self.last_response[key] = interaction
+            elif key in self.last_response:
+                interaction = self.last_response[key]
+            else:
+                raise CassetteMiss(f"No recorded response for {key} in {self.path}")
+            self.replayed += 1
+        if "body_b64" in interaction:
+            content = base64.b64decode(interaction["body_b64"])
+        else:
+            content = interaction["body"].encode("utf-8")
+        headers = [(name, value) for name, value in interaction["headers"]
+                   if not name.lower().startswith(RATE_LIMIT_HEADER_PREFIX)]
+        return interaction["status"], headers, content
+
+class CassetteAdapter(HTTPAdapter):
+    """
+    requests transport adapter (Reddit: prawcore's session and the raw_reddit fetcher) that
+    records to or replays from a Cassette.
+    """
+    def __init__(self, cassette: Cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+        key = request_key(request.method, request.url, body, request.headers.get("Content-Type", ""))
+        if self.cassette.mode == "record":
+            response = super().send(request, **kwargs)
+            self.cassette.record(key, response.status_code, list(response.headers.items()), response.content, request.url)
+            return response
+        status, headers, content = self.cassette.replay(key)
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = content
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.reason = "Replayed"
+        response.connection = self
+        return response
+
+if httpx is not None:
+    class CassetteTransport(httpx.BaseTransport):
+        """
+        httpx transport (the OpenAI client) that records to or replays from a Cassette.
+        """
+        def __init__(self, cassette: Cassette):
+            self.cassette = cassette
+            self.transport = httpx.HTTPTransport() if cassette.mode == "record" else None
+
+        def handle_request(self, request):
+            body = request.read()
+            key = request_key(request.method, str(request.url), body, request.headers.get("content-type", ""))
+            if self.cassette.mode == "record":
+                response = self.transport.handle_request(request)
+                try:
+                    content = response.read()
+                finally:
+                    response.close()
+                headers = [(name, value) for name, value in response.headers.multi_items() if name.lower() not in ENCODING_HEADERS]
+                self.cassette.record(key, response.status_code, headers, content, str(request.url))
+                return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+            status, headers, content = self.cassette.replay(key)
+            return httpx.Response(status, headers=headers, content=content, request=request)
+
+        def close(self):
+            if self.transport is not None:
+                self.transport.close()
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+def cassette_from_env(name: str) -> Optional[Cassette]:
+    """
+    The process-wide cassette `name` (e.g. "reddit", "openai") under HTTP_CASSETTE_DIR, or
+    None when HTTP_CASSETTE_MODE is not set. Every client of a run shares it.
+    """
+    mode = os.getenv(CASSETTE_MODE_ENV)
+    if not mode:
+        return None
+    directory = os.getenv(CASSETTE_DIR_ENV, "data/cassettes/default")
+    path = os.path.join(directory, f"{name}.jsonl")
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path, mode)
+            print(f"HTTP cassette: {mode} {path}")
+        return _cassettes[path]
+
+def mount_cassette(session: requests.Session, name: str = "reddit") -> requests.Session:
+    """
+    Routes a requests session through the `name` cassette, if one is configured.
+    """
+    cassette = cassette_from_env(name)
+    if cassette is not None:
+        adapter = CassetteAdapter(cassette)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    return session
+
+def reddit_session() -> Optional[requests.Session]:
+    """
+    A requests session for prawcore that goes through the "reddit" cassette, or None (prawcore's own session).
+    """
+    if cassette_from_env("reddit") is None:
+        return None
+    return mount_cassette(requests.Session(), "reddit")
+
+def openai_http_client():
+    """
+    An httpx client for OpenAI(http_client=...) that goes through the "openai" cassette, or None (the SDK's default client).
+    """
+    cassette = cassette_from_env("openai")
+    if cassette is None:
+        return None
+    if httpx is None:
+        raise ImportError("Recording / replaying the OpenAI client needs httpx")
+    return httpx.Client(transport=CassetteTransport(cassette), timeout=600)
+
+def rewind_cassettes() -> None:
+    """
+    Rewinds every replayed cassette of the process (between benchmark repetitions).
+    """
+    with _cassettes_lock:
+        for cassette in _cassettes.values():
+            if cassette.mode == "replay":
+                cassette.rewind()
+
+def cassette_counts() -> Dict[str, Dict[str, int]]:
+    """
+    Responses recorded and replayed so far, per cassette file.
+    """
+    with _cassettes_lock:
+        return {path: {"recorded": cassette.recorded, "replayed": cassette.replayed} for path, cassette in _cassettes.items()}
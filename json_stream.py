@@ -0,0 +1,213 @@
+import os
+import json
+from typing import Any, Dict, Iterable, Iterator
+
+
+def _repair_tail(path: str) -> None:
+    """
+    Drop a partially written last line (e.g. after a crash mid-write) so appends stay valid JSONL.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+        # Walk back to the last complete line
+        position = size - 1
+        chunk_size = 4096
+        while position > 0:
+            start = max(0, position - chunk_size)
+            f.seek(start)
+            chunk = f.read(position - start)
+            newline = chunk.rfind(b'\n')
+            if newline != -1:
+                f.truncate(start + newline + 1)
+                return
+            position = start
+        f.truncate(0)
+
+class JsonlSink:
+    """
+    Append-only JSONL writer. Every `checkpoint_every` records the file is flushed and
+    fsync'd so at most that many records are lost on a crash.
+    """
+    def __init__(self, path: str, checkpoint_every: int = 100, resume: bool = True):
+        self.path = path
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.pending = 0
+        self.written = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if resume:
+            _repair_tail(path)
+        self.file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.pending += 1
+        self.written += 1
+        if self.pending >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        """
+        Flush buffered records and fsync them to disk.
+        """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.checkpoint()
+            self.file.close()
+
+    def __enter__(self) -> "JsonlSink":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields records from a JSONL file. A truncated final line (crash mid-write) is ignored.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                if line.endswith("\n"):
+                    raise
+                print(f"Warning: Ignoring truncated last line in {path}")
+
+def iter_json_array(path: str, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """
+    Yields the elements of a top-level JSON array file one at a time, so only the current
+    element (plus a read buffer) is held in memory instead of the whole parsed file.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ""
+        position = 0
+        eof = False
+
+        def fill() -> None:
+            # Drop consumed text and read more; the read grows with the buffer so that
+            # re-parsing an element larger than `chunk_size` stays linear overall
+            nonlocal buffer, position, eof
+            chunk = f.read(max(chunk_size, len(buffer) - position))
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+        def next_char() -> str:
+            nonlocal position
+            while True:
+                while position < len(buffer) and buffer[position].isspace():
+                    position += 1
+                if position < len(buffer):
+                    return buffer[position]
+                if eof:
+                    return ""
+                fill()
+
+        if next_char() != "[":
+            raise ValueError(f"{path} does not contain a JSON array")
+        position += 1
+        if next_char() == "]":
+            return
+        while True:
+            # raw_decode does not skip leading whitespace
+            next_char()
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # A number cut off by the end of the buffer (even right after '.', 'e' or '-') decodes
+            # fine as a shorter number: only accept the element once a separator follows it
+            following = end
+            while following < len(buffer) and buffer[following].isspace():
+                following += 1
+            if not eof and (following == len(buffer) or buffer[following] not in ",]"):
+                fill()
+                continue
+            yield element
+            position = end
+            separator = next_char()
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Malformed JSON array in {path} at element separator {separator!r}")
+            position += 1
+
+def iter_records(path: str) -> Iterator[Any]:
+    """
+    Streams records from either a JSONL file or a JSON array file (chosen by extension).
+    """
+    if path.endswith(".jsonl"):
+        return iter_jsonl(path)
+    return iter_json_array(path)
+
+def load_jsonl_by_id(path: str, id_key: str = "id") -> Dict[Any, Dict[str, Any]]:
+    """
+    Loads a JSONL file into a dict keyed by `id_key`. Later records win over earlier ones.
+    """
+    records: Dict[Any, Dict[str, Any]] = {}
+    for record in iter_jsonl(path):
+        records[record.get(id_key)] = record
+    return records
+
+class JsonArrayWriter:
+    """
+    Writes records one at a time as a JSON array, byte-identical to
+    `json.dump(records, f, indent=indent, ensure_ascii=ensure_ascii)` without holding the list.
+    """
+    def __init__(self, path: str, indent: int = 4, ensure_ascii: bool = False):
+        self.padding = " " * indent
+        self.indent = indent
+        self.ensure_ascii = ensure_ascii
+        self.count = 0
+        self.file = open(path, 'w', encoding='utf-8')
+        self.file.write("[")
+
+    def write(self, record: Any) -> None:
+        # Strings never contain raw newlines in JSON, so re-indenting line starts is safe
+        text = json.dumps(record, indent=self.indent, ensure_ascii=self.ensure_ascii).replace("\n", "\n" + self.padding)
+        self.file.write(("\n" if self.count == 0 else ",\n") + self.padding + text)
+        self.count += 1
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.file.write("\n]" if self.count else "]")
+            self.file.close()
+
+    def __enter__(self) -> "JsonArrayWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+def write_json_array(path: str, records: Iterable[Any], indent: int = 4) -> int:
+    """
+    Streams records into a JSON array file (see JsonArrayWriter).
+    Returns:
+        Number of records written
+    """
+    with JsonArrayWriter(path, indent=indent) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
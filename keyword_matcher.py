@@ -0,0 +1,93 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+_WORD_CHAR = re.compile(r'\w')
+
+
+def _is_word_char(text: str, position: int) -> bool:
+    return 0 <= position < len(text) and _WORD_CHAR.match(text, position) is not None
+
+def _is_boundary(text: str, position: int) -> bool:
+    """
+    Same test as the regex `\\b` assertion at `position`.
+    """
+    return _is_word_char(text, position - 1) != _is_word_char(text, position)
+
+class KeywordMatcher:
+    """
+    Case-insensitive whole-word matcher for a fixed list of keyphrases.
+    All phrases are compiled once into a single alternation regex, so a text is scanned once
+    instead of once per phrase. Matching is equivalent to testing every phrase separately with
+    `\\b<phrase>\\b` and re.IGNORECASE, including overlapping phrases ("trump" / "trump ear").
+    """
+    def __init__(self, phrases: Sequence[str]):
+        self.phrases = list(phrases)
+        # Distinct lowercased phrases; longest first so the alternation prefers the longest match
+        self.distinct = sorted({phrase.lower() for phrase in self.phrases if phrase}, key=len, reverse=True)
+        # Phrases that are a prefix of a longer phrase can match at the same position as it
+        self.prefixes: Dict[str, List[str]] = {
+            phrase: [other for other in self.distinct if other != phrase and phrase.startswith(other)]
+            for phrase in self.distinct
+        }
+        alternation = '|'.join(re.escape(phrase) for phrase in self.distinct)
+        # The lookahead makes every match zero-width, so overlapping phrases are all found
+        self.scan_pattern = re.compile(r'\b(?=(' + alternation + r')\b)', re.IGNORECASE) if self.distinct else None
+        self.search_pattern = re.compile(r'\b(?:' + alternation + r')\b', re.IGNORECASE) if self.distinct else None
+
+    def find(self, text: str) -> Set[str]:
+        """
+        Returns the set of (lowercased) phrases found in the text.
+        """
+        found: Set[str] = set()
+        if not text or self.scan_pattern is None:
+            return found
+        for match in self.scan_pattern.finditer(text):
+            phrase = match.group(1).lower()
+            if phrase not in self.prefixes:
+                # Case folding changed the text (rare unicode cases): fall back to a per-phrase check
+                phrase = next(p for p in self.distinct if re.fullmatch(re.escape(p), match.group(1), re.IGNORECASE))
+            found.add(phrase)
+            start = match.start(1)
+            for prefix in self.prefixes[phrase]:
+                if prefix not in found and _is_boundary(text, start + len(prefix)):
+                    found.add(prefix)
+            if len(found) == len(self.distinct):
+                break
+        return found
+
+    def contains_any(self, text: str) -> bool:
+        """
+        Returns True if at least one phrase occurs in the text.
+        """
+        if not text or self.search_pattern is None:
+            return False
+        return self.search_pattern.search(text) is not None
+
+    def score(self, text: str) -> Tuple[float, List[str]]:
+        """
+        Calculates the percentage of keyphrases found in the text.
+        Returns a tuple: (score, list_of_matched_keywords)
+        """
+        if not text or not self.phrases:
+            return 0.0, []
+        found = self.find(text)
+        matched_keywords = [phrase for phrase in self.phrases if phrase.lower() in found]
+        score = (len(matched_keywords) / len(self.phrases)) * 100
+        return score, matched_keywords
+
+    def score_many(self, texts: Iterable[str]) -> List[Tuple[float, List[str]]]:
+        """
+        Scores a list of texts at once, returning one (score, matched_keywords) tuple per text.
+        """
+        return [self.score(text) for text in texts]
+
+@lru_cache(maxsize=None)
+def _cached_matcher(phrases: Tuple[str, ...]) -> KeywordMatcher:
+    return KeywordMatcher(phrases)
+
+def get_matcher(phrases: Sequence[str]) -> KeywordMatcher:
+    """
+    Returns the (cached) matcher for a list of phrases, so each config's keyword list is compiled once.
+    """
+    return _cached_matcher(tuple(phrases))
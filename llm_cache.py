@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+class LLMCache:
+    """
+    Persistent, content-addressed cache of LLM responses stored in SQLite.
+    Entries are keyed by a hash of (model, instructions, prompt, response format), so a
+    byte-identical request is only ever paid for once.
+    - `max_bytes` caps the total stored response size; least recently used entries are evicted
+    - `bypass` always calls the API, but still stores the fresh response
+    """
+    def __init__(self, path: str, max_bytes: Optional[int] = None, bypass: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self.connection.commit()
+        self.total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, instructions: str, prompt: str, text_format: Dict[str, Any]) -> str:
+        """
+        Hash of everything that determines the response.
+        """
+        payload = json.dumps(
+            {"model": model, "instructions": instructions, "prompt": prompt, "format": text_format},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        if self.bypass:
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+            return row[0]
+
+    def peek(self, key: str) -> Optional[str]:
+        """
+        Like get, but a miss is not counted: for lookups made before deciding whether to send a
+        request (whose own get then counts the miss).
+        """
+        if self.bypass:
+            return None
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.hits += 1
+            self.connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        size = len(value.encode('utf-8'))
+        with self.lock:
+            previous = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if previous is not None:
+                self.total_bytes -= previous[0]
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            self.total_bytes += size
+            self._evict()
+            self.connection.commit()
+
+    def _evict(self) -> None:
+        """
+        Drop least recently used entries until the cache is back under 90% of `max_bytes`.
+        Must be called with the lock held.
+        """
+        if not self.max_bytes or self.total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self.connection.execute("SELECT key, size FROM responses ORDER BY last_access ASC")
+        evicted = []
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            evicted.append((key,))
+            self.total_bytes -= size
+        self.connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "stored_bytes": self.total_bytes
+        }
+
+    def close(self) -> None:
+        self.connection.close()
+
+def cached_response_text(client, cache: Optional[LLMCache], model: str, instructions: str, prompt: str,
+                         text_format: Dict[str, Any], validate: Callable[[str], Any] = json.loads,
+                         prompt_cache_key: Optional[str] = None) -> str:
+    """
+    Returns the output text of a client.responses.create call, served from `cache` when possible.
+    Only responses that pass `validate` are stored, so malformed answers are retried next time.
+    `prompt_cache_key` is forwarded to the provider (it only affects prompt-cache routing, so it
+    is not part of the cache key).
+    """
+    key = None
+    if cache is not None:
+        key = LLMCache.make_key(model, instructions, prompt, text_format)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    options = {"prompt_cache_key": prompt_cache_key} if prompt_cache_key else {}
+    response = client.responses.create(
+        model = model,
+        input = prompt,
+        instructions = instructions,
+        text = text_format,
+        **options
+    )
+    output_text = response.output_text
+
+    if cache is not None:
+        try:
+            validate(output_text)
+        except (ValueError, TypeError):
+            return output_text
+        cache.put(key, output_text)
+    return output_text
+
+def cached_output_text(cache: Optional[LLMCache], model: str, instructions: str, prompt: str,
+                       text_format: Dict[str, Any]) -> Optional[str]:
+    """
+    The output text cached_response_text would serve from `cache` for this request, or None.
+    Used to answer cache hits before a request is scheduled on the ClassificationEngine, so
+    they take no requests/min or tokens/min budget.
+    """
+    if cache is None:
+        return None
+    return cache.peek(LLMCache.make_key(model, instructions, prompt, text_format))
+
+def cache_from_config(config) -> LLMCache:
+    return LLMCache(config.LLM_CACHE_FILENAME, max_bytes=config.LLM_CACHE_MAX_BYTES, bypass=config.LLM_CACHE_BYPASS)
@@ -0,0 +1,210 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, List, Optional, Sequence
+import openai
+from tqdm import tqdm
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate (~4 characters per token) used for rate budgeting.
+    """
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that refills continuously at `rate_per_minute`.
+    A rate of None or 0 disables the bucket.
+    """
+    def __init__(self, rate_per_minute: Optional[float], capacity: Optional[float] = None):
+        self.rate_per_second = (rate_per_minute or 0) / 60.0
+        self.capacity = capacity if capacity is not None else (rate_per_minute or 0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def acquire(self, amount: float = 1) -> None:
+        """
+        Block until `amount` tokens are available, then take them.
+        Requests larger than the bucket capacity are clamped to the capacity.
+        """
+        if self.rate_per_second <= 0:
+            return
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate_per_second
+            time.sleep(wait)
+
+class RateLimiter:
+    """
+    Combined requests-per-minute and tokens-per-minute budget shared by all workers.
+    """
+    def __init__(self, requests_per_minute: Optional[float], tokens_per_minute: Optional[float]):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def acquire(self, token_cost: int) -> None:
+        self.requests.acquire(1)
+        self.tokens.acquire(token_cost)
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Returns True for errors worth retrying: rate limits (429), server errors (5xx),
+    timeouts and connection failures.
+    """
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """
+    Returns the server-suggested delay (in seconds) from a Retry-After header, if any.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class ClassificationEngine:
+    """
+    Runs a blocking LLM call over many items on a thread pool.
+    - `max_concurrency` bounds the number of in-flight requests, across all concurrent
+      `map` / `call` uses of the engine (so `func` must not itself go through the engine)
+    - requests/min and tokens/min are enforced with token buckets
+    - 429/5xx errors are retried with exponential backoff and jitter
+    - `cached` lookups answer items from the LLM cache before any budget is taken
+    Results are always returned in input order.
+    """
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_retries: int = 5,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.in_flight = threading.BoundedSemaphore(self.max_concurrency)
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    @classmethod
+    def from_config(cls, config) -> "ClassificationEngine":
+        return cls(
+            max_concurrency=config.LLM_MAX_CONCURRENCY,
+            requests_per_minute=config.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=config.LLM_TOKENS_PER_MINUTE,
+            max_retries=config.LLM_MAX_RETRIES,
+        )
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    def call(self, func: Callable[[Any], Any], item: Any, token_cost: int = 0,
+             cached: Optional[Callable[[Any], Any]] = None) -> Any:
+        """
+        Call `func(item)` under the rate limiter, retrying retryable errors. If `cached(item)`
+        returns a result, it is returned instead, without taking rate-limiter tokens.
+        """
+        if cached is not None:
+            result = cached(item)
+            if result is not None:
+                return result
+        attempt = 0
+        while True:
+            try:
+                with self.in_flight:
+                    self.rate_limiter.acquire(token_cost)
+                    return func(item)
+            except Exception as e:
+                if not is_retryable_error(e) or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                print(f"Retryable error ({type(e).__name__}), retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                attempt += 1
+
+    def map(self, func: Callable[[Any], Any], items: Sequence[Any],
+            token_costs: Optional[Sequence[int]] = None,
+            on_error: Optional[Callable[[Any, Exception], Any]] = None,
+            on_result: Optional[Callable[[int, Any], None]] = None,
+            desc: Optional[str] = None, max_concurrency: Optional[int] = None,
+            cached: Optional[Callable[[Any], Any]] = None) -> List[Any]:
+        """
+        Apply `func` to every item concurrently and return the results in input order.
+        Args:
+            func: Blocking callable taking a single item
+            items: Items to process
+            token_costs: Optional estimated token cost per item (for the tokens/min budget)
+            on_error: Optional callback (item, exception) -> result used when an item
+                      fails after all retries; if omitted the exception is raised
+            on_result: Optional callback (index, result) invoked as each item completes,
+                       in completion order (e.g. to stream results to disk)
+            desc: Optional progress bar description
+            max_concurrency: Optional worker count for this call (e.g. for several maps that
+                             share the engine's limits); defaults to the engine's. In-flight
+                             requests stay bounded by the engine's max_concurrency either way
+            cached: Optional lookup item -> result (or None), run in the calling thread before
+                    anything is scheduled; items it answers (e.g. LLM cache hits) are passed to
+                    `on_result` right away and take no rate-limiter tokens
+        Returns:
+            List of results, aligned with `items`
+        """
+        if token_costs is None:
+            token_costs = [0] * len(items)
+        results: List[Any] = [None] * len(items)
+        to_request = list(range(len(items)))
+        if cached is not None:
+            to_request = []
+            for index, item in enumerate(items):
+                result = cached(item)
+                if result is None:
+                    to_request.append(index)
+                    continue
+                results[index] = result
+                if on_result is not None:
+                    on_result(index, result)
+            if len(to_request) < len(items):
+                print(f"{len(items) - len(to_request)} of {len(items)} requests answered from the cache")
+        if not to_request:
+            return results
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency or self.max_concurrency)) as executor:
+            futures = {
+                executor.submit(self.call, func, items[index], token_costs[index]): index
+                for index in to_request
+            }
+            for future in tqdm(as_completed(futures), total=len(futures), desc=desc):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    if on_error is None:
+                        for pending in futures:
+                            pending.cancel()
+                        raise
+                    results[index] = on_error(items[index], e)
+                if on_result is not None:
+                    on_result(index, results[index])
+        return results
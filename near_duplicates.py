@@ -0,0 +1,214 @@
+import re
+import random
+import hashlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from text_cleaning import cleaned_field
+
+try:
+    import numpy as np
+except ImportError: # Falls back to pure Python signatures
+    np = None
+
+_WORD = re.compile(r'\w+')
+_MASK_SEED = 1729
+
+
+def normalize_body(item: Dict[str, Any]) -> str:
+    """
+    The text compared for near-duplicates: the cleaned body, lowercased, words only.
+    """
+    return " ".join(_WORD.findall(cleaned_field(item, "body").lower()))
+
+def stable_hash(text: str) -> int:
+    """
+    64-bit hash of a text that is the same in every process (unlike hash(), which is salted per process).
+    """
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+def shingles(normalized: str, size: int = 3) -> List[int]:
+    """
+    Hashes of the distinct word `size`-grams of a normalized text (the text itself if shorter).
+    """
+    words = normalized.split()
+    if len(words) <= size:
+        return [stable_hash(normalized)]
+    return list({stable_hash(" ".join(words[i:i + size])) for i in range(len(words) - size + 1)})
+
+class MinHasher:
+    """
+    MinHash signatures (one minimum per XOR-mask permutation of the shingle hashes) and the LSH
+    band keys used to find candidate pairs: two texts with Jaccard similarity s share at least one
+    band with probability 1 - (1 - s^rows)^bands.
+    """
+    def __init__(self, num_perm: int = 128, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        generator = random.Random(_MASK_SEED)
+        self.masks = [generator.getrandbits(64) for _ in range(num_perm)]
+        self.mask_array = np.array(self.masks, dtype=np.uint64) if np is not None else None
+
+    def signature(self, hashes: List[int]) -> Tuple[int, ...]:
+        if self.mask_array is not None:
+            values = np.array(hashes, dtype=np.uint64)
+            return tuple(np.bitwise_xor.outer(self.mask_array, values).min(axis=1).tolist())
+        return tuple(min(h ^ mask for h in hashes) for mask in self.masks)
+
+    def band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    @staticmethod
+    def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+        """
+        Estimated Jaccard similarity of two signatures.
+        """
+        return sum(a == b for a, b in zip(first, second)) / len(first)
+
+def load_embedding_model(model_name: str):
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise ImportError("DEDUP_EMBEDDING_MODEL needs sentence-transformers: pip install sentence-transformers")
+    return SentenceTransformer(model_name, device="cpu")
+
+class NearDuplicateCollapser:
+    """
+    Groups near-duplicate comments (copy-pasted text, bot replies) so only one representative
+    per group is classified.
+    Groups are formed in input order: an item joins the first earlier representative it is
+    similar enough to (MinHash estimate >= `threshold`, or embedding cosine >= `embedding_threshold`
+    when an embedding model is set), otherwise it becomes a representative itself. Every member
+    is therefore similar to the representative whose label it receives.
+    Posts and bodies shorter than `min_chars` (normalized) are never collapsed: their meaning
+    depends on the thread more than on the text.
+    """
+    def __init__(self, threshold: float = 0.8, min_chars: int = 40, num_perm: int = 128, bands: int = 16,
+                 embedding_model: Optional[str] = None, embedding_threshold: float = 0.95):
+        self.threshold = threshold
+        self.min_chars = min_chars
+        self.hasher = MinHasher(num_perm, bands)
+        self.embedding_model = embedding_model
+        self.embedding_threshold = embedding_threshold
+
+    @classmethod
+    def from_config(cls, config) -> "NearDuplicateCollapser":
+        return cls(
+            threshold=config.DEDUP_THRESHOLD,
+            min_chars=config.DEDUP_MIN_CHARS,
+            num_perm=config.DEDUP_NUM_PERM,
+            bands=config.DEDUP_BANDS,
+            embedding_model=config.DEDUP_EMBEDDING_MODEL,
+            embedding_threshold=config.DEDUP_EMBEDDING_THRESHOLD,
+        )
+
+    def collapse(self, items: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+        """
+        Returns (representatives in input order, {representative id: its duplicate items}).
+        """
+        candidates = []
+        texts = []
+        for position, item in enumerate(items):
+            if "body" not in item:
+                continue
+            normalized = normalize_body(item)
+            if len(normalized) >= self.min_chars:
+                candidates.append(position)
+                texts.append(normalized)
+
+        leader_of = self.group_by_minhash(texts)
+        if self.embedding_model:
+            leader_of = self.group_by_embeddings(texts, leader_of)
+
+        duplicate_positions = set()
+        duplicates: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for candidate, leader in enumerate(leader_of):
+            if leader != candidate:
+                duplicate_positions.add(candidates[candidate])
+                duplicates[items[candidates[leader]].get("id")].append(items[candidates[candidate]])
+        representatives = [item for position, item in enumerate(items) if position not in duplicate_positions]
+        return representatives, dict(duplicates)
+
+    def group_by_minhash(self, texts: List[str]) -> List[int]:
+        """
+        Leader (index into `texts`) of every text.
+        """
+        buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = defaultdict(list)
+        signatures = []
+        leader_of = []
+        exact: Dict[str, int] = {}
+        for position, text in enumerate(texts):
+            if text in exact:
+                # Verbatim copies need no signature
+                signatures.append(None)
+                leader_of.append(exact[text])
+                continue
+            signature = self.hasher.signature(shingles(text))
+            signatures.append(signature)
+            keys = self.hasher.band_keys(signature)
+            leader = position
+            checked = set()
+            for key in keys:
+                for other in buckets.get(key, ()):
+                    if other not in checked:
+                        checked.add(other)
+                        if self.hasher.similarity(signature, signatures[other]) >= self.threshold:
+                            leader = other
+                            break
+                if leader != position:
+                    break
+            leader_of.append(leader)
+            if leader == position:
+                # Only leaders are indexed, so members always join a representative
+                exact[text] = position
+                for key in keys:
+                    buckets[key].append(position)
+            else:
+                exact[text] = leader
+        return leader_of
+
+    def group_by_embeddings(self, texts: List[str], leader_of: List[int]) -> List[int]:
+        """
+        Merges the MinHash leaders whose embeddings are close (paraphrases MinHash misses).
+        Compares every pair of leaders, in blocks, so it suits up to ~100k distinct texts.
+        """
+        if np is None:
+            raise ImportError("DEDUP_EMBEDDING_MODEL needs numpy")
+        leaders = [position for position, leader in enumerate(leader_of) if leader == position]
+        if len(leaders) < 2:
+            return leader_of
+        model = load_embedding_model(self.embedding_model)
+        embeddings = np.asarray(model.encode([texts[position] for position in leaders], batch_size=256,
+                                             normalize_embeddings=True, show_progress_bar=False), dtype=np.float32)
+        merged_into = list(range(len(leaders)))
+        block = 1024
+        for start in range(0, len(leaders), block):
+            # Similarity of this block's leaders to every earlier leader
+            similarities = embeddings[start:start + block] @ embeddings[:start + block].T
+            for row in range(similarities.shape[0]):
+                current = start + row
+                earlier = np.nonzero(similarities[row, :current] >= self.embedding_threshold)[0]
+                # Join the first earlier leader that is still a representative
+                for other in earlier:
+                    if merged_into[other] == other:
+                        merged_into[current] = int(other)
+                        break
+        new_leader = {leaders[index]: leaders[merged_into[index]] for index in range(len(leaders))}
+        return [new_leader[leader] for leader in leader_of]
+
+def report_collapse(total: int, representatives: List[Dict[str, Any]], duplicates: Dict[str, List[Dict[str, Any]]],
+                    tokens_per_item: float) -> None:
+    """
+    Prints how many classification calls (and prompt tokens, roughly) the collapse avoided.
+    """
+    avoided = total - len(representatives)
+    if not total:
+        return
+    print(f"Near-duplicate collapse: {total} items -> {len(representatives)} to classify "
+          f"({len(duplicates)} groups); {avoided} classification calls avoided ({avoided / total:.1%}), "
+          f"~{int(avoided * tokens_per_item)} prompt tokens")
+    largest = sorted(duplicates.items(), key=lambda entry: len(entry[1]), reverse=True)[:5]
+    for representative_id, members in largest:
+        print(f"  {representative_id}: {len(members)} duplicates")
@@ -3,7 +3,11 @@ import os
 import datetime
 from datetime import timezone
 from dotenv import load_dotenv
-import re # For simple word splitting
+import sys
+
+# Make the repo-level modules importable when run as praw_playground/find_relevant_subreddits.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from keyword_matcher import get_matcher
 
 # --- Configuration ---
 # Load environment variables from .env file
@@ -44,25 +48,15 @@ def calculate_keyword_density(text, keywords):
     """Calculates the percentage of specified keywords found in a text."""
     if not text:
         return 0.0
-    
-    # Simple word tokenization (lowercase, split by non-alphanumeric)
-    words = re.findall(r\b\w+\b', text.lower())
-    if not words:
-        return 0.0
 
-    found_keywords_count = 0
     # Use a set for faster lookup
     keyword_set = set(k.lower() for k in keywords)
-    present_keywords = set()
-
-    for word in words:
-        if word in keyword_set:
-             present_keywords.add(word) # Count unique keywords present
-
     # Density calculation: (Number of unique topic keywords found / Total number of topic keywords) * 100
     if not keyword_set:
         return 0.0 # Avoid division by zero if keyword list is empty
-        
+
+    # Whole-word, case-insensitive matching with the shared precompiled matcher
+    present_keywords = get_matcher(sorted(keyword_set)).find(text) # Unique keywords present
     density = (len(present_keywords) / len(keyword_set)) * 100
     return density
 
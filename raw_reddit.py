@@ -0,0 +1,321 @@
+import time
+from heapq import heappush
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from reddit_client import RedditRateBudget, RequestCounter
+from http_cassette import mount_cassette
+from comment_expansion import ExpansionPolicy, fetch_comments_tree
+
+# Same listing parameters PRAW uses for a submission's comments
+COMMENT_LIMIT = 2048
+COMMENT_SORT = "confidence"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RawRedditFetcher:
+    """
+    Minimal read-only Reddit API client for comment trees: one pooled keep-alive
+    requests.Session (gzip), an application-only OAuth token, and the shared RedditRateBudget.
+    Like PRAW clients, use one fetcher per worker thread.
+    """
+    def __init__(self, config, rate_budget: Optional[RedditRateBudget] = None,
+                 counter: Optional[RequestCounter] = None, max_retries: int = 3):
+        self.client_id = config.CLIENT_ID
+        self.client_secret = config.CLIENT_SECRET
+        self.oauth_url = config.REDDIT_OAUTH_URL.rstrip("/")
+        self.reddit_url = config.REDDIT_URL.rstrip("/")
+        self.rate_budget = rate_budget
+        self.counter = counter
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        mount_cassette(self.session, "reddit")
+        self.session.headers.update({"User-Agent": config.USER_AGENT, "Accept-Encoding": "gzip"})
+        self.token: Optional[str] = None
+        self.token_expires_at = 0.0
+
+    def authorize(self) -> None:
+        response = self.session.post(
+            f"{self.reddit_url}/api/v1/access_token",
+            auth=(self.client_id, self.client_secret),
+            data={"grant_type": "client_credentials"},
+            timeout=30,
+        )
+        if self.counter is not None:
+            self.counter.count += 1 # Counted like prawcore's token requests
+        response.raise_for_status()
+        data = response.json()
+        self.token = data["access_token"]
+        # Renew a minute early
+        self.token_expires_at = time.time() + float(data.get("expires_in", 3600)) - 60
+
+    def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                data: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Sends an API request (waiting on the rate budget) and returns the decoded JSON.
+        429 / 5xx responses and connection errors are retried with backoff.
+        """
+        params = dict(params or {}, raw_json=1) # Unescaped text, as PRAW requests it
+        for attempt in range(self.max_retries + 1):
+            if self.token is None or time.time() >= self.token_expires_at:
+                self.authorize()
+            if self.rate_budget is not None:
+                self.rate_budget.acquire()
+            try:
+                response = self.session.request(method, f"{self.oauth_url}{path}", params=params, data=data,
+                                                headers={"Authorization": f"bearer {self.token}"}, timeout=30)
+            except requests.ConnectionError:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(2 ** attempt)
+                continue
+            if self.counter is not None:
+                self.counter.count += 1
+            if self.rate_budget is not None:
+                self.rate_budget.update(response.headers)
+            if response.status_code == 401:
+                self.token = None
+            if response.status_code in RETRY_STATUSES or response.status_code == 401:
+                if attempt < self.max_retries:
+                    time.sleep(float(response.headers.get("retry-after", 2 ** attempt)))
+                    continue
+            response.raise_for_status()
+            return response.json()
+
+    def submission(self, submission_id: str) -> "RawSubmission":
+        """
+        Fetches /comments/{id} (the submission and its initial comment listing).
+        """
+        listings = self.request("GET", f"/comments/{submission_id}/", params={"limit": COMMENT_LIMIT, "sort": COMMENT_SORT})
+        submission = RawSubmission(self, listings[0]["data"]["children"][0]["data"])
+        submission.comments.update(objectify_children(self, submission, listings[1]["data"]["children"]))
+        return submission
+
+class RawComment:
+    """
+    A comment from a raw listing. Mirrors the parts of praw.models.Comment the fetch uses.
+    """
+    __slots__ = ("data", "replies")
+
+    def __init__(self, data: Dict[str, Any], replies: List[Any]):
+        self.data = data
+        self.replies = replies
+
+    @property
+    def id(self) -> str:
+        return self.data["id"]
+
+    @property
+    def name(self) -> str:
+        return self.data.get("name") or f"t1_{self.data['id']}"
+
+    fullname = name
+
+    @property
+    def parent_id(self) -> str:
+        return self.data["parent_id"]
+
+    @property
+    def score(self) -> int:
+        return self.data.get("score")
+
+    @property
+    def body(self) -> str:
+        if "body" not in self.data:
+            raise AttributeError("body")
+        return self.data["body"]
+
+    @property
+    def is_root(self) -> bool:
+        return self.parent_id.startswith("t3_")
+
+class RawMoreComments:
+    """
+    A "more comments" stub from a raw listing. Mirrors praw.models.MoreComments, including
+    its ordering (largest count first) so expansion visits stubs in the same order as PRAW.
+    """
+    is_more_comments = True
+
+    def __init__(self, fetcher: RawRedditFetcher, submission: "RawSubmission", data: Dict[str, Any]):
+        self.fetcher = fetcher
+        self.submission = submission
+        self.count = data.get("count", 0)
+        self.children = data.get("children", [])
+        self.name = data.get("name")
+        self.parent_id = data["parent_id"]
+        self._comments: Optional[List[Any]] = None
+        self._remove_from: List[Any] = []
+
+    def __lt__(self, other: "RawMoreComments") -> bool:
+        return self.count > other.count
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, RawMoreComments):
+            return self.count == other.count and self.children == other.children
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((self.count, tuple(self.children)))
+
+    def comments(self, update: bool = True) -> List[Any]:
+        """
+        Fetches the comments behind the stub: /api/morechildren, or for a "continue this
+        thread" stub (count 0) the parent comment's own listing.
+        """
+        if self._comments is None:
+            if self.count == 0:
+                parent_id = self.parent_id.split("_", 1)[1]
+                listings = self.fetcher.request("GET", f"/comments/{self.submission.id}/_/{parent_id}",
+                                                params={"limit": COMMENT_LIMIT, "sort": COMMENT_SORT})
+                parent = objectify_children(self.fetcher, self.submission, listings[1]["data"]["children"])[0]
+                self._comments = parent.replies
+            else:
+                response = self.fetcher.request("POST", "/api/morechildren", data={
+                    "api_type": "json",
+                    "children": ",".join(self.children),
+                    "link_id": self.submission.fullname,
+                    "sort": COMMENT_SORT,
+                })
+                self._comments = objectify_children(self.fetcher, self.submission, response["json"]["data"]["things"])
+        return self._comments
+
+class RawCommentForest:
+    """
+    The submission's top-level comments, with the bookkeeping of PRAW's CommentForest
+    (_gather_more_comments / _insert_comment) that expand_more_comments relies on.
+    """
+    def __init__(self, submission: "RawSubmission"):
+        self.submission = submission
+        self._comments: List[Any] = []
+
+    def update(self, comments: List[Any]) -> None:
+        self._comments = comments
+        for comment in comments:
+            self.submission.register(comment)
+
+    @staticmethod
+    def _gather_more_comments(tree: List[Any], parent_tree: Optional[List[Any]] = None) -> List[RawMoreComments]:
+        more_comments: List[RawMoreComments] = []
+        queue: List[Tuple[Optional[RawComment], Any]] = [(None, comment) for comment in tree]
+        while queue:
+            parent, comment = queue.pop(0)
+            if isinstance(comment, RawMoreComments):
+                heappush(more_comments, comment)
+                comment._remove_from = parent.replies if parent is not None else (parent_tree or tree)
+            else:
+                queue.extend((comment, reply) for reply in comment.replies)
+        return more_comments
+
+    def _insert_comment(self, comment: Any) -> None:
+        if isinstance(comment, RawComment) and comment.name in self.submission._comments_by_id:
+            raise ValueError(f"Comment {comment.name} was already inserted")
+        self.submission.register(comment)
+        if isinstance(comment, RawMoreComments) or comment.is_root:
+            self._comments.append(comment)
+        else:
+            self.submission._comments_by_id[comment.parent_id].replies.append(comment)
+
+    def list(self) -> List[Any]:
+        """
+        All comments, breadth-first (the order of PRAW's CommentForest.list()).
+        """
+        comments = []
+        queue = list(self._comments)
+        while queue:
+            comment = queue.pop(0)
+            comments.append(comment)
+            if not isinstance(comment, RawMoreComments):
+                queue.extend(comment.replies)
+        return comments
+
+class RawSubmission:
+    def __init__(self, fetcher: RawRedditFetcher, data: Dict[str, Any]):
+        self.fetcher = fetcher
+        self.data = data
+        self.id = data["id"]
+        self.fullname = data.get("name") or f"t3_{data['id']}"
+        self.num_comments = data.get("num_comments")
+        self._comments_by_id: Dict[str, RawComment] = {}
+        self.comments = RawCommentForest(self)
+
+    def register(self, comment: Any) -> None:
+        """
+        Indexes a comment and its replies by fullname (what PRAW's Comment.submission setter does).
+        """
+        stack = [comment]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, RawComment):
+                self._comments_by_id[node.name] = node
+                stack.extend(node.replies)
+
+def objectify_children(fetcher: RawRedditFetcher, submission: RawSubmission, children: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Turns listing children ({"kind": "t1" | "more", "data": ...}) into RawComment /
+    RawMoreComments objects, with nested reply listings, iteratively.
+    """
+    result: List[Any] = []
+    stack = [(children, result)]
+    while stack:
+        things, target = stack.pop()
+        for thing in things:
+            if thing["kind"] == "more":
+                target.append(RawMoreComments(fetcher, submission, thing["data"]))
+            elif thing["kind"] == "t1":
+                data = thing["data"]
+                replies_listing = data.get("replies")
+                comment = RawComment(data, [])
+                target.append(comment)
+                if replies_listing:
+                    stack.append((replies_listing["data"]["children"], comment.replies))
+    return result
+
+def raw_comment_node(comment: RawComment) -> Optional[Dict[str, Any]]:
+    """
+    Same dict as fetch_reddit_comments.process_comment_node produces for the PRAW comment,
+    built iteratively (None for "more comments", which it skips too).
+    """
+    if isinstance(comment, RawMoreComments):
+        return None
+
+    def node_dict(node: RawComment) -> Dict[str, Any]:
+        data = node.data
+        author = data.get("author")
+        return {
+            "id": data["id"],
+            "author": author if author and author != "[deleted]" else "[deleted]",
+            "body": data.get("body", "[deleted]"),
+            "created_utc": data.get("created_utc"),
+            "score": data.get("score"),
+            "depth": data.get("depth"),
+            "replies": []
+        }
+
+    root = node_dict(comment)
+    stack = [(comment, root)]
+    while stack:
+        node, node_data = stack.pop()
+        for reply in node.replies:
+            if isinstance(reply, RawMoreComments):
+                continue
+            reply_data = node_dict(reply)
+            node_data["replies"].append(reply_data)
+            stack.append((reply, reply_data))
+    return root
+
+def fetch_submission_tree_raw(fetcher: RawRedditFetcher, submission_info: Dict[str, Any], counter: Optional[RequestCounter] = None,
+                              relevant: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                              policy: Optional[ExpansionPolicy] = None) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    fetch_reddit_comments.fetch_submission_tree on raw JSON listings. Both go through
+    comment_expansion.fetch_comments_tree, so expansion, pruning and stats are the same code.
+    """
+    submission_id = submission_info.get('id')
+
+    def load_submission():
+        print(f"  [{submission_id}] Fetching raw comment listing...")
+        return fetcher.submission(submission_id)
+
+    return fetch_comments_tree(load_submission, submission_info, raw_comment_node, counter, relevant, policy)
@@ -0,0 +1,103 @@
+import time
+import threading
+from typing import Mapping, Optional
+import praw
+import prawcore
+from http_cassette import reddit_session
+
+
+class RedditRateBudget:
+    """
+    Request budget shared by every Reddit client (and thread) of a run.
+    It is fed from the X-Ratelimit-* response headers instead of sleeping a fixed delay:
+    requests go out immediately while plenty of the window's budget is left, and once fewer
+    than `pace_below` remain they are spread evenly over the time left in the window.
+    """
+    def __init__(self, reserve: int = 10, pace_below: int = 100):
+        self.reserve = reserve # Requests kept in hand for retries / other tools
+        self.pace_below = pace_below
+        self.remaining: Optional[float] = None
+        self.reset_at: Optional[float] = None
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Block until the next request may be sent.
+        """
+        with self.lock:
+            now = time.time()
+            if self.remaining is None or self.reset_at is None:
+                # No headers seen yet: let the first requests through
+                return
+            window = max(0.0, self.reset_at - now)
+            if self.remaining <= self.reserve:
+                delay = window
+                self.next_slot = self.reset_at
+            elif self.remaining - self.reserve > self.pace_below:
+                delay = 0.0
+            else:
+                interval = window / (self.remaining - self.reserve)
+                slot = max(now, self.next_slot)
+                self.next_slot = slot + interval
+                delay = slot - now
+            self.remaining -= 1
+        if delay > 0:
+            time.sleep(delay)
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        """
+        Refresh the budget from a response's X-Ratelimit-Remaining / X-Ratelimit-Reset headers.
+        """
+        if "x-ratelimit-remaining" not in headers or "x-ratelimit-reset" not in headers:
+            return
+        with self.lock:
+            self.remaining = float(headers["x-ratelimit-remaining"])
+            self.reset_at = time.time() + float(headers["x-ratelimit-reset"])
+            if self.reset_at < self.next_slot:
+                self.next_slot = self.reset_at
+
+class RequestCounter:
+    """
+    Counts the HTTP requests made by one Reddit client.
+    """
+    def __init__(self):
+        self.count = 0
+
+class BudgetedRequestor(prawcore.Requestor):
+    """
+    prawcore Requestor that waits on a shared RedditRateBudget before every request,
+    updates it from the response headers and counts the requests it makes.
+    """
+    def __init__(self, *args, rate_budget: Optional[RedditRateBudget] = None,
+                 counter: Optional[RequestCounter] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_budget = rate_budget
+        self.counter = counter
+
+    def request(self, *args, **kwargs):
+        if self.rate_budget is not None:
+            self.rate_budget.acquire()
+        response = super().request(*args, **kwargs)
+        if self.counter is not None:
+            self.counter.count += 1
+        if self.rate_budget is not None:
+            self.rate_budget.update(response.headers)
+        return response
+
+def make_reddit(config, rate_budget: Optional[RedditRateBudget] = None,
+                counter: Optional[RequestCounter] = None) -> praw.Reddit:
+    """
+    Creates a praw.Reddit client for `config`'s credentials.
+    PRAW clients are not thread-safe: create one per worker thread and share the rate budget.
+    With HTTP_CASSETTE_MODE set, its requests are recorded to / replayed from the "reddit" cassette.
+    """
+    return praw.Reddit(
+        client_id=config.CLIENT_ID,
+        client_secret=config.CLIENT_SECRET,
+        user_agent=config.USER_AGENT,
+        oauth_url=config.REDDIT_OAUTH_URL,
+        reddit_url=config.REDDIT_URL,
+        requestor_class=BudgetedRequestor,
+        requestor_kwargs={"rate_budget": rate_budget, "counter": counter, "session": reddit_session()},
+    )
@@ -2,9 +2,13 @@ import praw
 import datetime
 import time
 import os
+import threading
 from collections import defaultdict
-import re # Import regex for finding keyphrases
+from concurrent.futures import ThreadPoolExecutor
 import json # Import json library
+from reddit_client import RedditRateBudget, make_reddit
+from keyword_matcher import get_matcher
+from corpus_store import store_from_config
 
 # --- End Configuration ---
 
@@ -14,23 +18,89 @@ def get_keyphrase_match_percentage(text, keyphrases):
     Performs case-insensitive matching.
     Returns a tuple: (score, list_of_matched_keywords)
     """
-    if not text or not keyphrases:
-        return 0.0, []
-
-    matched_keywords = []
-    found_count = 0
-    # Use regex to find whole word matches for phrases
-    for phrase in keyphrases:
-        # Create a regex pattern for the phrase using word boundaries (\b)
-        # re.escape handles any special regex characters within the phrase itself
-        pattern = r'\b' + re.escape(phrase) + r'\b'
-        # Search case-insensitively using re.IGNORECASE
-        if re.search(pattern, text, re.IGNORECASE):
-            found_count += 1
-            matched_keywords.append(phrase) # Add the matched keyword to the list
-
-    score = (found_count / len(keyphrases)) * 100 if keyphrases else 0.0
-    return score, matched_keywords
+    # The matcher for a keyphrase list is compiled once and reused for every submission
+    return get_matcher(keyphrases).score(text)
+
+def search_subreddit(reddit, sub_name, search_query, start_timestamp, end_timestamp, content_keywords, score_threshold):
+    """
+    Searches a single subreddit and returns its matching submissions (unsorted),
+    or None if the search failed.
+    """
+    print(f"\n--- Searching r/{sub_name} --- ")
+    # Keep track of processed submissions per subreddit to avoid duplicates within that sub's search results
+    processed_submissions_this_sub = set()
+    results_this_sub = [] # Temporary list for the current subreddit
+
+    try:
+        subreddit = reddit.subreddit(sub_name)
+        print(f"Fetching submissions from r/{sub_name} (this might take a while)...")
+        # PRAW's search limits results, might need multiple searches or Pushshift for historical data
+        # Default sort is 'relevance', could also use 'new', 'top', 'comments'
+        # Limit can be set, but PRAW handles pagination; we'll filter by date manually
+        # Note: Reddit's native search might not guarantee finding *all* posts in a large date range.
+        # For comprehensive historical searches, Pushshift API (via PSAW or requests) is often better,
+        # but it has its own limitations and is a separate service.
+        for submission in subreddit.search(search_query, sort='relevance', limit=None): # Fetch more initially, then filter
+            # Basic duplicate check for this subreddit's search
+            if submission.id in processed_submissions_this_sub:
+                continue
+
+            # print(submission.title) # Debug print
+            # print(submission.id) # Debug print
+
+            submission_time = submission.created_utc
+
+            # Filter by date
+            if start_timestamp <= submission_time <= end_timestamp:
+                # print(submission.selftext) # Debug print
+                text_to_search = submission.title + " " + submission.selftext
+                # Get score and the list of matched keywords
+                score, matched_keywords = get_keyphrase_match_percentage(text_to_search, content_keywords)
+                # print(score) # Debug print
+                if score > score_threshold: # Only include posts that actually contain at least one keyphrase
+                    # Truncate selftext to first 50 words
+                    # selftext_preview = ""
+                    # if submission.selftext:
+                    #     words = submission.selftext.split()
+                    #     selftext_preview = words
+                        # if len(words) > 100:
+                        #     selftext_preview += "..."
+
+                    results_this_sub.append({
+                        "id": submission.id,
+                        "score": score,
+                        "title": submission.title,
+                        "created_utc": submission.created_utc,
+                        "selftext_preview": submission.selftext, # Add truncated selftext
+                        "matched_keywords": matched_keywords # Add list of matched keywords
+                    })
+                    processed_submissions_this_sub.add(submission.id)
+                    print(f"Found potential match in r/{sub_name}: ID {submission.id}, Score: {score:.2f}%" ) # Progress indicator
+                    # print(submission.title) # Debug print
+
+            # Stop if we've processed enough potential candidates even before sorting/limiting
+            # This is a heuristic to avoid excessive API calls if MAX_RESULTS is small
+            # if len(results_this_sub) > MAX_RESULTS * 5 and MAX_RESULTS > 0: # Check 5x needed results
+            #    print("Gathered sufficient potential candidates, proceeding to sort...")
+            #    break
+
+            # Check if submission is older than start date - stop searching if sorted by 'new'
+            if submission_time < start_timestamp:
+                 print(f"Reached submissions older than the start date in r/{sub_name}, stopping search for this subreddit.")
+                 break
+
+        print(f"Found {len(results_this_sub)} posts in r/{sub_name} within the date range containing keyphrases.")
+        return results_this_sub
+
+    except praw.exceptions.PRAWException as e:
+        print(f"An error occurred during search in r/{sub_name}: {e}")
+        print(f"Skipping subreddit r/{sub_name}...")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred during search in r/{sub_name}: {e}")
+        print(f"Skipping subreddit r/{sub_name}...")
+        return None
+
 
 def search_reddit(config):
     """
@@ -55,15 +125,12 @@ def search_reddit(config):
     if USER_AGENT == "KeyphraseSearcher/0.1 by YourUsername":
          print("WARNING: Please update the REDDIT_USER_AGENT in your .env file or environment variable with a unique identifier, including your Reddit username.")
 
+    # Request budget shared by every search worker, driven by Reddit's X-Ratelimit-* headers
+    rate_budget = RedditRateBudget(reserve=config.RATE_LIMIT_RESERVE)
+
     print(f"Initializing Reddit connection...")
     try:
-        reddit = praw.Reddit(
-            client_id=CLIENT_ID,
-            client_secret=CLIENT_SECRET,
-            user_agent=USER_AGENT,
-            # Optional: Add read_only=True if you don't need to perform actions requiring login
-            # read_only=True
-        )
+        reddit = make_reddit(config, rate_budget=rate_budget)
         # Test connection
         print(f"Read Only Status: {reddit.read_only}")
         reddit.user.me() # Basic check to see if credentials work (even in read-only)
@@ -94,85 +161,24 @@ def search_reddit(config):
 
     print(f"Using search query: {search_query}")
 
-    for sub_name in SUBREDDITS_TO_SEARCH:
-        print(f"\n--- Searching r/{sub_name} --- ")
-        # Keep track of processed submissions per subreddit to avoid duplicates within that sub's search results
-        processed_submissions_this_sub = set()
-        results_this_sub = [] # Temporary list for the current subreddit
-
-        try:
-            subreddit = reddit.subreddit(sub_name)
-            print(f"Fetching submissions from r/{sub_name} (this might take a while)...")
-            # PRAW's search limits results, might need multiple searches or Pushshift for historical data
-            # Default sort is 'relevance', could also use 'new', 'top', 'comments'
-            # Limit can be set, but PRAW handles pagination; we'll filter by date manually
-            # Note: Reddit's native search might not guarantee finding *all* posts in a large date range.
-            # For comprehensive historical searches, Pushshift API (via PSAW or requests) is often better,
-            # but it has its own limitations and is a separate service.
-            for submission in subreddit.search(search_query, sort='relevance', limit=None): # Fetch more initially, then filter
-                # Basic duplicate check for this subreddit's search
-                if submission.id in processed_submissions_this_sub:
-                    continue
-
-                # print(submission.title) # Debug print
-                # print(submission.id) # Debug print
-
-                submission_time = submission.created_utc
-
-                # Filter by date
-                if start_timestamp <= submission_time <= end_timestamp:
-                    # print(submission.selftext) # Debug print
-                    text_to_search = submission.title + " " + submission.selftext
-                    # Get score and the list of matched keywords
-                    score, matched_keywords = get_keyphrase_match_percentage(text_to_search, CONTENT_KEYWORDS)
-                    # print(score) # Debug print
-                    if score > SCORE_THRESHOLD: # Only include posts that actually contain at least one keyphrase
-                        # Truncate selftext to first 50 words
-                        # selftext_preview = ""
-                        # if submission.selftext:
-                        #     words = submission.selftext.split()
-                        #     selftext_preview = words
-                            # if len(words) > 100:
-                            #     selftext_preview += "..."
-
-                        results_this_sub.append({
-                            "id": submission.id,
-                            "score": score,
-                            "title": submission.title,
-                            "created_utc": submission.created_utc,
-                            "selftext_preview": submission.selftext, # Add truncated selftext
-                            "matched_keywords": matched_keywords # Add list of matched keywords
-                        })
-                        processed_submissions_this_sub.add(submission.id)
-                        print(f"Found potential match in r/{sub_name}: ID {submission.id}, Score: {score:.2f}%" ) # Progress indicator
-                        # print(submission.title) # Debug print
-
-                # Optional: Add a small delay to be nice to Reddit's API
-                time.sleep(0.1)
-
-                # Stop if we've processed enough potential candidates even before sorting/limiting
-                # This is a heuristic to avoid excessive API calls if MAX_RESULTS is small
-                # if len(results_this_sub) > MAX_RESULTS * 5 and MAX_RESULTS > 0: # Check 5x needed results
-                #    print("Gathered sufficient potential candidates, proceeding to sort...")
-                #    break
-
-                # Check if submission is older than start date - stop searching if sorted by 'new'
-                if submission_time < start_timestamp:
-                     print(f"Reached submissions older than the start date in r/{sub_name}, stopping search for this subreddit.")
-                     break
-
-            # Store results for this subreddit
-            all_results[sub_name] = results_this_sub
-            print(f"Found {len(results_this_sub)} posts in r/{sub_name} within the date range containing keyphrases.")
-
-        except praw.exceptions.PRAWException as e:
-            print(f"An error occurred during search in r/{sub_name}: {e}")
-            print(f"Skipping subreddit r/{sub_name}...")
-            continue # Move to the next subreddit
-        except Exception as e:
-            print(f"An unexpected error occurred during search in r/{sub_name}: {e}")
-            print(f"Skipping subreddit r/{sub_name}...")
-            continue # Move to the next subreddit
+    # One worker per subreddit, each with its own PRAW client (PRAW is not thread-safe).
+    # Instead of a fixed sleep per result, all clients wait on the shared rate budget.
+    worker_clients = threading.local()
+
+    def search_worker(sub_name):
+        if not hasattr(worker_clients, "reddit"):
+            worker_clients.reddit = make_reddit(config, rate_budget=rate_budget)
+        return search_subreddit(worker_clients.reddit, sub_name, search_query, start_timestamp, end_timestamp,
+                                CONTENT_KEYWORDS, SCORE_THRESHOLD)
+
+    unique_subreddits = list(dict.fromkeys(SUBREDDITS_TO_SEARCH))
+    with ThreadPoolExecutor(max_workers=max(1, min(config.SEARCH_MAX_WORKERS, len(unique_subreddits)))) as executor:
+        results_by_sub = dict(zip(unique_subreddits, executor.map(search_worker, unique_subreddits)))
+
+    # Store results per subreddit in the configured order (failed searches are left out)
+    for sub_name in unique_subreddits:
+        if results_by_sub[sub_name] is not None:
+            all_results[sub_name] = results_by_sub[sub_name]
 
     print(f"\n--- Processing Complete --- ")
 
@@ -222,6 +228,12 @@ def search_reddit(config):
     except Exception as e:
         print(f"An unexpected error occurred while writing JSON: {e}")
 
+    store = store_from_config(config)
+    if store is not None:
+        store.add_search_results(final_results_for_json)
+        print(f"Stored {len(final_results_for_json)} submissions in {store.path}")
+        store.close()
+
     print(f"\n--- Script Finished --- ")
     # Example URL from the first result saved (if any)
     if final_results_for_json:
@@ -0,0 +1,31 @@
+from typing import Any, Callable, Dict
+from keyword_matcher import get_matcher
+
+KYIV_MATCHER = get_matcher(["kyiv", "kiev", "kyviv"])
+
+
+def check_kyiv_mentioned(text: str) -> bool:
+    """Check if 'Kyiv' or 'Kiev' is mentioned in the text."""
+    return KYIV_MATCHER.contains_any(text)
+
+def is_relevant(comment: Dict[str, Any]) -> bool:
+    score_filter = comment.get('score', 0) > 150 or comment.get('score', 0) < -10
+    #  or 
+    return score_filter or check_kyiv_mentioned(comment.get('body', ''))
+
+def keep_all(comment: Dict[str, Any]) -> bool:
+    return True
+
+# Relevance predicates by RELEVANCE_PREDICATE name. A predicate takes a comment dict (at least
+# 'score' and 'body') and is applied to every comments_tree entry, by the flattener and, with
+# PRUNE_IRRELEVANT_AT_FETCH, already while fetching.
+RELEVANCE_PREDICATES: Dict[str, Callable[[Dict[str, Any]], bool]] = {
+    "score_or_kyiv": is_relevant,
+    "all": keep_all,
+}
+
+def relevance_predicate(config) -> Callable[[Dict[str, Any]], bool]:
+    name = config.RELEVANCE_PREDICATE
+    if name not in RELEVANCE_PREDICATES:
+        raise ValueError(f"Unknown RELEVANCE_PREDICATE '{name}' (expected one of {list(RELEVANCE_PREDICATES)})")
+    return RELEVANCE_PREDICATES[name]
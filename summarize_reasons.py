@@ -1,67 +1,130 @@
 import os
 import json
 import argparse
+from bisect import bisect_left
 from tqdm import tqdm
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from openai import OpenAI
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple, Union
 from dotenv import load_dotenv
+from llm_cache import LLMCache, cached_output_text, cached_response_text
+from http_cassette import openai_http_client
+from llm_engine import ClassificationEngine, estimate_tokens
+from config import LLMConfig
+from corpus_store import CorpusStore
 
 # Load environment variables
 load_dotenv()
-client = OpenAI()
+# Retries are handled by the ClassificationEngine (with backoff shared across all dates)
+client = OpenAI(max_retries=0, http_client=openai_http_client())
 
-def filter_data_by_date_and_support(input_file: str, target_date: str, support_level: str) -> List[Dict[str, Any]]:
+def date_timestamp(date: str) -> int:
+    return int(datetime.strptime(date, "%Y-%m-%d").timestamp())
+
+class AnalysisIndex:
+    """
+    The analyzed comments of one analysis file, loaded once and partitioned by support level.
+    Each partition is sorted by created_utc, so "created on or after a date" (and date windows)
+    are bisect slices instead of a scan of the whole file per date.
+    """
+    def __init__(self, analyzed_comments: List[Dict[str, Any]]):
+        # support level -> (timestamps, file positions, items), all sorted by (created_utc, position)
+        self.partitions: Dict[Any, Tuple[List[float], List[int], List[Dict[str, Any]]]] = {}
+        entries: Dict[Any, List[Tuple[float, int, Dict[str, Any]]]] = {}
+        for position, item in enumerate(analyzed_comments):
+            support = item.get("analysis", {}).get("supports")
+            entries.setdefault(support, []).append((item.get("created_utc", 0), position, item))
+        for support, support_entries in entries.items():
+            support_entries.sort(key=lambda entry: (entry[0], entry[1]))
+            self.partitions[support] = (
+                [entry[0] for entry in support_entries],
+                [entry[1] for entry in support_entries],
+                [entry[2] for entry in support_entries]
+            )
+
+    @classmethod
+    def from_file(cls, input_file: str) -> "AnalysisIndex":
+        with open(input_file, 'r') as f:
+            data = json.load(f)
+        return cls(data.get("analyzed_comments", []))
+
+    def between(self, support_level: str, start_timestamp: float, end_timestamp: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Items of a support level with start_timestamp <= created_utc (< end_timestamp), in file order.
+        """
+        if support_level not in self.partitions:
+            return []
+        timestamps, positions, items = self.partitions[support_level]
+        start = bisect_left(timestamps, start_timestamp)
+        end = len(timestamps) if end_timestamp is None else bisect_left(timestamps, end_timestamp)
+        # Back to file order, so prompts (and their cache keys) do not depend on the index
+        selected = sorted(range(start, end), key=lambda index: positions[index])
+        return [items[index] for index in selected]
+
+class StoreAnalysisIndex:
+    """
+    Same `between` as AnalysisIndex, served by a corpus store (USE_CORPUS_STORE): every date
+    window is one analyses_between query on the (supports, created_utc) index, and nothing is
+    loaded up front. Items come in created_utc order. Used from one thread.
+    """
+    def __init__(self, store: CorpusStore):
+        self.store = store
+
+    @classmethod
+    def from_path(cls, path: str) -> "StoreAnalysisIndex":
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No corpus store at {path} (written by the pipeline with USE_CORPUS_STORE = True)")
+        return cls(CorpusStore(path))
+
+    def between(self, support_level: str, start_timestamp: float, end_timestamp: Optional[float] = None) -> List[Dict[str, Any]]:
+        return self.store.analysis_records_between(start_timestamp, end_timestamp, support_level)
+
+AnalysisSource = Union[AnalysisIndex, StoreAnalysisIndex]
+
+def load_analysis_index(args: argparse.Namespace) -> AnalysisSource:
+    """
+    The analyses to summarize: from the corpus store if --corpus_db is given, else the --input file.
+    """
+    if getattr(args, "corpus_db", None):
+        return StoreAnalysisIndex.from_path(args.corpus_db)
+    return AnalysisIndex.from_file(args.input)
+
+def filter_data_by_date_and_support(input_file: str, target_date: str, support_level: str,
+                                    index: Optional[AnalysisIndex] = None) -> List[Dict[str, Any]]:
     """
     Filter data based on target date and support level.
     Args:
-        input_file: Path to the input JSON file
+        input_file: Path to the input JSON file (only read if no `index` is given)
         target_date: Date string in YYYY-MM-DD format
         support_level: One of 'true', 'false', or 'neutral'
+        index: Optional AnalysisIndex of the input file, shared across dates
     Returns:
-        List of filtered comments/posts
+        List of filtered comments/posts (created on or after the target date)
     """
-    with open(input_file, 'r') as f:
-        data = json.load(f)
-    
-    filtered_data = []
-    target_timestamp = int(datetime.strptime(target_date, "%Y-%m-%d").timestamp())
-    
-    for item in data.get("analyzed_comments", []):
-        # Check if the item matches the support level
-        if item.get("analysis", {}).get("supports") == support_level:
-            # Check if the item's timestamp is after the target date
-            if item.get("created_utc", 0) >= target_timestamp:
-                filtered_data.append(item)
-    
-    return filtered_data
+    if index is None:
+        index = AnalysisIndex.from_file(input_file)
+    return index.between(support_level, date_timestamp(target_date))
 
-def get_reasons_summary(filtered_data: List[Dict[str, Any]], claim: str, context_type: str, support_level: str) -> Dict[str, str]:
+def format_context_item(item: Dict[str, Any], context_type: str) -> str:
     """
-    Get a summary of key reasons from filtered data using ChatGPT.
-    Args:
-        filtered_data: List of filtered comments/posts
-        claim: The claim being analyzed
-        context_type: The type of context to use for the summary
-    Returns:
-        Dictionary of reason headers and details
+    The text of one comment/post in a summary prompt.
+    """
+    item_context = []
+    if context_type == 'raw_text':
+        if item.get("is_post"):
+            item_context.append(f"Post Title: {item.get('title', '')}")
+            item_context.append(f"Content: {item.get('selftext_preview', '')}")
+        else:
+            item_context.append(f"Comment: {item.get('body', '')}")
+    elif context_type == 'reasoning':
+        item_context.append(f"Analysis: {item.get('analysis', {}).get('reasoning', '')}")
+    return "\n".join(item_context)
+
+def describe_request(context_type: str, support_level: str) -> Tuple[str, str]:
+    """
+    Returns the (context type, support) wording used in the summary prompts.
     """
-    # Prepare the context for ChatGPT
-    context = []
-    for item in filtered_data:
-        item_context = []
-        if context_type == 'raw_text':
-            if item.get("is_post"):
-                item_context.append(f"Post Title: {item.get('title', '')}")
-                item_context.append(f"Content: {item.get('selftext_preview', '')}")
-            else:
-                item_context.append(f"Comment: {item.get('body', '')}")
-        elif context_type == 'reasoning':
-            item_context.append(f"Analysis: {item.get('analysis', {}).get('reasoning', '')}")
-        context.append("\n".join(item_context))
-    
-    context_str = "\n---\n".join(context)
-    
     context_type_description = {
         'raw_text': 'Reddit comments and posts',
         'reasoning': 'analysis of Reddit comments and posts'
@@ -72,13 +135,48 @@ def get_reasons_summary(filtered_data: List[Dict[str, Any]], claim: str, context
         'true': 'support',
         'false': 'refute',
     }
+    return context_type_description[context_type], support_level_description[support_level]
 
-    context_type_str = context_type_description[context_type]
-    support_str = support_level_description[support_level]
+def summary_text_format(claim: str, support_str: str) -> Dict[str, Any]:
+    return {
+        "format": {
+            "type": "json_schema",
+            "name": "support_analysis_explained",
+            "schema": {
+                "type": "object",
+                "description": f"A list of compiled reasons that {support_str}s the claim: '{claim}'. Each key is a short reason header, and each value is a short explanation.",
+                "additionalProperties": {
+                    "type": "string"
+                }
+            },
+            "strict": True
+        }
+    }
+
+def build_summary_request(filtered_data: List[Dict[str, Any]], claim: str, context_type: str,
+                          support_level: str, previous_summary: Optional[Dict[str, str]] = None) -> Tuple[str, str, Dict[str, Any]]:
+    """
+    Builds the (instructions, prompt, text format) of a reasons summary request.
+    With `previous_summary`, the model updates that summary with `filtered_data` instead of
+    summarizing from scratch.
+    """
+    # Prepare the context for ChatGPT
+    context_str = "\n---\n".join(format_context_item(item, context_type) for item in filtered_data)
+    context_type_str, support_str = describe_request(context_type, support_level)
+
+    previous_section = ""
+    if previous_summary is not None:
+        previous_section = f"""Here is the summary of the key reasons from the other {context_type_str} considered so far:
+
+{json.dumps(previous_summary, indent=4)}
+
+Merge it with the new {context_type_str} below into one updated summary.
+
+"""
 
     prompt = f"""Please summarize the following {context_type_str} that {support_str}s the claim: "{claim}"
 
-Here are the relevant {context_type_str}:
+{previous_section}Here are the relevant {context_type_str}:
 
 {context_str}
 
@@ -92,34 +190,192 @@ Response format:
     "Reason Header 2": "Brief explanation of this reason",
     ...
 }}"""
-    print(prompt)
-    1/0
-    try:
-        response = client.responses.create(
-            model="gpt-4o",
-            input = prompt,
-            instructions = f"You are an objective analyst tasked with summarizing key reasons from {context_type_str} for {support_str}ing the claim: '{claim}'.",
-            text={
-                "format": {
-                    "type": "json_schema",
-                    "name": "support_analysis_explained",
-                    "schema": {
-                        "type": "object",
-                        "description": f"A list of compiled reasons that {support_str}s the claim: '{claim}'. Each key is a short reason header, and each value is a short explanation.",
-                        "additionalProperties": {
-                            "type": "string"
-                        }
-                    },
-                    "strict": True
-                }
-            }
+    instructions = f"You are an objective analyst tasked with summarizing key reasons from {context_type_str} for {support_str}ing the claim: '{claim}'."
+    return instructions, prompt, summary_text_format(claim, support_str)
+
+def request_reasons_summary(filtered_data: List[Dict[str, Any]], claim: str, context_type: str, support_level: str,
+                            cache: Optional[LLMCache] = None, previous_summary: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Requests a reasons summary; errors are raised (so the engine can retry them).
+    """
+    instructions, prompt, text_format = build_summary_request(filtered_data, claim, context_type, support_level, previous_summary)
+    output_text = cached_response_text(client, cache, "gpt-4o", instructions, prompt, text_format)
+    return json.loads(output_text)
+
+def cached_reasons_summary(filtered_data: List[Dict[str, Any]], claim: str, context_type: str, support_level: str,
+                           cache: Optional[LLMCache] = None, previous_summary: Optional[Dict[str, str]] = None) -> Optional[Dict[str, str]]:
+    """
+    The summary request_reasons_summary would serve from `cache`, or None.
+    """
+    instructions, prompt, text_format = build_summary_request(filtered_data, claim, context_type, support_level, previous_summary)
+    output_text = cached_output_text(cache, "gpt-4o", instructions, prompt, text_format)
+    return json.loads(output_text) if output_text is not None else None
+
+def estimate_summary_tokens(filtered_data: List[Dict[str, Any]], claim: str, context_type: str, support_level: str,
+                            previous_summary: Optional[Dict[str, str]] = None) -> int:
+    instructions, prompt, _ = build_summary_request(filtered_data, claim, context_type, support_level, previous_summary)
+    return estimate_tokens(instructions) + estimate_tokens(prompt)
+
+def build_merge_request(partial_summaries: List[Dict[str, str]], claim: str, context_type: str,
+                        support_level: str) -> Tuple[str, str, Dict[str, Any]]:
+    """
+    Builds the (instructions, prompt, text format) of a reduce request, which merges the partial
+    summaries of several chunks into one summary of the same shape.
+    """
+    context_type_str, support_str = describe_request(context_type, support_level)
+    partials_str = "\n---\n".join(json.dumps(summary, indent=4) for summary in partial_summaries)
+
+    prompt = f"""The following are summaries of the key reasons that {support_str} the claim: "{claim}".
+Each summary covers a different part of the same collection of {context_type_str}.
+
+{partials_str}
+
+Please merge them into one summary of the key reasons that {support_str}s the claim: "{claim}".
+Combine reasons that describe the same pattern or theme, keep distinct reasons separate, and do not add reasons that are not in the summaries.
+Format your response as a JSON object where each key is a reason header and the value is a brief explanation.
+
+Response format:
+{{
+    "Reason Header 1": "Brief explanation of this reason",
+    "Reason Header 2": "Brief explanation of this reason",
+    ...
+}}"""
+    instructions = f"You are an objective analyst tasked with merging summaries of key reasons from {context_type_str} for {support_str}ing the claim: '{claim}'."
+    return instructions, prompt, summary_text_format(claim, support_str)
+
+def request_merged_summary(partial_summaries: List[Dict[str, str]], claim: str, context_type: str, support_level: str,
+                           cache: Optional[LLMCache] = None) -> Dict[str, str]:
+    instructions, prompt, text_format = build_merge_request(partial_summaries, claim, context_type, support_level)
+    output_text = cached_response_text(client, cache, "gpt-4o", instructions, prompt, text_format)
+    return json.loads(output_text)
+
+def cached_merged_summary(partial_summaries: List[Dict[str, str]], claim: str, context_type: str, support_level: str,
+                          cache: Optional[LLMCache] = None) -> Optional[Dict[str, str]]:
+    instructions, prompt, text_format = build_merge_request(partial_summaries, claim, context_type, support_level)
+    output_text = cached_output_text(cache, "gpt-4o", instructions, prompt, text_format)
+    return json.loads(output_text) if output_text is not None else None
+
+def estimate_merge_tokens(partial_summaries: List[Dict[str, str]], claim: str, context_type: str, support_level: str) -> int:
+    instructions, prompt, _ = build_merge_request(partial_summaries, claim, context_type, support_level)
+    return estimate_tokens(instructions) + estimate_tokens(prompt)
+
+def chunk_by_tokens(filtered_data: List[Dict[str, Any]], context_type: str, chunk_tokens: Optional[int]) -> List[List[Dict[str, Any]]]:
+    """
+    Splits the items, in order, into chunks whose context fits in `chunk_tokens` estimated tokens
+    (an item larger than the budget gets a chunk of its own). None disables chunking.
+    """
+    if not chunk_tokens or not filtered_data:
+        return [filtered_data]
+    chunks: List[List[Dict[str, Any]]] = [[]]
+    used = 0
+    for item in filtered_data:
+        cost = estimate_tokens(format_context_item(item, context_type)) + 2 # "---" separator
+        if chunks[-1] and used + cost > chunk_tokens:
+            chunks.append([])
+            used = 0
+        chunks[-1].append(item)
+        used += cost
+    return chunks
+
+def map_reduce_reasons_summary(filtered_data: List[Dict[str, Any]], claim: str, context_type: str, support_level: str,
+                               engine: ClassificationEngine, cache: Optional[LLMCache] = None,
+                               previous_summary: Optional[Dict[str, str]] = None,
+                               chunk_tokens: Optional[int] = LLMConfig.SUMMARY_CHUNK_TOKENS,
+                               fan_out: int = LLMConfig.SUMMARY_FAN_OUT,
+                               merge_fan_in: int = LLMConfig.SUMMARY_MERGE_FAN_IN) -> Tuple[Dict[str, str], Dict[str, int]]:
+    """
+    Summarizes items whose context does not fit in one prompt:
+    - map: the items are split into chunks of at most `chunk_tokens` and each chunk is
+      summarized on its own, `fan_out` requests at a time
+    - reduce: the partial summaries (and `previous_summary`, if given) are merged
+      `merge_fan_in` at a time, level by level, until one summary is left
+    Only the chunk and merge requests go through `engine` (each one retried on its own), so
+    this must be called from outside the engine. Items that fit in one chunk are sent as a
+    single request, exactly as before. Failed chunks are dropped and counted; errors of the
+    single request or of a merge are raised.
+    Returns:
+        (summary, coverage): the dictionary of reason headers and details, and the number of
+        chunks, dropped chunks and dropped items
+    """
+    chunks = chunk_by_tokens(filtered_data, context_type, chunk_tokens)
+    coverage = {"chunks": len(chunks), "dropped_chunks": 0, "dropped_items": 0}
+    if len(chunks) == 1:
+        summary = engine.call(
+            lambda items: request_reasons_summary(items, claim, context_type, support_level, cache, previous_summary),
+            filtered_data,
+            estimate_summary_tokens(filtered_data, claim, context_type, support_level, previous_summary),
+            cached=lambda items: cached_reasons_summary(items, claim, context_type, support_level, cache, previous_summary)
         )
-        
-        return json.loads(response.choices[0].message.content)
+        return summary, coverage
+
+    def on_chunk_error(chunk, error):
+        print(f"Error summarizing a chunk of {len(chunk)} items: {str(error)}")
+        coverage["dropped_chunks"] += 1
+        coverage["dropped_items"] += len(chunk)
+        return {}
+
+    partial_summaries = engine.map(
+        lambda chunk: request_reasons_summary(chunk, claim, context_type, support_level, cache),
+        chunks,
+        token_costs=[estimate_summary_tokens(chunk, claim, context_type, support_level) for chunk in chunks],
+        on_error=on_chunk_error,
+        max_concurrency=fan_out,
+        cached=lambda chunk: cached_reasons_summary(chunk, claim, context_type, support_level, cache),
+    )
+    partial_summaries = [summary for summary in partial_summaries if summary]
+    if previous_summary:
+        partial_summaries.append(previous_summary)
+    if not partial_summaries:
+        raise RuntimeError(f"All {len(chunks)} chunk summaries failed")
+
+    merge_fan_in = max(2, merge_fan_in)
+    while len(partial_summaries) > 1:
+        groups = [partial_summaries[i:i + merge_fan_in] for i in range(0, len(partial_summaries), merge_fan_in)]
+        # A last group of one is carried to the next level without a request
+        carried = groups.pop() if len(groups[-1]) == 1 else None
+        partial_summaries = engine.map(
+            lambda group: request_merged_summary(group, claim, context_type, support_level, cache),
+            groups,
+            token_costs=[estimate_merge_tokens(group, claim, context_type, support_level) for group in groups],
+            max_concurrency=fan_out,
+            cached=lambda group: cached_merged_summary(group, claim, context_type, support_level, cache),
+        )
+        if carried is not None:
+            partial_summaries.extend(carried)
+    return partial_summaries[0], coverage
+
+def get_reasons_summary(filtered_data: List[Dict[str, Any]], claim: str, context_type: str, support_level: str,
+                        cache: Optional[LLMCache] = None, chunk_tokens: Optional[int] = None,
+                        engine: Optional[ClassificationEngine] = None) -> Dict[str, str]:
+    """
+    Get a summary of key reasons from filtered data using ChatGPT.
+    Args:
+        filtered_data: List of filtered comments/posts
+        claim: The claim being analyzed
+        context_type: The type of context to use for the summary
+        cache: Optional LLM response cache (shared with analyze_staging_claims)
+        chunk_tokens: Map-reduce contexts larger than this many tokens (None sends one request)
+        engine: Engine for the map-reduce requests (a default one is created if needed)
+    Returns:
+        Dictionary of reason headers and details
+    """
+    try:
+        if chunk_tokens is None:
+            return request_reasons_summary(filtered_data, claim, context_type, support_level, cache)
+        if engine is None:
+            engine = ClassificationEngine(max_concurrency=LLMConfig.SUMMARY_FAN_OUT,
+                                          requests_per_minute=LLMConfig.LLM_REQUESTS_PER_MINUTE,
+                                          tokens_per_minute=LLMConfig.LLM_TOKENS_PER_MINUTE,
+                                          max_retries=LLMConfig.LLM_MAX_RETRIES)
+        summary, coverage = map_reduce_reasons_summary(filtered_data, claim, context_type, support_level, engine, cache,
+                                                       chunk_tokens=chunk_tokens)
+        if coverage["dropped_chunks"]:
+            print(f"Summary misses {coverage['dropped_items']} items ({coverage['dropped_chunks']} failed chunks)")
+        return summary
     except Exception as e:
         print(f"Error getting summary from ChatGPT: {str(e)}")
         return {}
-    
+
 
 
 
@@ -136,28 +392,171 @@ def get_date_list(date_range_str: str) -> List[str]:
     ]
     return date_list
 
-def summarize_reasons(args: argparse.Namespace):
-    filtered_data = filter_data_by_date_and_support(args.input, args.date, args.support)
-    
-    # Get summary of reasons
-    summary = get_reasons_summary(filtered_data, args.claim)
-    
-    # Save results
+def save_summary(output_file: str, date: str, support_level: str, filtered_data: List[Dict[str, Any]],
+                 summary: Dict[str, str], extra: Optional[Dict[str, Any]] = None) -> None:
     output_data = {
-        "date_filter": args.date,
-        "support_level": args.support,
+        "date_filter": date,
+        "support_level": support_level,
         "total_filtered": len(filtered_data),
+        **(extra or {}),
         "summary": summary,
         "filtered_data": filtered_data,
     }
     
-    with open(args.output, 'w') as f:
+    with open(output_file, 'w') as f:
         json.dump(output_data, f, indent=2)
 
+def summarize_reasons(args: argparse.Namespace):
+    filtered_data = filter_data_by_date_and_support(args.input, args.date, args.support, getattr(args, "index", None))
+    
+    # Get summary of reasons
+    summary = get_reasons_summary(filtered_data, args.claim, args.context_type, args.support, cache=args.cache,
+                                  chunk_tokens=getattr(args, "chunk_tokens", None))
+    
+    # Save results
+    save_summary(args.output, args.date, args.support, filtered_data, summary)
+
+def shift_date(date: str, days: int) -> str:
+    return (datetime.strptime(date, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+
+def save_token_report(args: argparse.Namespace, dates: List[str], sent_items: List[int], prompt_tokens: List[int],
+                      index: AnalysisSource) -> None:
+    """
+    Prints and saves the per-date prompt sizes of a run, next to the cumulative-mode total for comparison.
+    """
+    report = {
+        "mode": args.mode,
+        "window_days": args.window_days if args.mode == "window" else None,
+        "dates": {date: {"sent_items": items, "prompt_tokens": tokens}
+                  for date, items, tokens in zip(dates, sent_items, prompt_tokens)},
+        "total_prompt_tokens": sum(prompt_tokens),
+    }
+    if args.mode != "cumulative":
+        report["cumulative_mode_prompt_tokens"] = sum(
+            estimate_summary_tokens(index.between(args.support, date_timestamp(date)), args.claim, args.context_type, args.support)
+            for date in dates
+        )
+    for date in dates:
+        print(f"{date}: {report['dates'][date]['sent_items']} items, ~{report['dates'][date]['prompt_tokens']} prompt tokens")
+    print(f"Total ~{report['total_prompt_tokens']} prompt tokens ({args.mode} mode)"
+          + (f", cumulative mode: ~{report['cumulative_mode_prompt_tokens']}" if "cumulative_mode_prompt_tokens" in report else ""))
+    with open(os.path.join(args.output_dir, "token_report.json"), 'w') as f:
+        json.dump(report, f, indent=2)
+
+def summarize_dates(args: argparse.Namespace, dates: List[str]) -> None:
+    """
+    Summarizes every date. The analysis file is indexed once (or the corpus store is queried)
+    and each date's items are a slice of the index:
+    - cumulative: items created on or after the date (the original behaviour)
+    - window: items created in the `window_days` days starting at the date
+    - incremental: see summarize_dates_incremental
+    """
+    index = load_analysis_index(args)
+    try:
+        if args.mode == "incremental":
+            summarize_dates_incremental(args, dates, index)
+        else:
+            summarize_date_windows(args, dates, index)
+    finally:
+        if isinstance(index, StoreAnalysisIndex):
+            index.store.close()
+
+def summarize_date_windows(args: argparse.Namespace, dates: List[str], index: AnalysisSource) -> None:
+    """
+    Cumulative and window modes. Up to `max_concurrency` dates are summarized at once; their chunk
+    and merge requests share one ClassificationEngine (and its in-flight bound). Each date's output
+    file is written as soon as its summary arrives.
+    """
+    if args.mode == "window":
+        filtered_by_date = [index.between(args.support, date_timestamp(date), date_timestamp(shift_date(date, args.window_days)))
+                            for date in dates]
+    else:
+        filtered_by_date = [index.between(args.support, date_timestamp(date)) for date in dates]
+    token_costs = [estimate_summary_tokens(filtered_data, args.claim, args.context_type, args.support)
+                   for filtered_data in filtered_by_date]
+
+    engine = make_summary_engine(args)
+
+    def summarize(filtered_data):
+        return map_reduce_reasons_summary(filtered_data, args.claim, args.context_type, args.support, engine,
+                                          cache=args.cache, chunk_tokens=args.chunk_tokens,
+                                          fan_out=args.fan_out, merge_fan_in=args.merge_fan_in)
+
+    # The per-date orchestration runs on plain threads; only its requests go through the engine
+    with ThreadPoolExecutor(max_workers=max(1, args.max_concurrency)) as executor:
+        futures = {executor.submit(summarize, filtered_data): position for position, filtered_data in enumerate(filtered_by_date)}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Summarizing dates"):
+            position = futures[future]
+            extra = {"mode": args.mode, "prompt_tokens": token_costs[position]}
+            try:
+                summary, coverage = future.result()
+                extra.update(coverage)
+            except Exception as e:
+                print(f"Error getting summary from ChatGPT for {dates[position]}: {str(e)}")
+                summary = {}
+                extra["error"] = str(e)
+            output_file = os.path.join(args.output_dir, f'{dates[position]}.json')
+            save_summary(output_file, dates[position], args.support, filtered_by_date[position], summary, extra)
+    save_token_report(args, dates, [len(filtered_data) for filtered_data in filtered_by_date], token_costs, index)
+
+def summarize_dates_incremental(args: argparse.Namespace, dates: List[str], index: AnalysisSource) -> None:
+    """
+    Incremental mode: produces the same per-date coverage as the cumulative mode (items created on
+    or after the date) without re-sending it. Dates are processed from the latest to the earliest;
+    each date sends the carried summary plus only the items it does not cover yet (normally the
+    items created before the next date). Dates without new items reuse the carried summary
+    without a request.
+    A summary that failed, or that dropped chunks, is saved (with an "error" or the dropped counts)
+    but not carried: the next date then re-sends everything the carried summary misses.
+    """
+    engine = make_summary_engine(args)
+    previous_summary = None
+    covered_from = None # previous_summary covers the items created on or after this timestamp
+    sent_items = [0] * len(dates)
+    prompt_tokens = [0] * len(dates)
+    for position in tqdm(reversed(range(len(dates))), total=len(dates), desc="Summarizing dates"):
+        date = dates[position]
+        start = date_timestamp(date)
+        new_items = index.between(args.support, start, covered_from)
+        summary = previous_summary or {}
+        extra: Dict[str, Any] = {"mode": args.mode, "new_items": len(new_items)}
+        if new_items:
+            cost = estimate_summary_tokens(new_items, args.claim, args.context_type, args.support, previous_summary)
+            try:
+                summary, coverage = map_reduce_reasons_summary(new_items, args.claim, args.context_type, args.support, engine,
+                                                               cache=args.cache, previous_summary=previous_summary,
+                                                               chunk_tokens=args.chunk_tokens, fan_out=args.fan_out,
+                                                               merge_fan_in=args.merge_fan_in)
+                sent_items[position] = len(new_items)
+                prompt_tokens[position] = cost
+                extra.update(coverage)
+                if not coverage["dropped_chunks"]:
+                    previous_summary, covered_from = summary, start
+            except Exception as e:
+                print(f"Error getting summary from ChatGPT for {date}: {str(e)}")
+                summary = {}
+                extra["error"] = str(e)
+        elif previous_summary is not None:
+            covered_from = start
+        extra["prompt_tokens"] = prompt_tokens[position]
+        output_file = os.path.join(args.output_dir, f'{date}.json')
+        save_summary(output_file, date, args.support, index.between(args.support, start), summary, extra)
+    save_token_report(args, dates, sent_items, prompt_tokens, index)
+
+def make_summary_engine(args: argparse.Namespace) -> ClassificationEngine:
+    return ClassificationEngine(
+        max_concurrency=args.max_concurrency,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+        max_retries=LLMConfig.LLM_MAX_RETRIES,
+    )
+
 def main():
     parser = argparse.ArgumentParser(description='Filter Reddit data and summarize key reasons.')
-    parser.add_argument('--input', required=True, default='data/preprocessed/trump_assassination/staging_claims_analysis.json',
+    parser.add_argument('--input', default='data/preprocessed/trump_assassination/staging_claims_analysis.json',
                       help='Input JSON file path containing analyzed comments')
+    parser.add_argument('--corpus_db', default=None,
+                      help='Read the analyses from this corpus store (CORPUS_DB_FILENAME, written with USE_CORPUS_STORE) instead of --input')
     parser.add_argument('--results_dir', required=True, default='results',
                       help='Results folder for the summary')
     parser.add_argument('--dates', required=True, default='2024-07-13 to 2024-08-13',
@@ -168,6 +567,27 @@ def main():
                       help='The claim being analyzed')
     parser.add_argument('--context_type', required=True, default="reasoning",
                       help='Type of context to use for the summary')
+    parser.add_argument('--cache_file', default=LLMConfig.LLM_CACHE_FILENAME,
+                      help='SQLite LLM response cache (shared with analyze_staging_claims)')
+    parser.add_argument('--bypass_cache', action='store_true',
+                      help='Always call the API (fresh responses still refresh the cache)')
+    parser.add_argument('--max_concurrency', type=int, default=LLMConfig.LLM_MAX_CONCURRENCY,
+                      help='Dates summarized at once, and summary requests in flight')
+    parser.add_argument('--requests_per_minute', type=int, default=LLMConfig.LLM_REQUESTS_PER_MINUTE,
+                      help='Request budget for the summary calls (0 disables)')
+    parser.add_argument('--tokens_per_minute', type=int, default=LLMConfig.LLM_TOKENS_PER_MINUTE,
+                      help='Token budget for the summary calls (0 disables)')
+    parser.add_argument('--mode', default='cumulative', choices=['cumulative', 'window', 'incremental'],
+                      help='cumulative: everything on/after each date; window: --window_days days from each date; '
+                           'incremental: cumulative coverage, built from the next date\'s summary plus only the new items')
+    parser.add_argument('--window_days', type=int, default=1,
+                      help='Window length for --mode window')
+    parser.add_argument('--chunk_tokens', type=int, default=LLMConfig.SUMMARY_CHUNK_TOKENS,
+                      help='Summaries whose context is larger are map-reduced over chunks of this many tokens (0 disables)')
+    parser.add_argument('--fan_out', type=int, default=LLMConfig.SUMMARY_FAN_OUT,
+                      help='Chunk / merge requests in flight per map-reduced summary')
+    parser.add_argument('--merge_fan_in', type=int, default=LLMConfig.SUMMARY_MERGE_FAN_IN,
+                      help='Partial summaries merged per reduce request')
     
     args = parser.parse_args()
 
@@ -175,14 +595,14 @@ def main():
         "trump_assassination": "Trump's assassination attempt was staged.",
     }
     args.claim = claims[args.claim_type]
-    args.output_dir = os.path.join(args.output_dir, args.claim_type, args.context_type, args.support)
+    args.chunk_tokens = args.chunk_tokens or None
+    args.output_dir = os.path.join(args.results_dir, args.claim_type, args.context_type, args.support)
     os.makedirs(args.output_dir, exist_ok=True)
+    args.cache = LLMCache(args.cache_file, max_bytes=LLMConfig.LLM_CACHE_MAX_BYTES, bypass=args.bypass_cache)
     dates = get_date_list(args.dates)
-    for date in tqdm(dates):
-        args.date = date
-        args.output = os.path.join(args.output_dir, f'{args.date}.json')
-        # Filter the data
-        summarize_reasons(args)
+    summarize_dates(args, dates)
+    print(f"LLM cache: {args.cache.stats()}")
+    args.cache.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,54 @@
+import os
+import pytest
+from config import ClientConfig
+from comment_expansion import ExpansionPolicy
+from fetch_reddit_comments import fetch_submission_tree
+from http_cassette import CASSETTE_DIR_ENV, CASSETTE_MODE_ENV, rewind_cassettes
+from raw_reddit import RawRedditFetcher, fetch_submission_tree_raw
+from reddit_client import RequestCounter, make_reddit
+from relevance import is_relevant
+
+# Recorded (HTTP_CASSETTE_MODE=record) from a local stand-in of the Reddit API serving two
+# synthetic submissions: s0 has "load more comments" stubs, s1 "continue this thread" stubs.
+# Both fetch paths were recorded into the cassette; a replay never touches the network.
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "reddit_comments")
+SUBMISSION_IDS = ["s0", "s1"]
+
+
+class FixtureConfig(ClientConfig):
+    CLIENT_ID = "fixture-id"
+    CLIENT_SECRET = "fixture-secret"
+    USER_AGENT = "speed-of-truth tests"
+    REDDIT_OAUTH_URL = "http://127.0.0.1:8774"
+    REDDIT_URL = "http://127.0.0.1:8774"
+
+def fetch_both(submission_id, relevant=None):
+    """
+    Fetches one submission with PRAW and with the raw JSON fetcher; returns both (output_data, stats).
+    """
+    config = FixtureConfig()
+    praw_counter = RequestCounter()
+    raw_counter = RequestCounter()
+    submission_info = {"id": submission_id, "title": f"Submission {submission_id}"}
+    from_praw = fetch_submission_tree(make_reddit(config, counter=praw_counter), submission_info,
+                                      praw_counter, relevant, ExpansionPolicy())
+    from_raw = fetch_submission_tree_raw(RawRedditFetcher(config, counter=raw_counter), submission_info,
+                                         raw_counter, relevant, ExpansionPolicy())
+    return from_praw, from_raw
+
+@pytest.fixture
+def replayed_reddit(monkeypatch):
+    monkeypatch.setenv(CASSETTE_MODE_ENV, "replay")
+    monkeypatch.setenv(CASSETTE_DIR_ENV, FIXTURE_DIR)
+    rewind_cassettes()
+
+@pytest.mark.parametrize("submission_id", SUBMISSION_IDS)
+@pytest.mark.parametrize("relevant", [None, is_relevant], ids=["all", "pruned"])
+def test_raw_fetch_matches_praw(replayed_reddit, submission_id, relevant):
+    (praw_data, praw_stats), (raw_data, raw_stats) = fetch_both(submission_id, relevant)
+    assert praw_data is not None and raw_data is not None
+    assert raw_data["comments_tree"] == praw_data["comments_tree"]
+    praw_stats.pop("seconds")
+    raw_stats.pop("seconds")
+    assert raw_stats == praw_stats
+    assert praw_stats["expanded_more_comments"] > 0
@@ -0,0 +1,60 @@
+import re
+from typing import Any, Dict, List, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError: # The Arrow string-kernel path is optional
+    pa = None
+    pc = None
+
+# Set on flattened posts / comments whose text fields have been cleaned, so they are not cleaned again
+CLEANED_FLAG = "cleaned"
+
+# URLs and literal \uXXXX escapes, removed in one pass. A URL ends at whitespace and cannot start
+# inside an escape ('h', 't', 'p' are not hex digits), so this matches exactly what the former
+# two separate re.sub passes removed.
+CLEAN_PATTERN = re.compile(r'http[s]?://\S+|\\u[\dA-Fa-f]{4}')
+# RE2 spelling of the same pattern, for pyarrow.compute (RE2's \d is ASCII-only)
+ARROW_CLEAN_PATTERN = r'http[s]?://\S+|\\u[0-9A-Fa-f]{4}'
+ARROW_NON_ASCII_PATTERN = r'[^\x00-\x7F]+'
+
+
+def clean_text(text: str) -> str:
+    """
+    Removes URLs, literal \\uXXXX escapes and non-ASCII characters, in that order.
+    Same result as the original three re.sub passes; texts without a URL, escape or non-ASCII
+    character are returned without running the regex.
+    """
+    if 'http' in text or '\\u' in text:
+        text = CLEAN_PATTERN.sub('', text)
+    if not text.isascii():
+        # Drops every non-ASCII code point (like [^\x00-\x7F]+), without a regex
+        text = text.encode('ascii', 'ignore').decode('ascii')
+    return text
+
+def clean_texts(texts: Sequence[str], backend: str = "python") -> List[str]:
+    """
+    Cleans a whole column of texts at once.
+    backend:
+    - "python": clean_text over the list (one combined pattern, no per-text setup)
+    - "arrow": pyarrow.compute regex kernels over an Arrow string array. Matches "python"
+      except for \\u escapes written with non-ASCII digits, which RE2 does not treat as digits.
+    """
+    if backend == "python":
+        return [clean_text(text) for text in texts]
+    if backend == "arrow":
+        if pc is None:
+            raise ImportError("The arrow cleaning backend needs pyarrow: pip install pyarrow")
+        array = pa.array(texts, type=pa.large_string())
+        array = pc.replace_substring_regex(array, ARROW_CLEAN_PATTERN, "")
+        array = pc.replace_substring_regex(array, ARROW_NON_ASCII_PATTERN, "")
+        return array.to_pylist()
+    raise ValueError(f"Unknown cleaning backend '{backend}' (expected 'python' or 'arrow')")
+
+def cleaned_field(item: Dict[str, Any], field: str) -> str:
+    """
+    The cleaned text of an item's field, cleaning it only if the item is not flagged as cleaned.
+    """
+    text = item.get(field) or ""
+    return text if item.get(CLEANED_FLAG) else clean_text(text)
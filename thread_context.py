@@ -0,0 +1,102 @@
+from typing import Any, Dict, List, Tuple
+from llm_engine import estimate_tokens
+
+# Providers only cache prompt prefixes above this length (OpenAI: 1024 tokens)
+MIN_CACHEABLE_PREFIX_TOKENS = 1024
+
+
+def thread_path(item: Dict[str, Any]) -> Tuple[str, ...]:
+    """
+    Path from the thread root (the post) down to the item itself.
+    """
+    parent_ids = item.get("parent_tree", {}).get("parent_ids", [])
+    return tuple(str(parent_id) for parent_id in parent_ids) + (str(item.get("id")),)
+
+def thread_root_id(item: Dict[str, Any]) -> str:
+    return thread_path(item)[0]
+
+def order_for_prefix_sharing(items: List[Dict[str, Any]]) -> List[int]:
+    """
+    Returns the indices of `items` sorted by thread path, so that every thread is contiguous,
+    ancestors come before their descendants and siblings are adjacent. Consecutive prompts then
+    start with the same post + ancestor chain, which lets provider prompt caching reuse it.
+    """
+    return sorted(range(len(items)), key=lambda index: thread_path(items[index]))
+
+def ancestor_text(parent: Dict[str, Any]) -> str:
+    return " ".join(str(parent.get(key, "")) for key in ("title", "selftext_preview", "body") if key in parent)
+
+def select_ancestors(parent_info: List[Dict[str, Any]], max_tokens: int) -> Tuple[List[Dict[str, Any]], int, List[Dict[str, Any]]]:
+    """
+    Picks the ancestors to include in a conversation context within `max_tokens`.
+    The post (first ancestor, selftext clipped to half the budget) is always kept, then the nearest
+    ancestors are added going up the thread until the budget is used; the ancestors in between are
+    dropped. Keeping the oldest part fixed keeps the prompt prefix stable across a thread.
+    Returns:
+        (head ancestors, number of omitted ancestors, tail ancestors)
+    """
+    if not parent_info:
+        return [], 0, []
+    head = []
+    if "title" in parent_info[0]:
+        post = dict(parent_info[0])
+        if "selftext_preview" in post:
+            post["selftext_preview"] = clip_text(post["selftext_preview"], max_tokens // 2)
+        head = [post]
+    rest = parent_info[len(head):]
+    used = sum(estimate_tokens(ancestor_text(parent)) for parent in head)
+    tail: List[Dict[str, Any]] = []
+    for parent in reversed(rest):
+        cost = estimate_tokens(ancestor_text(parent))
+        if used + cost > max_tokens:
+            break
+        tail.insert(0, parent)
+        used += cost
+    return head, len(rest) - len(tail), tail
+
+def clip_text(text: str, max_tokens: int) -> str:
+    """
+    Clips text to roughly `max_tokens` tokens.
+    """
+    max_chars = max_tokens * 4
+    if text is None or len(text) <= max_chars:
+        return text
+    return text[:max_chars] + " [...]"
+
+def common_prefix_length(a: str, b: str) -> int:
+    """
+    Length of the common prefix of two strings (binary search over C-level slice comparisons).
+    """
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def shared_prefix_tokens(prompts: List[str]) -> int:
+    """
+    Estimated prompt tokens that consecutive prompts share as a prefix long enough to be cached.
+    """
+    total = 0
+    for previous, current in zip(prompts, prompts[1:]):
+        tokens = estimate_tokens(current[:common_prefix_length(previous, current)])
+        if tokens >= MIN_CACHEABLE_PREFIX_TOKENS:
+            total += tokens
+    return total
+
+def report_prompt_tokens(full_prompts: List[str], sent_prompts: List[str]) -> Dict[str, int]:
+    """
+    Prints and returns the per-run prompt token totals before (full ancestor chains) and after
+    (budgeted contexts), plus how many of the sent tokens fall into cacheable shared prefixes.
+    """
+    report = {
+        "prompt_tokens_full_context": sum(estimate_tokens(prompt) for prompt in full_prompts),
+        "prompt_tokens_sent": sum(estimate_tokens(prompt) for prompt in sent_prompts),
+        "prompt_tokens_in_shared_prefixes": shared_prefix_tokens(sent_prompts)
+    }
+    print(f"Prompt tokens: {report['prompt_tokens_full_context']} with full ancestor chains, "
+          f"{report['prompt_tokens_sent']} sent, ~{report['prompt_tokens_in_shared_prefixes']} in cacheable shared prefixes")
+    return report
@@ -0,0 +1,220 @@
+import os
+import json
+import pickle
+import argparse
+from typing import Any, Dict, List, Sequence, Tuple
+from config import TrumpStagedConfig, GhostOfKievConfig
+
+try:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import cross_val_predict
+    from sklearn.pipeline import make_pipeline
+except ImportError: # The triage stage is optional
+    TfidfVectorizer = None
+
+LABELS = ["true", "false", "neutral"]
+DEFAULT_REPORT_THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 0.99]
+
+
+def require_sklearn() -> None:
+    if TfidfVectorizer is None:
+        raise ImportError("The local triage model needs scikit-learn: pip install scikit-learn")
+
+def triage_text(item: Dict[str, Any]) -> str:
+    """
+    Text the triage model sees: the comment body, or a post's title and selftext.
+    Works for flattened items and analyzed_comments records alike.
+    """
+    if "body" in item:
+        return item.get("body") or ""
+    return f"{item.get('title') or ''}\n{item.get('selftext_preview') or ''}"
+
+def load_training_data(analysis_file: str) -> Tuple[List[str], List[str]]:
+    """
+    (texts, labels) of the LLM-labeled comments in a staging_claims_analysis.json file.
+    Failed analyses and labels that were not produced by the LLM (triaged or copied from a
+    near-duplicate) are left out.
+    """
+    with open(analysis_file, 'r') as f:
+        records = json.load(f).get("analyzed_comments", [])
+    texts, labels = [], []
+    for record in records:
+        label = record.get("analysis", {}).get("supports")
+        if label not in LABELS or record.get("triage") or record.get("duplicate_of"):
+            continue
+        texts.append(triage_text(record))
+        labels.append(label)
+    return texts, labels
+
+class TfidfTriage:
+    """
+    TF-IDF (word 1-2 grams) + logistic regression over the comment text, trained on the LLM's
+    own labels. Any object with the same `predict(texts) -> (labels, confidences)` method can be
+    pickled to TRIAGE_MODEL_FILENAME instead.
+    """
+    def __init__(self, max_features: int = 200000, regularization: float = 4.0):
+        require_sklearn()
+        self.pipeline = make_pipeline(
+            TfidfVectorizer(ngram_range=(1, 2), min_df=2, max_features=max_features, sublinear_tf=True, strip_accents="unicode"),
+            LogisticRegression(C=regularization, max_iter=2000),
+        )
+
+    def fit(self, texts: Sequence[str], labels: Sequence[str]) -> "TfidfTriage":
+        self.pipeline.fit(texts, labels)
+        return self
+
+    def predict(self, texts: Sequence[str]) -> Tuple[List[str], List[float]]:
+        """
+        Returns the most likely label of every text and its probability.
+        """
+        probabilities = self.pipeline.predict_proba(texts)
+        classes = self.pipeline.classes_
+        best = probabilities.argmax(axis=1)
+        return [str(classes[index]) for index in best], probabilities.max(axis=1).tolist()
+
+    def out_of_fold_predictions(self, texts: Sequence[str], labels: Sequence[str], folds: int = 5) -> Tuple[List[str], List[float]]:
+        """
+        Predictions for the training texts from models that did not see them (for calibration).
+        """
+        probabilities = cross_val_predict(self.pipeline, texts, labels, cv=folds, method="predict_proba")
+        classes = sorted(set(labels)) # cross_val_predict orders columns like the fitted classes_
+        best = probabilities.argmax(axis=1)
+        return [classes[index] for index in best], probabilities.max(axis=1).tolist()
+
+def save_model(model: Any, path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'wb') as f:
+        pickle.dump(model, f)
+
+def load_model(path: str) -> Any:
+    # Only load model files you trained yourself: pickle runs code from the file
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def accepted_locally(label: str, confidence: float, max_uncertainty: float, accept_labels: Sequence[str]) -> bool:
+    """
+    True if the triage label is used as is, False if the item goes to the LLM.
+    """
+    return label in accept_labels and 1.0 - confidence <= max_uncertainty
+
+def calibration_report(true_labels: Sequence[str], predicted: Sequence[str], confidences: Sequence[float],
+                       accept_labels: Sequence[str], thresholds: Sequence[float] = DEFAULT_REPORT_THRESHOLDS,
+                       bins: int = 10) -> Dict[str, Any]:
+    """
+    Cost / recall trade-off of the triage on held-out predictions:
+    - thresholds: for each minimum confidence (1 - TRIAGE_MAX_UNCERTAINTY), the share of items still
+      sent to the LLM, the accuracy of the labels accepted locally, and the recall of claim-related
+      items (LLM label true/false) = share of them that are not given a wrong local label
+    - reliability: accuracy vs mean confidence per confidence bin
+    """
+    total = len(true_labels)
+    related = [index for index, label in enumerate(true_labels) if label != "neutral"]
+    rows = []
+    for threshold in thresholds:
+        accepted = [index for index in range(total)
+                    if accepted_locally(predicted[index], confidences[index], 1.0 - threshold, accept_labels)]
+        correct = sum(predicted[index] == true_labels[index] for index in accepted)
+        accepted_set = set(accepted)
+        missed = sum(index in accepted_set and predicted[index] != true_labels[index] for index in related)
+        rows.append({
+            "min_confidence": threshold,
+            "max_uncertainty": round(1.0 - threshold, 4),
+            "sent_to_llm": round((total - len(accepted)) / total, 4) if total else 0.0,
+            "accepted_accuracy": round(correct / len(accepted), 4) if accepted else None,
+            "related_recall": round(1.0 - missed / len(related), 4) if related else None,
+        })
+    reliability = []
+    for bin_index in range(bins):
+        low, high = bin_index / bins, (bin_index + 1) / bins
+        members = [index for index in range(total) if low <= confidences[index] < high or (bin_index == bins - 1 and confidences[index] == 1.0)]
+        if members:
+            reliability.append({
+                "confidence": f"{low:.1f}-{high:.1f}",
+                "count": len(members),
+                "mean_confidence": round(sum(confidences[index] for index in members) / len(members), 4),
+                "accuracy": round(sum(predicted[index] == true_labels[index] for index in members) / len(members), 4),
+            })
+    return {
+        "examples": total,
+        "label_counts": {label: sum(1 for value in true_labels if value == label) for label in LABELS},
+        "accept_labels": list(accept_labels),
+        "thresholds": rows,
+        "reliability": reliability,
+    }
+
+def print_calibration_report(report: Dict[str, Any]) -> None:
+    print(f"Triage calibration on {report['examples']} held-out examples {report['label_counts']}, "
+          f"accepting {report['accept_labels']} locally:")
+    print(f"{'min conf':>9} {'to LLM':>8} {'local acc':>10} {'related recall':>15}")
+    for row in report["thresholds"]:
+        accuracy = f"{row['accepted_accuracy']:.3f}" if row["accepted_accuracy"] is not None else "-"
+        recall = f"{row['related_recall']:.3f}" if row["related_recall"] is not None else "-"
+        print(f"{row['min_confidence']:>9.2f} {row['sent_to_llm']:>8.1%} {accuracy:>10} {recall:>15}")
+
+def train_triage(config, folds: int = 5) -> Dict[str, Any]:
+    """
+    Trains the triage model on the config's staging_claims_analysis.json, writes its
+    calibration report (from out-of-fold predictions) and saves the model.
+    """
+    texts, labels = load_training_data(config.STAGING_CLAIMS_ANALYSIS_FILENAME)
+    if len(set(labels)) < 2:
+        raise ValueError(f"Need at least two labels to train the triage model, found {sorted(set(labels))}")
+    print(f"Training triage model on {len(texts)} labeled comments")
+    model = TfidfTriage()
+    predicted, confidences = model.out_of_fold_predictions(texts, labels, folds)
+    report = calibration_report(labels, predicted, confidences, config.TRIAGE_ACCEPT_LABELS)
+    print_calibration_report(report)
+    with open(config.TRIAGE_REPORT_FILENAME, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved calibration report to {config.TRIAGE_REPORT_FILENAME}")
+
+    model.fit(texts, labels)
+    save_model(model, config.TRIAGE_MODEL_FILENAME)
+    print(f"Saved triage model to {config.TRIAGE_MODEL_FILENAME}")
+    return report
+
+def triage_items(config, items: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Tuple[Dict[str, Any], Dict[str, Any]]]]:
+    """
+    Splits the items to classify into (items for the LLM, [(item, local analysis)]), scoring the
+    whole list in one vectorized call.
+    """
+    if not items:
+        return items, []
+    model = load_model(config.TRIAGE_MODEL_FILENAME)
+    labels, confidences = model.predict([triage_text(item) for item in items])
+    to_llm = []
+    local = []
+    for item, label, confidence in zip(items, labels, confidences):
+        if accepted_locally(label, confidence, config.TRIAGE_MAX_UNCERTAINTY, config.TRIAGE_ACCEPT_LABELS):
+            local.append((item, {
+                "supports": label,
+                "confidence": round(confidence, 4),
+                "reasoning": f"Labeled by the local triage model ({type(model).__name__}, p={confidence:.3f})",
+            }))
+        else:
+            to_llm.append(item)
+    print(f"Triage: {len(local)} of {len(items)} items labeled locally, {len(to_llm)} sent to the LLM "
+          f"(max uncertainty {config.TRIAGE_MAX_UNCERTAINTY})")
+    return to_llm, local
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the local triage model on existing LLM labels and report its calibration')
+    parser.add_argument('--config', type=str, default='trump_staged', choices=['trump_staged', 'ghost_of_kyiv'], help='Configuration to use')
+    parser.add_argument('--folds', type=int, default=5, help='Cross-validation folds for the calibration report')
+    args = parser.parse_args()
+
+    if args.config == 'trump_staged':
+        config = TrumpStagedConfig()
+    elif args.config == 'ghost_of_kyiv':
+        config = GhostOfKievConfig()
+    else:
+        raise ValueError(f"Invalid configuration: {args.config}")
+    # Train through the imported module so the pickled model refers to triage.TfidfTriage, not __main__
+    import triage
+    triage.train_triage(config, args.folds)
+
+if __name__ == '__main__':
+    main()